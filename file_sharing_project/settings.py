@@ -1,10 +1,10 @@
 import os
 from pathlib import Path
 from cryptography.fernet import Fernet
+from django.core.exceptions import ImproperlyConfigured
 
 
 BASE_DIR = Path(__file__).resolve().parent.parent
-FERNET_KEY = os.environ.get("FERNET_KEY")
 
 
 
@@ -43,11 +43,14 @@ AUTH_USER_MODEL = 'user_app.CustomUser'
 # ⚙️ MIDDLEWARE
 # ==============================
 MIDDLEWARE = [
+    'sharing_app.middleware.MetricsMiddleware',   # 📈 first, so it times the whole stack
+    'sharing_app.middleware.ReplicaStickinessMiddleware',  # 🔀 outside sessions: their saves are writes
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'sharing_app.middleware.ProfilerMiddleware',  # 🔬 no-op unless PROFILER_ENABLED
     'django.contrib.messages.middleware.MessageMiddleware',
 ]
 
@@ -65,8 +68,14 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Parse each template once per process (autoreload still resets it in DEBUG)
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -87,6 +96,58 @@ DATABASES = {
     }
 }
 
+# 🔀 Read replica: listing views (@use_replica) read from here. Defaults to the
+# primary file; point it at a replicated copy (e.g. litestream/rsync target).
+DATABASES['replica'] = {
+    **DATABASES['default'],
+    'NAME': os.environ.get('DATABASE_REPLICA_NAME') or DATABASES['default']['NAME'],
+    'TEST': {'MIRROR': 'default'},
+}
+DATABASE_ROUTERS = ['sharing_app.db_router.ReplicaRouter']
+# After a write, the client reads from the primary for this long (> replica lag)
+REPLICA_STICKY_SECONDS = 10
+
+# Applied to every new SQLite connection (sharing_app.signals.configure_sqlite).
+# WAL lets readers run alongside the single writer; busy_timeout makes a
+# writer wait for the lock instead of failing with "database is locked".
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 5000,               # ms
+    'synchronous': 'NORMAL',            # durable with WAL; fsync at checkpoints
+    'mmap_size': 256 * 1024 * 1024,     # bytes of the DB file read via mmap
+}
+
+# ==============================
+# ⚡ CACHES
+# ==============================
+# Listing/fragment cache backend: "locmem" (per process) or "file" (shared by
+# every worker on the host). Entries are versioned per folder (sharing_app/listing_cache.py).
+LISTING_CACHE = os.environ.get('LISTING_CACHE', 'locmem')
+
+
+def _cache_backend(name):
+    if LISTING_CACHE == 'file':
+        return {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': BASE_DIR / '.cache' / name,
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    return {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': name,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+
+
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'listings': _cache_backend('listings'),
+    # {% cache %} fragments in dashboard.html, keyed by each row's updated_at
+    'fragments': _cache_backend('fragments'),
+}
+LISTING_CACHE_ALIAS = 'listings'
+LISTING_CACHE_TTL = 300           # seconds; 0 disables the listing cache
+
 # ==============================
 # 🔑 PASSWORD VALIDATION
 # ==============================
@@ -111,13 +172,92 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
+# collectstatic writes content-hashed names plus .gz/.br variants
+# (sharing_app/static_storage.py); hashed names are cached this long.
+STATICFILES_BACKEND = 'sharing_app.static_storage.CompressedManifestStaticFilesStorage'
+STATIC_MAX_AGE = 365 * 24 * 3600
 
 
 
+# 💾 Per-user storage quota (bytes) unless CustomUser.storage_quota is set; None = unlimited
+STORAGE_QUOTA_DEFAULT = 15 * 1024 ** 3
+
+# Limits first: an upload that can't fit the quota, is over forms.MAX_MB, or has a
+# type outside forms.ALLOWED_EXT (by extension and first bytes) is dropped before
+# it is written. Files over FILE_UPLOAD_MAX_MEMORY_SIZE are spooled on the blob
+# volume itself (<volume>/.incoming), so storing them is a rename, not a copy
+FILE_UPLOAD_HANDLERS = [
+    'sharing_app.upload_handlers.UploadLimitsHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'sharing_app.upload_handlers.StagedUploadHandler',
+]
+# A rejected upload with more than this left unread is cut off instead of drained
+UPLOAD_REJECT_DRAIN_MAX = 256 * 1024
+
 # ✅ Secure uploaded files (protected folder)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'protected_media'
 
+# Blobs are sharded as <volume>/ab/cd/<name> (sharing_app/storage.py).
+# Volumes: "v0:/mnt/disk0,v1:/mnt/disk1"; empty → MEDIA_ROOT as "v0".
+# Never remove a label that still has blobs; stop writing to it instead
+# by leaving it out of PROTECTED_MEDIA_WRITE_VOLUMES.
+def _env_pairs(name):
+    """Parse "a:x,b:y" from the environment into {'a': 'x', 'b': 'y'}."""
+    return {
+        label.strip(): value.strip()
+        for label, _, value in (
+            item.partition(':') for item in os.environ.get(name, '').split(',') if item.strip()
+        )
+    }
+
+
+PROTECTED_MEDIA_VOLUMES = _env_pairs('PROTECTED_MEDIA_VOLUMES')
+PROTECTED_MEDIA_WRITE_VOLUMES = [
+    label.strip() for label in os.environ.get('PROTECTED_MEDIA_WRITE_VOLUMES', '').split(',') if label.strip()
+]
+
+# Blob backend: "local" (sharded disk), "local-presigned" (the same files served
+# through expiring signed URLs, an offline stand-in for S3), "replicated"
+# (sharded disk + BLOB_REPLICAS copies) or "s3".
+BLOB_STORAGE = os.environ.get('BLOB_STORAGE', 'local')
+BLOB_STORAGE_BACKENDS = {
+    'local': 'sharing_app.storage.ShardedStorage',
+    'local-presigned': 'sharing_app.storage.LocalObjectStorage',
+    'replicated': 'sharing_app.storage.ReplicatedStorage',
+    's3': 'sharing_app.storage.S3Storage',
+}
+if BLOB_STORAGE not in BLOB_STORAGE_BACKENDS:
+    raise ImproperlyConfigured(f"BLOB_STORAGE must be one of {', '.join(BLOB_STORAGE_BACKENDS)}")
+
+STORAGES = {
+    'default': {'BACKEND': BLOB_STORAGE_BACKENDS[BLOB_STORAGE]},
+    'staticfiles': {'BACKEND': STATICFILES_BACKEND},
+}
+
+# Replicas: full copies of the blob tree on other disks, "r1:/mnt/b,r2:/mnt/c".
+# The primary copy is written in the request; replicas by the `replicate_blob`
+# job (queue "replication"). `manage.py repair_replicas` fills any gaps.
+BLOB_REPLICAS = _env_pairs('BLOB_REPLICAS')
+# A copy that fails a read is skipped for this many seconds
+REPLICA_ERROR_COOLDOWN = 30
+# Fault injection for failover testing, by volume/replica label:
+# "r1:error,v0:slow=0.5,r2:missing"
+BLOB_FAULTS = _env_pairs('BLOB_FAULTS')
+
+# S3 / S3-compatible (credentials from the standard AWS env vars or config).
+# Offline: `moto_server -p 5000` + AWS_S3_ENDPOINT_URL=http://127.0.0.1:5000
+AWS_STORAGE_BUCKET_NAME = os.environ.get('AWS_STORAGE_BUCKET_NAME', 'securefilesharing')
+AWS_S3_ENDPOINT_URL = os.environ.get('AWS_S3_ENDPOINT_URL') or None
+AWS_S3_REGION_NAME = os.environ.get('AWS_S3_REGION_NAME') or None
+AWS_S3_PREFIX = os.environ.get('AWS_S3_PREFIX', '')
+S3_MULTIPART_THRESHOLD = 8 * 1024 * 1024    # bytes; larger uploads go multipart
+S3_MULTIPART_CHUNKSIZE = 8 * 1024 * 1024
+S3_MAX_CONCURRENCY = 8                      # parallel parts per transfer
+
+# Lifetime (seconds) of presigned download URLs
+PRESIGNED_URL_EXPIRY = 60
+
 # ==============================
 # 📧 EMAIL CONFIGURATION (for OTP)
 # ==============================
@@ -140,14 +280,129 @@ LOGOUT_REDIRECT_URL = '/user/login/'
 # ==============================
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# ==============================
+# ⚙️ BACKGROUND JOBS (manage.py runworker)
+# ==============================
+JOB_LEASE_SECONDS = 300           # lease renewed by worker heartbeat
+JOB_POLL_INTERVAL = 1.0           # seconds between polls when idle
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BACKOFF_SECONDS = 10    # doubled on every retry (max 1h)
+TRASH_RETENTION_DAYS = 30
+TRASH_PURGE_INTERVAL = 86400     # seconds between purge_trash runs (manage.py purge_trash --enqueue)
+
+# ==============================
+# ✍️ WRITE-BEHIND BUFFERS (access times, audit log)
+# ==============================
+WRITE_BEHIND_FLUSH_INTERVAL = 5       # seconds between batched flushes
+WRITE_BEHIND_MAX_PENDING = 10000      # flush early once this many items wait
+
+# ==============================
+# 🧾 AUDIT LOG (sharing_app/audit.py)
+# ==============================
+AUDIT_ROLLUP_DELAY = 300              # seconds after an hour ends before it is rolled up
+AUDIT_RAW_RETENTION_DAYS = 30         # raw events kept (only once rolled up)
+AUDIT_HOURLY_RETENTION_DAYS = 0       # hourly rollups kept; 0 = forever
+SHARE_ANALYTICS_DAYS = 30             # window shown on /sharing/shares/analytics/
+
+# ==============================
+# 🩺 INTEGRITY SCRUB (sharing_app/integrity.py)
+# ==============================
+SCRUB_MB_PER_SEC = 20                 # re-hash I/O budget
+SCRUB_MAX_SECONDS = 600               # per scrub_blobs run
+SCRUB_INTERVAL = 3600                 # seconds between runs
+SCRUB_REVERIFY_DAYS = 30              # re-check each blob at least this often
+SCRUB_SHARED_DAYS = 7                 # shares this new are verified first
+
+# ==============================
+# 🕘 FILE VERSIONS (sharing_app/versions.py)
+# ==============================
+VERSION_CHUNK_GC_GRACE = 3600         # seconds an unreferenced chunk is kept before gc_chunks
+
+# ==============================
+# 🦠 VIRUS SCAN VERDICT CACHE (sharing_app/scan_cache.py)
+# ==============================
+# Uploads whose SHA-256 already has a clamd verdict under the current
+# signature database skip the scan. New signatures invalidate the cache.
+SCAN_VERDICT_CACHE = True
+CLAMAV_VERSION_TTL = 60           # seconds between clamd VERSION checks per process
+
+# ==============================
+# 🗜️ COMPRESSION AT REST (sharing_app/compression.py)
+# ==============================
+# New uploads of the MIME types below are stored compressed ("br" falls back
+# to "gzip" without the brotli package). Unlisted types are already
+# compressed (PDF, PNG, JPEG, MP4, MP3, .docx/.xlsx zips) and stored as is.
+BLOB_COMPRESSION = os.environ.get('BLOB_COMPRESSION', '1') == '1'
+COMPRESSION_CODECS = {
+    'text/*': 'br',
+    'application/json': 'br',
+    'application/xml': 'br',
+    'image/svg+xml': 'br',
+    'application/msword': 'gzip',               # .doc
+    'application/vnd.ms-excel': 'gzip',         # .xls
+    'application/vnd.ms-powerpoint': 'gzip',    # .ppt
+    'application/rtf': 'gzip',
+}
+COMPRESSION_BROTLI_QUALITY = 5    # 0-11; 5 keeps uploads near gzip speed
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_MIN_SIZE = 1024       # bytes; smaller uploads aren't worth it
+COMPRESSION_MIN_SAVING = 0.1      # store as is unless compression saves 10%
+
+# ==============================
+# 📈 METRICS (/sharing/metrics/)
+# ==============================
+METRICS_DIR = BASE_DIR / '.metrics'           # one snapshot file per process; exited ones folded into archive.json (per host)
+METRICS_FLUSH_INTERVAL = 5                    # seconds between snapshots
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')   # optional scraper bearer token
+
+# ==============================
+# 🔬 REQUEST PROFILER (/admin/profiles/)
+# ==============================
+# Staff trigger: send the header "X-Profile: 1" or add "?_profile" to a URL.
+PROFILER_ENABLED = os.environ.get('PROFILER_ENABLED', '') == '1'
+PROFILER_SAMPLE_RATE = float(os.environ.get('PROFILER_SAMPLE_RATE', '0'))  # e.g. 0.001
+PROFILER_HEADER = 'X-Profile'
+PROFILER_QUERY_PARAM = '_profile'
+PROFILER_DIR = BASE_DIR / '.profiles'
+PROFILER_MAX_PROFILES = 200                   # ring buffer size
+
 # ==============================
 # 🧠 FILE ENCRYPTION SETTINGS
 # ==============================
-# Fernet (AES-128 + HMAC) Encryption Key
-FERNET_KEY = os.environ.get('FERNET_KEY')
+# Fernet (AES-128 + HMAC) Encryption Key Ring
+#
+# FERNET_KEYS = "<id>:<key>,<id>:<key>"  (newest first; the first key encrypts,
+#                                         all keys can decrypt)
+# FERNET_KEY  = "<key>"                  (single key, stored as id "default")
+#
+# Rotate: prepend a new key to FERNET_KEYS, then run `manage.py rotate_keys`.
+FERNET_KEYS = []
+for _entry in os.environ.get('FERNET_KEYS', '').split(','):
+    _key_id, _, _key = _entry.strip().rpartition(':')
+    if _key:
+        FERNET_KEYS.append((_key_id or f'k{len(FERNET_KEYS)}', _key))
+
+if not FERNET_KEYS and os.environ.get('FERNET_KEY'):
+    FERNET_KEYS = [('default', os.environ['FERNET_KEY'])]
+
+if not FERNET_KEYS:
+    if not DEBUG:
+        raise ImproperlyConfigured("FERNET_KEYS (or FERNET_KEY) must be set when DEBUG is False.")
+
+    # Development fallback: persist the generated key so blobs stay
+    # readable across restarts.
+    _dev_key_file = BASE_DIR / '.fernet_dev_key'
+    if not _dev_key_file.exists():
+        _dev_key_file.write_text(Fernet.generate_key().decode())
+        print(f"⚠️ WARNING: No FERNET_KEYS found. Generated a development key in {_dev_key_file.name}.")
+        print("👉 Please set FERNET_KEYS in your system environment for production use.")
+    FERNET_KEYS = [('dev', _dev_key_file.read_text().strip())]
+
+# Primary key (kept for code that expects a single key)
+FERNET_KEY = FERNET_KEYS[0][1]
 
-if not FERNET_KEY:
-    # Development fallback (auto-generate key if not found)
-    FERNET_KEY = Fernet.generate_key().decode()
-    print("⚠️ WARNING: No FERNET_KEY found. Generated a temporary key.")
-    print("👉 Please set a permanent key in your system environment for production use.")
+# Envelope encryption: blobs use a per-user data key wrapped by the master
+# key, so rotating FERNET_KEYS only re-wraps the small data keys.
+ENVELOPE_ENCRYPTION = True
+DATA_KEY_CACHE_SIZE = 1024        # unwrapped data keys kept per process
+DATA_KEY_CACHE_TTL = 300          # seconds
@@ -1,5 +1,7 @@
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from sharing_app import views as sharing_views
@@ -8,6 +10,15 @@ urlpatterns = [
     # =====================================================
     # ⚙️ ADMIN PANEL
     # =====================================================
+    # 🔬 Request profiles (staff only; before admin.site.urls so it matches first)
+    path('admin/profiles/', sharing_views.profile_list, name='admin_profiles'),
+    path('admin/profiles/<str:profile_id>/', sharing_views.profile_detail, name='admin_profile_detail'),
+    path('admin/profiles/<str:profile_id>/download/', sharing_views.profile_download,
+         name='admin_profile_download'),
+
+    # 💾 Storage report (staff only)
+    path('admin/storage/', sharing_views.storage_report, name='admin_storage_report'),
+
     path('admin/', admin.site.urls),
 
     # =====================================================
@@ -36,3 +47,9 @@ if settings.DEBUG:
     # Serve static assets (CSS, JS, Images)
     if hasattr(settings, 'STATICFILES_DIRS') and settings.STATICFILES_DIRS:
         urlpatterns += static(settings.STATIC_URL, document_root=settings.STATICFILES_DIRS[0])
+else:
+    # Hashed, precompressed collectstatic output with far-future cache headers
+    # (a front-end server can serve STATIC_ROOT the same way instead)
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.+)$' % re.escape(settings.STATIC_URL.lstrip('/')), sharing_views.static_asset),
+    ]
@@ -0,0 +1,45 @@
+# ==========================================================
+# 👁️ access_tracking.py — Write-behind File.last_accessed_at
+# ==========================================================
+"""
+Opening or downloading a file records the time in a WriteBehindBuffer;
+every few seconds the newest time per file is written with one batched
+UPDATE ... CASE statement per chunk. Public share hits are recorded by blob
+name (the share row doesn't reference a File) and resolved at flush time,
+so the request path stays free of extra queries and writes.
+"""
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+
+from .models import File
+from .write_behind import WriteBehindBuffer
+
+CHUNK_SIZE = 300    # rows per UPDATE (keeps SQLite's bound-parameter count low)
+
+
+def _update(lookup, times):
+    items = list(times.items())
+    for start in range(0, len(items), CHUNK_SIZE):
+        chunk = dict(items[start:start + CHUNK_SIZE])
+        File.objects.filter(**{f'{lookup}__in': list(chunk)}).update(last_accessed_at=Case(
+            *[When(**{lookup: key}, then=Value(at)) for key, at in chunk.items()],
+            output_field=DateTimeField(),
+        ))
+
+
+def _flush(batch):
+    by_pk = {ident: at for (kind, ident), at in batch.items() if kind == 'pk'}
+    by_name = {ident: at for (kind, ident), at in batch.items() if kind == 'name'}
+    if by_pk:
+        _update('pk', by_pk)
+    if by_name:
+        _update('file', by_name)
+
+
+accesses = WriteBehindBuffer('file_access', _flush, coalesce=max)
+
+
+def record_access(file_obj=None, blob_name=None):
+    """Note that a file was opened now (by File row, or by blob name for shares)."""
+    key = ('pk', file_obj.pk) if file_obj is not None else ('name', blob_name)
+    accesses.add(timezone.now(), key=key)
@@ -1,6 +1,54 @@
 from django.contrib import admin
-from .models import Folder, File, SharedFile
+from .models import Folder, File, SharedFile, Job, AuditEvent, AuditHourly, FileVersion, Chunk, ScanVerdict
 
 admin.site.register(Folder)
 admin.site.register(File)
 admin.site.register(SharedFile)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'queue', 'status', 'priority', 'attempts', 'run_after', 'locked_by')
+    list_filter = ('status', 'queue', 'name')
+    search_fields = ('name', 'idempotency_key')
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'last_error')
+
+
+@admin.register(AuditEvent)
+class AuditEventAdmin(admin.ModelAdmin):
+    list_display = ('at', 'event', 'owner', 'actor', 'ip', 'file', 'share', 'folder')
+    list_filter = ('event',)
+    date_hierarchy = 'at'
+
+    # Append-only
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(AuditHourly)
+class AuditHourlyAdmin(admin.ModelAdmin):
+    list_display = ('hour', 'event', 'owner', 'count', 'unique_ips', 'file', 'share', 'folder')
+    list_filter = ('event',)
+
+
+@admin.register(FileVersion)
+class FileVersionAdmin(admin.ModelAdmin):
+    list_display = ('file', 'number', 'size', 'restored_from', 'created_by', 'created_at')
+    raw_id_fields = ('file',)
+    exclude = ('chunks',)
+
+
+@admin.register(Chunk)
+class ChunkAdmin(admin.ModelAdmin):
+    list_display = ('digest', 'owner', 'size', 'refs', 'created_at')
+    search_fields = ('digest',)
+
+
+@admin.register(ScanVerdict)
+class ScanVerdictAdmin(admin.ModelAdmin):
+    list_display = ('sha256', 'infected', 'virus', 'signatures', 'scanned_at')
+    list_filter = ('infected',)
+    search_fields = ('sha256', 'virus')
@@ -12,3 +12,4 @@ class SharingAppConfig(AppConfig):
         This ensures file/folder events or audit tracking work properly.
         """
         import sharing_app.signals  # 👈 Important: register signals here
+        import sharing_app.tasks    # ⚙️ register background jobs
@@ -0,0 +1,196 @@
+# ==========================================================
+# 🧾 audit.py — Buffered audit log with hourly rollups
+# ==========================================================
+"""
+Views call `audit.record(...)`; events are buffered in memory and bulk
+inserted into AuditEvent every WRITE_BEHIND_FLUSH_INTERVAL seconds.
+
+The `rollup_audit` job folds every complete hour into AuditHourly and
+advances AuditRollupState.rolled_until, so analytics read compact hourly
+rows up to that point and only the last hour or two of raw events. It
+schedules itself for the next hour. `compact_audit` then deletes raw
+events that are rolled up and older than AUDIT_RAW_RETENTION_DAYS, and
+rollups older than AUDIT_HOURLY_RETENTION_DAYS (0 keeps them).
+
+    audit.record(AuditEvent.DOWNLOAD, request, owner_id=shared.owner_id, share=shared)
+"""
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate, TruncHour
+from django.utils import timezone
+
+from .jobs import enqueue
+from .models import AuditEvent, AuditHourly, AuditRollupState, File, Folder, SharedFile
+from .write_behind import WriteBehindBuffer
+
+ROLLUP_MAX_HOURS = 24 * 7     # per job run; a backlog continues in a follow-up job
+DELETE_BATCH_SIZE = 5000      # raw rows per DELETE (keeps SQLite write locks short)
+SUBJECTS = {'file_id': File, 'share_id': SharedFile, 'folder_id': Folder}
+
+
+def _rollup_delay():
+    return timedelta(seconds=getattr(settings, 'AUDIT_ROLLUP_DELAY', 300))
+
+
+def _floor_hour(dt):
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+
+def rolled_until():
+    return AuditRollupState.objects.filter(pk=1).values_list('rolled_until', flat=True).first()
+
+
+# ==========================================================
+# ✍️ Recording (request path: memory only)
+# ==========================================================
+def _alive(model, ids):
+    ids = {i for i in ids if i}
+    return set(model.objects.filter(pk__in=ids).values_list('pk', flat=True)) if ids else set()
+
+
+def _flush(batch):
+    # Rows can be deleted between the request and the flush: drop events of
+    # deleted owners, and null out references to anything else that is gone
+    owners = _alive(get_user_model(), (e['owner_id'] for e in batch))
+    batch = [e for e in batch if e['owner_id'] in owners]
+    for field, model in {**SUBJECTS, 'actor_id': get_user_model()}.items():
+        alive = _alive(model, (e[field] for e in batch))
+        for e in batch:
+            if e[field] not in alive:
+                e[field] = None
+    AuditEvent.objects.bulk_create([AuditEvent(**e) for e in batch], batch_size=500)
+
+    # Make sure each hour we just wrote to gets rolled up once it is over
+    for hour in {_floor_hour(e['at']) for e in batch}:
+        schedule_rollup(hour + timedelta(hours=1))
+
+
+events = WriteBehindBuffer('audit', _flush)
+
+
+def record(event, request=None, *, owner_id, file=None, share=None, folder=None):
+    actor = getattr(request, 'user', None)
+    ip = request.META.get('REMOTE_ADDR') if request is not None else None
+    events.add({
+        'event': event,
+        'at': timezone.now(),
+        'owner_id': owner_id,
+        'actor_id': actor.pk if actor is not None and actor.is_authenticated else None,
+        'ip': ip or None,
+        'file_id': file.pk if file is not None else None,
+        'share_id': share.pk if share is not None else None,
+        'folder_id': folder.pk if folder is not None else None,
+    })
+
+
+# ==========================================================
+# 📊 Rollup + compaction (background jobs, see tasks.py)
+# ==========================================================
+def schedule_rollup(hour_end):
+    """Queue the rollup of the hour ending at `hour_end` (once per hour)."""
+    enqueue('rollup_audit', run_after=hour_end + _rollup_delay(),
+            idempotency_key=f"rollup_audit:{hour_end.isoformat()}")
+
+
+def rollup(max_hours=ROLLUP_MAX_HOURS):
+    """
+    Rebuild AuditHourly for complete hours from rolled_until onwards.
+    Returns (hours rolled, rows written, more_pending).
+    """
+    state = AuditRollupState.get()
+    end = _floor_hour(timezone.now() - _rollup_delay())
+    start = state.rolled_until
+    if start is None:
+        first = AuditEvent.objects.order_by('at').values_list('at', flat=True).first()
+        if first is None:
+            return 0, 0, False
+        start = _floor_hour(first)
+    if start >= end:
+        return 0, 0, False
+    more = end - start > timedelta(hours=max_hours)
+    end = min(end, start + timedelta(hours=max_hours))
+
+    groups = (
+        AuditEvent.objects.filter(at__gte=start, at__lt=end)
+        .annotate(hour=TruncHour('at', tzinfo=dt_timezone.utc))   # UTC hours, like _floor_hour
+        .values('hour', 'owner_id', 'event', 'file_id', 'share_id', 'folder_id')
+        .annotate(count=Count('id'), unique_ips=Count('ip', distinct=True))
+        .order_by()
+    )
+    rows = [AuditHourly(**group) for group in groups]
+    with transaction.atomic():
+        # Rebuilding the whole range makes a retried job harmless
+        AuditHourly.objects.filter(hour__gte=start, hour__lt=end).delete()
+        AuditHourly.objects.bulk_create(rows, batch_size=500)
+        state.rolled_until = end
+        state.save(update_fields=['rolled_until'])
+    return int((end - start) / timedelta(hours=1)), len(rows), more
+
+
+def _delete_in_batches(queryset):
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:DELETE_BATCH_SIZE])
+        if not ids:
+            return deleted
+        deleted += queryset.model.objects.filter(pk__in=ids).delete()[0]
+
+
+def compact():
+    """Apply retention. Returns (raw events deleted, hourly rows deleted)."""
+    now = timezone.now()
+    raw_cutoff = now - timedelta(days=getattr(settings, 'AUDIT_RAW_RETENTION_DAYS', 30))
+    # Never drop raw events that aren't rolled up yet
+    rolled = rolled_until()
+    raw_cutoff = min(raw_cutoff, rolled) if rolled else None
+    raw = _delete_in_batches(AuditEvent.objects.filter(at__lt=raw_cutoff)) if raw_cutoff else 0
+
+    hourly = 0
+    hourly_days = getattr(settings, 'AUDIT_HOURLY_RETENTION_DAYS', 0)
+    if hourly_days:
+        hourly = _delete_in_batches(AuditHourly.objects.filter(hour__lt=now - timedelta(days=hourly_days)))
+    return raw, hourly
+
+
+# ==========================================================
+# 🔎 Analytics (rollups up to rolled_until, raw events after)
+# ==========================================================
+def share_totals(owner_id, since):
+    """{share_id: downloads since `since`} for an owner's shares."""
+    rolled = rolled_until() or since
+    hourly = (
+        AuditHourly.objects.filter(owner_id=owner_id, event=AuditEvent.DOWNLOAD, share__isnull=False,
+                                   hour__gte=since, hour__lt=rolled)
+        .values('share_id').annotate(n=Sum('count')).order_by()
+    )
+    raw = (
+        AuditEvent.objects.filter(owner_id=owner_id, event=AuditEvent.DOWNLOAD, share__isnull=False,
+                                  at__gte=max(since, rolled))
+        .values('share_id').annotate(n=Count('id')).order_by()
+    )
+    totals = {}
+    for row in list(hourly) + list(raw):
+        totals[row['share_id']] = totals.get(row['share_id'], 0) + row['n']
+    return totals
+
+
+def share_daily(share_id, since):
+    """[(date, downloads)] for one share, oldest first."""
+    rolled = rolled_until() or since
+    days = {}
+    hourly = (
+        AuditHourly.objects.filter(share_id=share_id, event=AuditEvent.DOWNLOAD,
+                                   hour__gte=since, hour__lt=rolled)
+        .annotate(day=TruncDate('hour')).values('day').annotate(n=Sum('count')).order_by()
+    )
+    raw = (
+        AuditEvent.objects.filter(share_id=share_id, event=AuditEvent.DOWNLOAD, at__gte=max(since, rolled))
+        .annotate(day=TruncDate('at')).values('day').annotate(n=Count('id')).order_by()
+    )
+    for row in list(hourly) + list(raw):
+        days[row['day']] = days.get(row['day'], 0) + row['n']
+    return sorted(days.items())
@@ -0,0 +1,206 @@
+# ==========================================================
+# ⏱️ benchmarks.py — Micro-benchmarks for storage / crypto / listing
+# ==========================================================
+"""
+Run with `python manage.py bench` (see that command for options).
+
+Each benchmark is a setup function registered with `@benchmark`. It gets
+one parameter (a file size in bytes or a row count), does its setup and
+returns the zero-argument callable that is actually timed. Everything runs
+inside a rolled-back transaction with MEDIA_ROOT pointed at a temp dir,
+so benchmarks never touch real data.
+"""
+import os
+import statistics
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import RequestFactory
+
+BENCHMARKS = {}
+
+DEFAULT_SIZES = [1024, 1024 * 1024, 16 * 1024 * 1024]
+DEFAULT_ROWS = [10, 100, 1000]
+
+
+def benchmark(name, param='size', values=None):
+    """
+    Register a benchmark. `param` is 'size' (bytes) or 'rows';
+    `values` overrides the default parameter list for slow cases.
+    """
+    def decorator(func):
+        BENCHMARKS[name] = {'setup': func, 'param': param, 'values': values}
+        return func
+    return decorator
+
+
+# ==========================================================
+# 🧰 Fixtures
+# ==========================================================
+def _user():
+    User = get_user_model()
+    user, _ = User.objects.get_or_create(
+        username='bench-user', defaults={'email': 'bench@example.com'}
+    )
+    return user
+
+
+def _blob(tmp_dir, size):
+    path = os.path.join(tmp_dir, f"blob_{size}_{uuid.uuid4().hex}.bin")
+    with open(path, 'wb') as f:
+        f.write(os.urandom(size))
+    return path
+
+
+def _files(user, rows):
+    from .models import File
+    files = [
+        File(user=user, name=f"f{i}.txt", original_name=f"f{i}.txt",
+             file=f"user_{user.id}/bench_{i}.txt")
+        for i in range(rows)
+    ]
+    File.objects.bulk_create(files)
+    # Give every row a real blob so safe_size hits the filesystem
+    for f in files:
+        f.file.storage.save(f.file.name, ContentFile(b'x' * 128))
+    return File.objects.filter(user=user, name__startswith='f')
+
+
+# ==========================================================
+# 🔒 Crypto
+# ==========================================================
+@benchmark('utils.encrypt_file')
+def bench_utils_encrypt_file(size, tmp_dir):
+    from . import utils
+    path = _blob(tmp_dir, size)
+    plaintext = open(path, 'rb').read()
+
+    def run():
+        with open(path, 'wb') as f:
+            f.write(plaintext)
+        utils.encrypt_file(path)
+    return run
+
+
+@benchmark('utils.decrypt_file')
+def bench_utils_decrypt_file(size, tmp_dir):
+    from . import utils
+    path = _blob(tmp_dir, size)
+    utils.encrypt_file(path)
+    return lambda: utils.decrypt_file(path)
+
+
+@benchmark('SharedFile.encrypt_file')
+def bench_shared_encrypt_file(size, tmp_dir):
+    from .models import SharedFile
+    shared = SharedFile(owner=_user(), name='bench.bin')
+    plaintext = os.urandom(size)
+    shared.file.save('bench.bin', ContentFile(plaintext))
+
+    def run():
+        shared.file.storage.overwrite(shared.file.name, plaintext)
+        shared.encrypt_file()
+    return run
+
+
+# ==========================================================
+# 📁 Storage / listing
+# ==========================================================
+@benchmark('user_upload_path', param='rows')
+def bench_user_upload_path(rows, tmp_dir):
+    from .models import File, user_upload_path
+    instance = File(user=_user())
+
+    def run():
+        for i in range(rows):
+            user_upload_path(instance, f"report_{i}.pdf")
+    return run
+
+
+@benchmark('dashboard.safe_size', param='rows')
+def bench_safe_size_loop(rows, tmp_dir):
+    from .views import add_listing_info
+    qs = _files(_user(), rows)
+    return lambda: add_listing_info(list(qs))
+
+
+@benchmark('download_private.body')
+def bench_download_body(size, tmp_dir):
+    from .views import file_download_response
+    path = _blob(tmp_dir, size)
+
+    def run():
+        response = file_download_response(path, 'bench.bin')
+        b''.join(response) if response.streaming else response.content
+    return run
+
+
+@benchmark('download_private.view')
+def bench_download_view(size, tmp_dir):
+    from .models import File
+    from .views import download_private
+    user = _user()
+    f = File.objects.create(user=user, name='bench.bin', original_name='bench.bin')
+    f.file.save('bench.bin', ContentFile(os.urandom(size)), save=True)
+    request = RequestFactory().get('/')
+    request.user = user
+
+    def run():
+        response = download_private(request, f.pk)
+        b''.join(response) if response.streaming else response.content
+    return run
+
+
+# ==========================================================
+# 🔐 Folder password
+# ==========================================================
+# PBKDF2 is deliberately slow, so keep the call counts small
+@benchmark('Folder.check_password', param='rows', values=[1, 5])
+def bench_check_password(rows, tmp_dir):
+    from django.contrib.auth.hashers import make_password
+    from .models import Folder
+    folder = Folder(user=_user(), name='bench', is_protected=True,
+                    password_hash=make_password('s3cret-pass'))
+
+    def run():
+        for _ in range(rows):
+            folder.check_password('s3cret-pass')
+    return run
+
+
+# ==========================================================
+# ▶️ Runner
+# ==========================================================
+def time_callable(func, repeat=5, warmup=1):
+    """Return timing stats (seconds) for `func` over `repeat` runs."""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return {
+        'min': min(samples),
+        'median': statistics.median(samples),
+        'mean': statistics.fmean(samples),
+        'repeat': repeat,
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Return a list of (name, baseline_median, current_median, ratio) for
+    benchmarks that got slower than `baseline * (1 + threshold)`.
+    """
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if not base or not base.get('median'):
+            continue
+        ratio = current['median'] / base['median']
+        if ratio > 1 + threshold:
+            regressions.append((name, base['median'], current['median'], ratio))
+    return regressions
@@ -0,0 +1,238 @@
+# ==========================================================
+# 🗜️ compression.py — Compression at rest for uploaded blobs
+# ==========================================================
+"""
+Uploads whose MIME type compresses well are stored compressed, with the
+codec chosen per type (COMPRESSION_CODECS: brotli for text, gzip for the
+old binary Office formats). Types that are already compressed (PDF, PNG,
+JPEG, MP4, MP3, and the zip-based .docx/.xlsx) are not listed, so they are
+stored as they are. The stage runs before anything else touches the stored
+bytes, so a blob that is later encrypted (shares, `rotate_keys`) is always
+compressed first; `sha256` on the row is that of the stored bytes.
+
+The row records the codec as an HTTP content-coding (`content_encoding`):
+downloads send the stored bytes untouched to clients whose
+Accept-Encoding allows it and decode on the fly for the rest.
+
+    with compression.encoded(uploaded_file, name) as (stored, encoding):
+        f.file.save(name, stored, save=False)
+"""
+import mimetypes
+import tempfile
+import time
+import zlib
+from contextlib import contextmanager
+from fnmatch import fnmatch
+
+from django.conf import settings
+from django.core.files import File as DjangoFile
+from django.core.files.storage import default_storage
+
+from . import metrics
+
+try:
+    import brotli
+except ModuleNotFoundError:
+    brotli = None
+
+CHUNK_SIZE = 1024 * 1024
+
+
+# ==========================================================
+# 🧰 Codecs (name = HTTP content-coding)
+# ==========================================================
+class _BrotliCompressor:
+    def __init__(self):
+        self._c = brotli.Compressor(quality=getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 5))
+
+    def compress(self, data):
+        return self._c.process(data)
+
+    def flush(self):
+        return self._c.finish()
+
+
+class _BrotliDecompressor:
+    def __init__(self):
+        self._d = brotli.Decompressor()
+
+    def decompress(self, data):
+        return self._d.process(data)
+
+    def flush(self):
+        return b''
+
+
+def _gzip_compressor():
+    # wbits=31: gzip framing, so the stored bytes are a valid `gzip` body
+    return zlib.compressobj(getattr(settings, 'COMPRESSION_GZIP_LEVEL', 6), zlib.DEFLATED, 31)
+
+
+def _gzip_decompressor():
+    return zlib.decompressobj(31)
+
+
+# name → (compressor factory, decompressor factory)
+CODECS = {'gzip': (_gzip_compressor, _gzip_decompressor)}
+if brotli is not None:
+    CODECS['br'] = (_BrotliCompressor, _BrotliDecompressor)
+
+
+def codec_for(filename):
+    """Codec to store `filename` with ('' = store as is)."""
+    if not getattr(settings, 'BLOB_COMPRESSION', False):
+        return ''
+    mime, _ = mimetypes.guess_type(filename or '')
+    if not mime:
+        return ''
+    for pattern, codec in getattr(settings, 'COMPRESSION_CODECS', {}).items():
+        if fnmatch(mime, pattern):
+            # Without the optional brotli package, gzip stands in
+            return codec if codec in CODECS else 'gzip'
+    return ''
+
+
+def compress_chunks(chunks, codec):
+    """Yield `chunks` compressed with `codec`, counting bytes and CPU time per codec."""
+    compressor = CODECS[codec][0]()
+    size_in = size_out = 0
+    cpu = 0.0
+    for chunk in chunks:
+        start = time.thread_time()
+        out = compressor.compress(chunk)
+        cpu += time.thread_time() - start
+        size_in += len(chunk)
+        size_out += len(out)
+        if out:
+            yield out
+    start = time.thread_time()
+    out = compressor.flush()
+    cpu += time.thread_time() - start
+    size_out += len(out)
+    _record(codec, 'compress', size_in, size_out, cpu)
+    if out:
+        yield out
+
+
+def decode_chunks(chunks, codec):
+    """Yield the decoded content of compressed `chunks`."""
+    decompressor = CODECS[codec][1]()
+    size_in = size_out = 0
+    cpu = 0.0
+    for chunk in chunks:
+        start = time.thread_time()
+        out = decompressor.decompress(chunk)
+        cpu += time.thread_time() - start
+        size_in += len(chunk)
+        size_out += len(out)
+        if out:
+            yield out
+    out = decompressor.flush()
+    size_out += len(out)
+    _record(codec, 'decompress', size_in, size_out, cpu)
+    if out:
+        yield out
+
+
+def _record(codec, op, size_in, size_out, cpu):
+    metrics.inc('blob_codec_bytes_total', size_in, codec=codec, op=op, side='in')
+    metrics.inc('blob_codec_bytes_total', size_out, codec=codec, op=op, side='out')
+    metrics.inc('blob_codec_cpu_seconds_total', cpu, codec=codec, op=op)
+
+
+# ==========================================================
+# 📥 Writing
+# ==========================================================
+@contextmanager
+def encoded(content, filename):
+    """
+    Yield (file to store, content_encoding) for an uploaded or Django File.
+    Content that doesn't shrink by COMPRESSION_MIN_SAVING is stored as is.
+    """
+    codec = codec_for(filename)
+    if not codec or content.size < getattr(settings, 'COMPRESSION_MIN_SIZE', 1024):
+        yield content, ''
+        return
+
+    with tempfile.TemporaryFile(dir=settings.FILE_UPLOAD_TEMP_DIR) as tmp:
+        for out in compress_chunks(content.chunks(), codec):
+            tmp.write(out)
+        content.seek(0)
+        if tmp.tell() > content.size * (1 - getattr(settings, 'COMPRESSION_MIN_SAVING', 0.1)):
+            yield content, ''
+            return
+        tmp.seek(0)
+        yield DjangoFile(tmp, name=content.name), codec
+
+
+# ==========================================================
+# 📤 Reading
+# ==========================================================
+def read_chunks(handle):
+    return iter(lambda: handle.read(CHUNK_SIZE), b'')
+
+
+def stream_decoded(handle, codec):
+    """Decoded content of an open blob, closing it when done (or when the response is)."""
+    with handle:
+        yield from decode_chunks(read_chunks(handle), codec)
+
+
+class DecodedFile:
+    """Read-only file object over a compressed blob, decoding as it is read."""
+
+    def __init__(self, handle, codec):
+        self._handle = handle
+        self._chunks = decode_chunks(read_chunks(handle), codec)
+        self._buffer = b''
+
+    def read(self, size=-1):
+        parts, have = [self._buffer], len(self._buffer)
+        while size < 0 or have < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            parts.append(chunk)
+            have += len(chunk)
+        data = b''.join(parts)
+        if size < 0:
+            self._buffer = b''
+            return data
+        self._buffer = data[size:]
+        return data[:size]
+
+    def close(self):
+        self._handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_decoded(name, codec):
+    """Open a stored blob for reading its content, whatever it is stored as."""
+    handle = default_storage.open(name, 'rb')
+    return DecodedFile(handle, codec) if codec else handle
+
+
+def accepts(accept_encoding, codec):
+    """Whether an Accept-Encoding header allows `codec` (q=0 refuses)."""
+    wildcard = None
+    for part in (accept_encoding or '').split(','):
+        token, _, params = part.partition(';')
+        token = token.strip().lower()
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if token == codec:
+            return q > 0
+        if token == '*':
+            wildcard = q > 0
+    return bool(wildcard)
@@ -0,0 +1,108 @@
+# ==========================================================
+# 🔀 db_router.py — Primary/replica routing for read-only views
+# ==========================================================
+"""
+Writes always go to `default`. Reads of sharing_app models go to the
+`replica` alias only inside views decorated with `@use_replica`, and
+never for a client that wrote recently (read-your-writes): a request
+that writes gets a short-lived cookie that pins that client to the
+primary for REPLICA_STICKY_SECONDS (see ReplicaStickinessMiddleware).
+
+Sessions, auth and every other app always read from `default`, so a
+lagging replica can't log anyone out.
+
+    @login_required
+    @use_replica
+    def dashboard(request): ...
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+
+REPLICA_ALIAS = 'replica'
+STICKY_COOKIE = 'db_primary_until'
+ROUTED_APPS = {'sharing_app'}
+
+_read_alias = contextvars.ContextVar('db_read_alias', default=None)
+_request_state = contextvars.ContextVar('db_request_state', default=None)
+_pinned = contextvars.ContextVar('db_pinned_to_primary', default=False)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+def sticky_seconds():
+    return getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+
+
+def reading_lagging_replica():
+    """True when reads in this context go to a replica that is a separate copy."""
+    if _read_alias.get() != REPLICA_ALIAS or not replica_configured():
+        return False
+    state = _request_state.get()
+    if state and state['wrote']:
+        return False
+    return (str(connections[REPLICA_ALIAS].settings_dict['NAME'])
+            != str(connections['default'].settings_dict['NAME']))
+
+
+def is_sticky(request):
+    """True while the client's read-your-writes cookie is valid."""
+    try:
+        return float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+@contextmanager
+def primary_only():
+    """Ignore `@use_replica` in this block (e.g. reading uncommitted data)."""
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+def use_replica(view):
+    """Serve GET/HEAD requests of a read-only view from the replica."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if (request.method not in ('GET', 'HEAD') or _pinned.get()
+                or not replica_configured() or is_sticky(request)):
+            return view(request, *args, **kwargs)
+        token = _read_alias.set(REPLICA_ALIAS)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _read_alias.reset(token)
+    return wrapper
+
+
+class ReplicaRouter:
+    """DATABASE_ROUTERS entry; see the module docstring."""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in ROUTED_APPS:
+            return None
+        state = _request_state.get()
+        if state and state['wrote']:
+            return None     # Read our own write from the primary
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state['wrote'] = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True         # Both aliases hold the same data
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_ALIAS  # The replica gets its schema by replication
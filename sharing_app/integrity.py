@@ -0,0 +1,167 @@
+# ==========================================================
+# 🩺 integrity.py — Stored checksums + background scrubbing
+# ==========================================================
+"""
+File and SharedFile rows keep the SHA-256 of their stored bytes (set on
+upload, updated whenever a blob is rewritten: share encryption, key
+rotation). The `scrub_blobs` job re-hashes blobs at SCRUB_MB_PER_SEC and
+stamps `last_verified_at`; a blob that no longer matches (or is gone) gets
+`is_corrupt` on every row that points at it, and downloads of it fail
+fast instead of sending bad bytes.
+
+Rows are picked most urgent first: shares created recently and not
+verified since, then never-verified rows, then the least recently
+verified, up to SCRUB_REVERIFY_DAYS old. Rows from before checksums
+existed get theirs recorded on first scrub.
+"""
+import hashlib
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .jobs import enqueue
+from .models import File, SharedFile
+from .utils import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+MODELS = [File, SharedFile]
+CHUNK_SIZE = 1024 * 1024
+BATCH_SIZE = 100
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# ==========================================================
+# #️⃣ Checksums
+# ==========================================================
+def sha256_chunks(chunks, limiter=None):
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        if limiter is not None:
+            limiter.wait(len(chunk))
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_sha256(content):
+    """SHA-256 of an uploaded/Django File, leaving it rewound for saving."""
+    digest = sha256_chunks(content.chunks())
+    content.seek(0)
+    return digest
+
+
+def blob_sha256(name, limiter=None):
+    with default_storage.open(name, 'rb') as f:
+        return sha256_chunks(iter(lambda: f.read(CHUNK_SIZE), b''), limiter)
+
+
+def record_checksum(name, digest):
+    """The blob `name` was (re)written with `digest`: update every row that points at it."""
+    now = timezone.now()
+    for model in MODELS:
+        model.objects.filter(file=name).update(sha256=digest, last_verified_at=now, is_corrupt=False)
+
+
+# ==========================================================
+# 🔍 Verification
+# ==========================================================
+def verify(name, limiter=None):
+    """
+    Re-hash one blob and update its rows. Returns 'ok', 'recorded' (no
+    checksum stored yet), 'corrupt' or 'missing'.
+    """
+    try:
+        actual = blob_sha256(name, limiter)
+    except FileNotFoundError:
+        actual = None
+    expected = _stored_checksums(name)
+
+    if actual is not None and expected - {'', actual}:
+        # The blob may have been rewritten (key rotation) while we hashed it:
+        # look once more before flagging anything
+        actual = blob_sha256(name, limiter)
+        expected = _stored_checksums(name)
+
+    now = timezone.now()
+    for model in MODELS:
+        rows = model.objects.filter(file=name)
+        if actual is None:
+            rows.update(last_verified_at=now, is_corrupt=True)
+            continue
+        rows.filter(sha256=actual).update(last_verified_at=now, is_corrupt=False)
+        rows.filter(sha256='').update(sha256=actual, last_verified_at=now, is_corrupt=False)
+        rows.exclude(sha256__in=['', actual]).update(last_verified_at=now, is_corrupt=True)
+
+    if actual is None:
+        logger.error("Integrity scrub: blob %s is missing", name)
+        return 'missing'
+    if expected - {'', actual}:
+        logger.error("Integrity scrub: blob %s does not match its checksum", name)
+        return 'corrupt'
+    return 'ok' if actual in expected else 'recorded'
+
+
+def _stored_checksums(name):
+    checksums = set()
+    for model in MODELS:
+        checksums.update(model.objects.filter(file=name).values_list('sha256', flat=True).distinct())
+    return checksums
+
+
+def _due(now):
+    """Querysets of blob names to verify, most urgent first."""
+    shared_since = now - timedelta(days=_setting('SCRUB_SHARED_DAYS', 7))
+    stale = now - timedelta(days=_setting('SCRUB_REVERIFY_DAYS', 30))
+    recently_shared = SharedFile.objects.filter(created_at__gte=shared_since).filter(
+        Q(last_verified_at__isnull=True) | Q(last_verified_at__lt=F('created_at'))
+    ).order_by('-created_at')
+    queues = [recently_shared]
+    queues += [model.objects.filter(last_verified_at__isnull=True).order_by('pk') for model in MODELS]
+    queues += [model.objects.filter(last_verified_at__lt=stale).order_by('last_verified_at') for model in MODELS]
+    return [qs.exclude(file='').values_list('file', flat=True) for qs in queues]
+
+
+def scrub(max_seconds=None, mb_per_sec=None):
+    """
+    Verify due blobs until `max_seconds` have passed or nothing is due.
+    Returns {status: count} plus 'bytes'.
+    """
+    max_seconds = max_seconds if max_seconds is not None else _setting('SCRUB_MAX_SECONDS', 600)
+    mb_per_sec = mb_per_sec if mb_per_sec is not None else _setting('SCRUB_MB_PER_SEC', 20)
+    limiter = RateLimiter(mb_per_sec and mb_per_sec * 1024 * 1024)
+    deadline = time.monotonic() + max_seconds
+    totals = {'ok': 0, 'recorded': 0, 'corrupt': 0, 'missing': 0, 'bytes': 0}
+    seen = set()
+
+    # Verified rows leave their queue, so each batch is simply the head of it
+    queues = _due(timezone.now())
+    while queues and time.monotonic() < deadline:
+        names = [name for name in queues[0][:BATCH_SIZE] if name not in seen]
+        if not names:
+            queues.pop(0)
+            continue
+        for name in names:
+            if time.monotonic() >= deadline:
+                break
+            seen.add(name)
+            status = verify(name, limiter)
+            totals[status] += 1
+            if status != 'missing':
+                totals['bytes'] += default_storage.size(name)
+    return totals
+
+
+def schedule_scrub(delay=None):
+    """Queue the next scrub run (once per slot)."""
+    interval = _setting('SCRUB_INTERVAL', 3600)
+    run_after = timezone.now() + timedelta(seconds=interval if delay is None else delay)
+    slot = int(run_after.timestamp()) // interval
+    enqueue('scrub_blobs', run_after=run_after, idempotency_key=f"scrub_blobs:{slot}")
@@ -0,0 +1,324 @@
+# ==========================================================
+# ⚙️ jobs.py — Lightweight DB-backed job queue
+# ==========================================================
+"""
+Jobs are rows in `sharing_app.Job`. Workers (see `manage.py runworker`)
+claim the highest-priority ready job with a conditional UPDATE, so it
+works on plain SQLite without SELECT ... FOR UPDATE or an external broker.
+
+Usage:
+
+    from sharing_app.jobs import job, enqueue
+
+    @job('purge_trash')
+    def purge_trash(days=30):
+        ...
+
+    enqueue('purge_trash', {'days': 7}, idempotency_key='purge:2025-11-25')
+"""
+import logging
+import os
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connections, transaction
+from django.db.models import Avg, Count, F, Min, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+
+# ==========================================================
+# 📋 Registry
+# ==========================================================
+JOB_REGISTRY = {}
+
+
+def job(name=None, queue='default', max_attempts=None):
+    """
+    Decorator: register a function as a background job.
+    The job payload is passed to it as keyword arguments.
+    """
+    def decorator(func):
+        job_name = name or f"{func.__module__}.{func.__name__}"
+        JOB_REGISTRY[job_name] = {
+            'func': func,
+            'queue': queue,
+            'max_attempts': max_attempts,
+        }
+        func.job_name = job_name
+        return func
+    return decorator
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# ==========================================================
+# ➕ Enqueue
+# ==========================================================
+def enqueue(name, payload=None, *, queue=None, priority=0,
+            idempotency_key=None, run_after=None, max_attempts=None):
+    """
+    Add a job to the queue and return it.
+    If `idempotency_key` was already used, the existing job is returned.
+    """
+    spec = JOB_REGISTRY.get(name, {})
+    fields = {
+        'name': name,
+        'payload': payload or {},
+        'queue': queue or spec.get('queue') or 'default',
+        'priority': priority,
+        'run_after': run_after or timezone.now(),
+        'max_attempts': (max_attempts or spec.get('max_attempts')
+                         or _setting('JOB_MAX_ATTEMPTS', 5)),
+    }
+
+    if not idempotency_key:
+        return Job.objects.create(**fields)
+
+    try:
+        with transaction.atomic():
+            return Job.objects.create(idempotency_key=idempotency_key, **fields)
+    except IntegrityError:
+        return Job.objects.get(idempotency_key=idempotency_key)
+
+
+# ==========================================================
+# 🔒 Claim / Complete
+# ==========================================================
+def _claimable(now, queues):
+    ready = Q(status=Job.STATUS_QUEUED, run_after__lte=now)
+    expired = Q(status=Job.STATUS_RUNNING, lease_expires_at__lt=now)
+    qs = Job.objects.filter(ready | expired)
+    if queues:
+        qs = qs.filter(queue__in=queues)
+    return qs
+
+
+def claim(worker_id, queues=None, lease_seconds=None):
+    """
+    Lease the next ready job for `worker_id`, or return None.
+    Expired leases (crashed workers) are picked up again.
+    """
+    lease_seconds = lease_seconds or _setting('JOB_LEASE_SECONDS', 300)
+
+    for _ in range(5):
+        now = timezone.now()
+        candidate = (
+            _claimable(now, queues)
+            .order_by('-priority', 'run_after', 'id')
+            .values_list('id', flat=True)
+            .first()
+        )
+        if candidate is None:
+            return None
+
+        # Compare-and-swap: only one worker wins the row
+        won = _claimable(now, queues).filter(pk=candidate).update(
+            status=Job.STATUS_RUNNING,
+            locked_by=worker_id,
+            lease_expires_at=now + timedelta(seconds=lease_seconds),
+            attempts=F('attempts') + 1,
+            started_at=now,
+        )
+        if won:
+            return Job.objects.get(pk=candidate)
+
+    return None
+
+
+def extend_lease(job_obj, worker_id, lease_seconds=None):
+    """Heartbeat: push the lease forward while a job is still running."""
+    lease_seconds = lease_seconds or _setting('JOB_LEASE_SECONDS', 300)
+    return Job.objects.filter(
+        pk=job_obj.pk, locked_by=worker_id, status=Job.STATUS_RUNNING
+    ).update(lease_expires_at=timezone.now() + timedelta(seconds=lease_seconds))
+
+
+def _retry_delay(attempts):
+    base = _setting('JOB_RETRY_BACKOFF_SECONDS', 10)
+    return min(base * (2 ** (attempts - 1)), 3600)
+
+
+def run_job(job_obj, worker_id):
+    """
+    Execute a claimed job and record the outcome.
+    Returns True on success.
+    """
+    owned = Job.objects.filter(pk=job_obj.pk, locked_by=worker_id)
+    spec = JOB_REGISTRY.get(job_obj.name)
+
+    if spec is None:
+        owned.update(status=Job.STATUS_FAILED, finished_at=timezone.now(),
+                     last_error=f"Unknown job '{job_obj.name}'")
+        logger.error("Unknown job %s (#%s)", job_obj.name, job_obj.pk)
+        return False
+
+    if job_obj.attempts > job_obj.max_attempts:
+        owned.update(status=Job.STATUS_FAILED, finished_at=timezone.now())
+        return False
+
+    try:
+        spec['func'](**(job_obj.payload or {}))
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning("Job %s #%s failed (attempt %s/%s)",
+                       job_obj.name, job_obj.pk, job_obj.attempts, job_obj.max_attempts)
+
+        if job_obj.attempts >= job_obj.max_attempts:
+            owned.update(status=Job.STATUS_FAILED, finished_at=timezone.now(),
+                         last_error=error, lease_expires_at=None)
+        else:
+            owned.update(
+                status=Job.STATUS_QUEUED,
+                run_after=timezone.now() + timedelta(seconds=_retry_delay(job_obj.attempts)),
+                last_error=error,
+                locked_by='',
+                lease_expires_at=None,
+            )
+        return False
+
+    owned.update(status=Job.STATUS_DONE, finished_at=timezone.now(), lease_expires_at=None)
+    return True
+
+
+# ==========================================================
+# 👷 Worker
+# ==========================================================
+def make_worker_id(suffix=''):
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    return f"{worker_id}:{suffix}" if suffix else worker_id
+
+
+class Worker:
+    """
+    Poll loop for one worker (thread or process).
+    A heartbeat thread extends the lease of long-running jobs.
+    """
+
+    def __init__(self, worker_id, queues=None, poll_interval=None,
+                 lease_seconds=None, stop_event=None):
+        self.worker_id = worker_id
+        self.queues = queues or None
+        self.poll_interval = poll_interval or _setting('JOB_POLL_INTERVAL', 1.0)
+        self.lease_seconds = lease_seconds or _setting('JOB_LEASE_SECONDS', 300)
+        self.stop_event = stop_event or threading.Event()
+
+    def _heartbeat(self, job_obj, done):
+        interval = max(self.lease_seconds / 3, 1)
+        while not done.wait(interval):
+            try:
+                extend_lease(job_obj, self.worker_id, self.lease_seconds)
+            except Exception:
+                logger.exception("Lease heartbeat failed for job #%s", job_obj.pk)
+            finally:
+                close_old_connections()
+
+    def run_once(self):
+        """Claim and run a single job. Returns False when the queue is empty."""
+        close_old_connections()
+        job_obj = claim(self.worker_id, self.queues, self.lease_seconds)
+        if job_obj is None:
+            return False
+
+        done = threading.Event()
+        beat = threading.Thread(target=self._heartbeat, args=(job_obj, done), daemon=True)
+        beat.start()
+        try:
+            run_job(job_obj, self.worker_id)
+        finally:
+            done.set()
+            beat.join()
+        return True
+
+    def run_forever(self, max_jobs=None, burst=False):
+        processed = 0
+        while not self.stop_event.is_set():
+            if max_jobs is not None and processed >= max_jobs:
+                break
+            if self.run_once():
+                processed += 1
+                continue
+            if burst:
+                break
+            self.stop_event.wait(self.poll_interval)
+        connections.close_all()  # this thread's connections only
+        return processed
+
+
+# ==========================================================
+# 📊 Queue Metrics
+# ==========================================================
+def queue_stats(window_minutes=60):
+    """
+    Queue depth and latency per queue.
+
+    - depth:           jobs ready to run now
+    - scheduled:       queued jobs waiting for `run_after`
+    - running/failed:  current counts
+    - oldest_wait_s:   age of the oldest ready job (queue latency)
+    - avg_wait_s:      mean time from `run_after` to start, recent jobs
+    - avg_runtime_s:   mean run time, recent jobs
+    """
+    now = timezone.now()
+    stats = {}
+
+    def bucket(queue):
+        return stats.setdefault(queue, {
+            'depth': 0, 'scheduled': 0, 'running': 0, 'failed': 0, 'done': 0,
+            'oldest_wait_s': 0.0, 'avg_wait_s': 0.0, 'avg_runtime_s': 0.0,
+        })
+
+    rows = Job.objects.exclude(status=Job.STATUS_QUEUED).values('queue', 'status').annotate(n=Count('id'))
+    for row in rows:
+        bucket(row['queue'])[row['status']] = row['n']
+
+    ready = (
+        Job.objects.filter(status=Job.STATUS_QUEUED, run_after__lte=now)
+        .values('queue').annotate(n=Count('id'), oldest=Min('run_after'))
+    )
+    for row in ready:
+        b = bucket(row['queue'])
+        b['depth'] = row['n']
+        b['oldest_wait_s'] = (now - row['oldest']).total_seconds()
+
+    scheduled = (
+        Job.objects.filter(status=Job.STATUS_QUEUED, run_after__gt=now)
+        .values('queue').annotate(n=Count('id'))
+    )
+    for row in scheduled:
+        bucket(row['queue'])['scheduled'] = row['n']
+
+    recent = (
+        Job.objects.filter(
+            status=Job.STATUS_DONE,
+            finished_at__gte=now - timedelta(minutes=window_minutes),
+        )
+        .values('queue')
+        .annotate(
+            wait=Avg(F('started_at') - F('run_after')),
+            runtime=Avg(F('finished_at') - F('started_at')),
+        )
+    )
+    for row in recent:
+        b = bucket(row['queue'])
+        b['avg_wait_s'] = _seconds(row['wait'])
+        b['avg_runtime_s'] = _seconds(row['runtime'])
+
+    return stats
+
+
+def _seconds(value):
+    if value is None:
+        return 0.0
+    if isinstance(value, timedelta):
+        return max(value.total_seconds(), 0.0)
+    # SQLite returns duration averages as microseconds
+    return max(float(value) / 1_000_000, 0.0)
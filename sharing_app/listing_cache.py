@@ -0,0 +1,81 @@
+# ==========================================================
+# 🗂️ listing_cache.py — Versioned cache for folder listings
+# ==========================================================
+"""
+dashboard/folder_view listings are cached under
+
+    listing:<user>:<folder>:<version>:<sort>:<cursor>
+
+where <version> is a per-folder counter kept in the same cache. Any change
+to a folder's contents (upload, rename, trash, restore, delete, move) bumps
+that counter (sharing_app.signals), so the next request builds a new key and
+old entries simply expire: invalidation is one INCR, never a key scan.
+
+Works with any Django cache backend that supports incr (locmem, file,
+redis, memcached); see CACHES['listings'] and LISTING_CACHE_TTL.
+
+    listing = listing_cache.get_listing(user.id, folder_id, sort, None, build)
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import db_router, metrics
+
+
+def _cache():
+    return caches[getattr(settings, 'LISTING_CACHE_ALIAS', 'default')]
+
+
+def _ttl():
+    return getattr(settings, 'LISTING_CACHE_TTL', 300)
+
+
+def enabled():
+    return _ttl() > 0
+
+
+def _version_key(user_id, folder_id):
+    return f"listing:v:{user_id}:{folder_id or 'root'}"
+
+
+def folder_version(user_id, folder_id):
+    """Current version of a folder; seeded from the clock so a cache flush can't reuse old keys."""
+    cache, key = _cache(), _version_key(user_id, folder_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns() // 1000, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump(user_id, folder_id):
+    """Invalidate every cached listing of one folder."""
+    if not enabled():
+        return
+    try:
+        _cache().incr(_version_key(user_id, folder_id))
+    except ValueError:
+        pass    # Never read (or evicted): the next read seeds a fresh version
+
+
+def get_listing(user_id, folder_id, sort, cursor, build):
+    """Return the cached listing, or `build()` it and cache the result."""
+    if not enabled():
+        return build()
+
+    cache = _cache()
+    version = folder_version(user_id, folder_id)
+    key = f"listing:{user_id}:{folder_id or 'root'}:{version}:{sort}:{cursor or 0}"
+    listing = cache.get(key)
+    if listing is not None:
+        metrics.inc('listing_cache_requests_total', result='hit')
+        return listing
+
+    metrics.inc('listing_cache_requests_total', result='miss')
+    listing = build()
+    # A lagging replica may predate the last bump: serve it, don't pin it
+    if not db_router.reading_lagging_replica():
+        cache.set(key, listing, _ttl())
+    return listing
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from sharing_app import audit
+
+
+class Command(BaseCommand):
+    help = (
+        "Roll complete hours of the audit log into AuditHourly now (what the "
+        "rollup_audit job does), and optionally apply retention (compact_audit)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--compact', action='store_true',
+                            help="Also delete raw events/rollups past their retention.")
+
+    def handle(self, *args, **opts):
+        audit.events.flush()    # Anything this process buffered
+        total_hours = total_rows = 0
+        while True:
+            hours, rows, more = audit.rollup()
+            total_hours += hours
+            total_rows += rows
+            if not more:
+                break
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Rolled up {total_hours} hour(s) into {total_rows} row(s); "
+            f"complete through {audit.rolled_until() or '—'}."
+        ))
+        if opts['compact']:
+            raw, hourly = audit.compact()
+            self.stdout.write(self.style.SUCCESS(
+                f"🧹 Deleted {raw} raw event(s) and {hourly} hourly row(s) past retention."
+            ))
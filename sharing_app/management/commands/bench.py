@@ -0,0 +1,104 @@
+import json
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+
+from sharing_app.benchmarks import BENCHMARKS, DEFAULT_ROWS, DEFAULT_SIZES, compare, time_callable
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _parse_size(text):
+    text = text.strip().upper()
+    for suffix, factor in (('GB', 1024 ** 3), ('MB', 1024 ** 2), ('KB', 1024), ('B', 1)):
+        if text.endswith(suffix):
+            return int(float(text[:-len(suffix)]) * factor)
+    return int(text)
+
+
+def _label(size_or_rows, param):
+    if param == 'rows':
+        return f"rows={size_or_rows}"
+    for suffix, factor in (('MB', 1024 ** 2), ('KB', 1024)):
+        if size_or_rows >= factor:
+            return f"size={size_or_rows // factor}{suffix}"
+    return f"size={size_or_rows}B"
+
+
+class Command(BaseCommand):
+    help = "Run sharing_app micro-benchmarks, save a JSON baseline and fail on regressions."
+
+    def add_arguments(self, parser):
+        parser.add_argument('-k', '--filter', default='', help="Only run benchmarks whose name contains this.")
+        parser.add_argument('--sizes', default='', help="File sizes, e.g. 1KB,1MB,16MB.")
+        parser.add_argument('--rows', default='', help="Row counts, e.g. 10,100,1000.")
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--save', default='', help="Write results to this JSON file.")
+        parser.add_argument('--compare', default='', help="Baseline JSON to compare against.")
+        parser.add_argument('--threshold', type=float, default=0.20,
+                            help="Allowed slowdown vs. baseline median (0.20 = 20%%).")
+        parser.add_argument('--list', action='store_true', help="List benchmarks and exit.")
+
+    def handle(self, *args, **opts):
+        if opts['list']:
+            for name, spec in BENCHMARKS.items():
+                self.stdout.write(f"{name}  ({spec['param']})")
+            return
+
+        sizes = [_parse_size(s) for s in opts['sizes'].split(',') if s.strip()] or None
+        rows = [int(r) for r in opts['rows'].split(',') if r.strip()] or None
+
+        results = {}
+        with tempfile.TemporaryDirectory(prefix='bench-') as tmp_dir:
+            with override_settings(MEDIA_ROOT=tmp_dir, PROTECTED_MEDIA_VOLUMES={}):
+                try:
+                    with transaction.atomic():
+                        self._run(results, tmp_dir, opts, sizes, rows)
+                        raise _Rollback
+                except _Rollback:
+                    pass
+
+        if opts['save']:
+            with open(opts['save'], 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            self.stdout.write(f"💾 Saved {len(results)} result(s) to {opts['save']}")
+
+        if opts['compare']:
+            if not os.path.exists(opts['compare']):
+                raise CommandError(f"Baseline not found: {opts['compare']}")
+            with open(opts['compare']) as f:
+                baseline = json.load(f)
+            regressions = compare(results, baseline, opts['threshold'])
+            for name, before, after, ratio in regressions:
+                self.stderr.write(f"❌ {name}: {before * 1000:.3f} ms → {after * 1000:.3f} ms ({ratio:.2f}x)")
+            if regressions:
+                raise CommandError(
+                    f"{len(regressions)} benchmark(s) regressed more than {opts['threshold']:.0%}."
+                )
+            self.stdout.write(self.style.SUCCESS("✅ No regressions against baseline."))
+
+    def _run(self, results, tmp_dir, opts, sizes, rows):
+        for name, spec in BENCHMARKS.items():
+            if opts['filter'] and opts['filter'] not in name:
+                continue
+
+            if spec['param'] == 'rows':
+                values = rows or spec['values'] or DEFAULT_ROWS
+            else:
+                values = sizes or spec['values'] or DEFAULT_SIZES
+
+            for value in values:
+                key = f"{name}[{_label(value, spec['param'])}]"
+                sid = transaction.savepoint()
+                func = spec['setup'](value, tmp_dir)
+                stats = time_callable(func, repeat=opts['repeat'])
+                transaction.savepoint_rollback(sid)
+                results[key] = stats
+                self.stdout.write(
+                    f"{key:<50} median {stats['median'] * 1000:9.3f} ms   min {stats['min'] * 1000:9.3f} ms"
+                )
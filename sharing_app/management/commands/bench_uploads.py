@@ -0,0 +1,135 @@
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory, override_settings
+
+from sharing_app.management.commands.bench import _parse_size
+from sharing_app.models import user_upload_path
+from sharing_app.upload_handlers import StagedUploadHandler
+
+BOUNDARY = 'bench-uploads-boundary'
+
+HANDLERS = {
+    'temp': (TemporaryFileUploadHandler, "temp file, then stored"),
+    'staged': (StagedUploadHandler, "staged on the volume, renamed"),
+}
+
+
+def _io():
+    """(bytes written, bytes read) through syscalls by this process so far, or None."""
+    try:
+        with open('/proc/self/io') as f:
+            fields = dict(line.split(': ') for line in f.read().splitlines())
+    except OSError:
+        return None
+    return int(fields['wchar']), int(fields['rchar'])
+
+
+def _body(data):
+    head = (
+        f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="file"; filename="bench.bin"\r\n'
+        'Content-Type: application/octet-stream\r\n\r\n'
+    ).encode()
+    return head + data + f'\r\n--{BOUNDARY}--\r\n'.encode()
+
+
+def _upload(body, handler):
+    """Parse one multipart upload and store it the way upload_file does; returns the stored name."""
+    request = RequestFactory().generic('POST', '/', body, content_type=f'multipart/form-data; boundary={BOUNDARY}')
+    request.upload_handlers = [MemoryFileUploadHandler(request), handler(request)]
+    uploaded = request.FILES['file']
+    try:
+        return default_storage.save(default_storage.generate_filename(user_upload_path(None, uploaded.name)), uploaded)
+    finally:
+        uploaded.close()
+
+
+def _run(body, size, handler, repeat):
+    seconds, written, read = [], [], []
+    for _ in range(repeat):
+        before = _io()
+        started = time.perf_counter()
+        name = _upload(body, handler)
+        os.sync()   # count the write-back too, not just the page cache
+        seconds.append(time.perf_counter() - started)
+        after = _io()
+        default_storage.delete(name)
+        if before and after:
+            written.append(after[0] - before[0])
+            read.append(after[1] - before[1])
+    return {
+        'size': size,
+        'median_seconds': statistics.median(seconds),
+        'mb_per_sec': size / (1024 * 1024) / statistics.median(seconds),
+        'bytes_written': statistics.median(written) if written else None,
+        'bytes_read': statistics.median(read) if read else None,
+    }
+
+
+def _fmt(nbytes):
+    for suffix, factor in (('GB', 1024 ** 3), ('MB', 1024 ** 2), ('KB', 1024)):
+        if nbytes >= factor:
+            return f"{nbytes / factor:.1f} {suffix}"
+    return f"{nbytes:.0f} B"
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare disk I/O of storing a large upload from Django's temp file with "
+        "staging it on the blob volume (StagedUploadHandler): bytes written and read, "
+        "and time to disk."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='16MB,64MB,256MB', help="Comma-separated upload sizes.")
+        parser.add_argument('--repeat', type=int, default=3, help="Uploads per size and handler (default 3).")
+        parser.add_argument('--temp-dir', default='',
+                            help="Temp dir for the `temp` handler (default FILE_UPLOAD_TEMP_DIR or the system one).")
+        parser.add_argument('--save', default='', help="Write results to this JSON file.")
+
+    def handle(self, *args, **opts):
+        if not hasattr(default_storage, 'staging_dir'):
+            raise CommandError("The default storage has no staging dir (only local volumes stage uploads).")
+        sizes = [_parse_size(s) for s in opts['sizes'].split(',') if s.strip()]
+        if any(size <= settings.FILE_UPLOAD_MAX_MEMORY_SIZE for size in sizes):
+            raise CommandError(
+                f"Sizes must be over FILE_UPLOAD_MAX_MEMORY_SIZE ({_fmt(settings.FILE_UPLOAD_MAX_MEMORY_SIZE)}); "
+                "smaller uploads stay in memory."
+            )
+        temp_dir = opts['temp_dir'] or settings.FILE_UPLOAD_TEMP_DIR or tempfile.gettempdir()
+        if os.stat(temp_dir).st_dev == os.stat(default_storage.staging_dir()).st_dev:
+            self.stdout.write(self.style.WARNING(
+                f"⚠️ {temp_dir} is on the same filesystem as the blob volume: the temp file is renamed "
+                "into place there too. Pass the production temp dir (or a tmpfs such as /dev/shm) "
+                "as --temp-dir to see the copy."
+            ))
+        if _io() is None:
+            self.stdout.write("⚠️ /proc/self/io is not readable: only timings are reported.")
+
+        results = {}
+        with override_settings(FILE_UPLOAD_TEMP_DIR=temp_dir):
+            for size in sizes:
+                body = _body(os.urandom(size))
+                for mode, (handler, description) in HANDLERS.items():
+                    result = results[f"{mode}:{size}"] = _run(body, size, handler, opts['repeat'])
+                    io = (
+                        f"wrote {_fmt(result['bytes_written']):>9} ({result['bytes_written'] / size:.2f}x)  "
+                        f"read {_fmt(result['bytes_read']):>9}  "
+                        if result['bytes_written'] is not None else ""
+                    )
+                    self.stdout.write(
+                        f"{_fmt(size):>8}  {mode:<7} {description:<31} {io}"
+                        f"{result['median_seconds'] * 1000:8.1f} ms  {result['mb_per_sec']:7.1f} MB/s"
+                    )
+
+        if opts['save']:
+            with open(opts['save'], 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            self.stdout.write(f"💾 Saved {len(results)} result(s) to {opts['save']}")
@@ -0,0 +1,138 @@
+import hashlib
+import io
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sharing_app import versions
+from sharing_app.management.commands.bench import _parse_size
+
+
+# Each scenario turns version n-1 into version n
+def _edit(data, rnd):
+    at = rnd.randrange(len(data) - 100)
+    return data[:at] + rnd.randbytes(100) + data[at + 100:]
+
+
+def _insert(data, rnd):
+    at = rnd.randrange(len(data))
+    return data[:at] + rnd.randbytes(1024) + data[at:]
+
+
+def _prepend(data, rnd):
+    return rnd.randbytes(1024) + data
+
+
+def _append(data, rnd):
+    return data + rnd.randbytes(64 * 1024)
+
+
+def _rewrite(data, rnd):
+    block = len(data) // 20
+    at = rnd.randrange(len(data) - block)
+    return data[:at] + rnd.randbytes(block) + data[at + block:]
+
+
+SCENARIOS = {
+    'edit': (_edit, "overwrite 100 B in place"),
+    'insert': (_insert, "insert 1 KB at a random offset"),
+    'prepend': (_prepend, "insert 1 KB at the start"),
+    'append': (_append, "append 64 KB"),
+    'rewrite': (_rewrite, "rewrite a random 5% block"),
+}
+
+
+def _run(mutate, size, count, seed):
+    """
+    Store `count` versions the way versions.py does: the superseded ones as
+    chunks in one per-owner store, the latest as a full copy (File.file).
+    """
+    rnd = random.Random(seed)
+    data = rnd.randbytes(size)
+    store = {}
+    logical = new_bytes = chunked = 0
+    seconds = 0.0
+    for n in range(count):
+        if n:
+            data = mutate(data, rnd)
+        logical += len(data)
+        if n == count - 1:
+            break   # Current: not chunked
+        added = 0
+        started = time.perf_counter()
+        for piece in versions.iter_chunks(io.BytesIO(data)):
+            digest = hashlib.sha256(piece).hexdigest()
+            if digest not in store:
+                store[digest] = len(piece)
+                added += len(piece)
+        seconds += time.perf_counter() - started
+        chunked += len(data)
+        if n:
+            new_bytes += added
+    history = sum(store.values())
+    stored = history + len(data)
+    return {
+        'versions': count,
+        'latest_bytes': len(data),
+        'logical_bytes': logical,
+        'history_bytes': history,
+        'stored_bytes': stored,
+        'chunks': len(store),
+        'amplification': stored / len(data),
+        'vs_full_copies': stored / logical,
+        'new_bytes_per_version': new_bytes / max(count - 2, 1),
+        'chunk_mb_per_sec': chunked / (1024 * 1024) / seconds if seconds else 0.0,
+    }
+
+
+def _fmt(nbytes):
+    for suffix, factor in (('MB', 1024 ** 2), ('KB', 1024)):
+        if nbytes >= factor:
+            return f"{nbytes / factor:.1f} {suffix}"
+    return f"{nbytes:.0f} B"
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure storage amplification of file versions: store a series of edited "
+        "versions per scenario (older ones as chunks, the latest as a full copy) and "
+        "compare stored bytes with the latest size and with full copies."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', default='20MB', help="Size of version 1 (default 20MB).")
+        parser.add_argument('--versions', type=int, default=10, help="Versions per series (default 10).")
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                            help=f"Comma-separated subset of: {', '.join(SCENARIOS)}.")
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--save', default='', help="Write results to this JSON file.")
+
+    def handle(self, *args, **opts):
+        names = [s.strip() for s in opts['scenarios'].split(',') if s.strip()]
+        unknown = [s for s in names if s not in SCENARIOS]
+        if unknown:
+            raise CommandError(f"Unknown scenario(s): {', '.join(unknown)}")
+        if opts['versions'] < 1:
+            raise CommandError("--versions must be at least 1.")
+        size = _parse_size(opts['size'])
+
+        results = {}
+        for name in names:
+            mutate, description = SCENARIOS[name]
+            result = results[name] = _run(mutate, size, opts['versions'], opts['seed'])
+            self.stdout.write(
+                f"{name:<8} {description:<32} "
+                f"stored {_fmt(result['stored_bytes']):>9} (history {_fmt(result['history_bytes']):>9}) "
+                f"for {_fmt(result['logical_bytes']):>9} logical  "
+                f"amplification {result['amplification']:.3f}x latest, "
+                f"{result['vs_full_copies']:.1%} of full copies  "
+                f"new/version {_fmt(result['new_bytes_per_version']):>9}  "
+                f"{result['chunk_mb_per_sec']:.1f} MB/s"
+            )
+
+        if opts['save']:
+            with open(opts['save'], 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            self.stdout.write(f"💾 Saved {len(results)} result(s) to {opts['save']}")
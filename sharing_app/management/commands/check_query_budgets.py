@@ -0,0 +1,145 @@
+from contextlib import ExitStack
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from sharing_app.db_router import primary_only
+from sharing_app.models import File, Folder
+
+# Max queries per view, independent of how many rows are listed.
+# Includes session + auth lookups done by middleware.
+QUERY_BUDGETS = {
+    'dashboard': 4,
+    'folder_view': 5,
+    'trash_view': 3,
+    'recent_files': 3,
+    'share_file': 5,
+}
+
+DEFAULT_ROWS = [10, 100, 1000]
+
+
+class _Rollback(Exception):
+    pass
+
+
+class _AllQueries:
+    """CaptureQueriesContext over every DB alias (listings may use the replica)."""
+
+    def __init__(self):
+        self.captures = [CaptureQueriesContext(connections[alias]) for alias in connections]
+
+    def __enter__(self):
+        self.stack = ExitStack()
+        for capture in self.captures:
+            self.stack.enter_context(capture)
+        return self
+
+    def __exit__(self, *exc):
+        return self.stack.__exit__(*exc)
+
+    @property
+    def captured_queries(self):
+        return [q for capture in self.captures for q in capture.captured_queries]
+
+    def __len__(self):
+        return sum(len(capture) for capture in self.captures)
+
+
+class Command(BaseCommand):
+    help = (
+        "Render the listing views at several row counts and fail if any view "
+        "exceeds its query budget or its query count grows with the rows (N+1)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', default=','.join(map(str, DEFAULT_ROWS)))
+        parser.add_argument('--verbose-sql', action='store_true',
+                            help="Print every query, not only for failing views.")
+
+    def handle(self, *args, **opts):
+        rows_list = [int(r) for r in opts['rows'].split(',') if r.strip()]
+        counts = {}
+        failures = []
+
+        for rows in rows_list:
+            try:
+                # The fixture is uncommitted, so every read must use the primary
+                with transaction.atomic(), primary_only():
+                    for view, captured in self._render_all(rows):
+                        counts.setdefault(view, {})[rows] = len(captured)
+                        over = len(captured) > QUERY_BUDGETS[view]
+                        self.stdout.write(
+                            f"{'❌' if over else '✅'} {view:<14} rows={rows:<6} "
+                            f"{len(captured):>3} queries (budget {QUERY_BUDGETS[view]})"
+                        )
+                        if over:
+                            failures.append(f"{view} at {rows} rows: {len(captured)} queries")
+                        if over or opts['verbose_sql']:
+                            self._print_sql(captured)
+                    raise _Rollback
+            except _Rollback:
+                pass
+
+        # Fixed cost: the count must not change with the number of rows
+        for view, by_rows in counts.items():
+            if len(set(by_rows.values())) > 1:
+                failures.append(f"{view} query count grows with rows: {by_rows}")
+
+        if failures:
+            raise CommandError("Query budget exceeded:\n  " + "\n  ".join(failures))
+        self.stdout.write(self.style.SUCCESS("✅ All views within their query budgets."))
+
+    def _print_sql(self, captured):
+        for i, query in enumerate(captured.captured_queries, 1):
+            self.stdout.write(f"    {i:>3}. {query['sql']}")
+
+    # ------------------------------------------------------
+    def _fixture(self, rows):
+        User = get_user_model()
+        user = User.objects.create(username=f'budget-{rows}', email=f'budget-{rows}@example.com')
+        parent = Folder.objects.create(user=user, name='budget-parent')
+        Folder.objects.bulk_create([
+            Folder(user=user, name=f'f{i}', parent=parent if i % 2 else None,
+                   is_protected=not i % 5, password_hash='x' if not i % 5 else None)
+            for i in range(rows)
+        ])
+        now = timezone.now()
+        File.objects.bulk_create(
+            [File(user=user, name=f'r{i}.txt', original_name=f'r{i}.txt', file=f'user_{user.id}/r{i}.txt')
+             for i in range(rows)]
+            + [File(user=user, folder=parent, name=f'p{i}.txt', original_name=f'p{i}.txt',
+                    file=f'user_{user.id}/p{i}.txt') for i in range(rows)]
+            + [File(user=user, folder=parent, name=f't{i}.txt', original_name=f't{i}.txt',
+                    file=f'user_{user.id}/t{i}.txt', is_deleted=True, deleted_at=now)
+               for i in range(rows)]
+        )
+        return user, parent
+
+    def _render_all(self, rows):
+        # Listing cache bumps wait for a commit that never comes: run them now,
+        # or a rolled-back fixture's reused pks would hit the previous listing
+        with TestCase.captureOnCommitCallbacks(execute=True):
+            user, parent = self._fixture(rows)
+        target = File.objects.filter(user=user, is_deleted=False).first()
+        client = Client()
+        client.force_login(user)
+
+        urls = {
+            'dashboard': reverse('sharing:dashboard'),
+            'folder_view': reverse('sharing:folder_view', args=[parent.id]),
+            'trash_view': reverse('sharing:trash'),
+            'recent_files': reverse('sharing:recent_files'),
+            'share_file': reverse('sharing:share_file', args=[target.id]),
+        }
+        for view, url in urls.items():
+            with _AllQueries() as captured:
+                response = client.get(url)
+            if response.status_code != 200:
+                raise CommandError(f"{view} returned HTTP {response.status_code}")
+            yield view, captured
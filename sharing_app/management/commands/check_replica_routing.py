@@ -0,0 +1,153 @@
+import os
+import sqlite3
+import tempfile
+import threading
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from sharing_app.db_router import REPLICA_ALIAS, STICKY_COOKIE
+from sharing_app.models import File
+
+
+class Command(BaseCommand):
+    help = (
+        "Check primary/replica routing on two scratch SQLite files: listings read "
+        "from the replica, a lagging replica serves stale listings, and a client "
+        "that just wrote reads its own write (sticky primary)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lag', type=float, default=0.5,
+                            help="Replication interval (seconds) for the lag soak test.")
+        parser.add_argument('--iterations', type=int, default=10,
+                            help="Upload + listing round trips per soak run.")
+
+    def handle(self, *args, **opts):
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError("check_replica_routing uses scratch SQLite files.")
+        if REPLICA_ALIAS not in connections.databases:
+            raise CommandError(f"No '{REPLICA_ALIAS}' database configured.")
+
+        aliases = ('default', REPLICA_ALIAS)
+        originals = {alias: connections[alias].settings_dict['NAME'] for alias in aliases}
+        self.failures = []
+
+        # No listing cache: every dashboard hit must show what the DB returned
+        with tempfile.TemporaryDirectory(prefix='replica-check-') as tmp_dir, \
+                override_settings(MEDIA_ROOT=os.path.join(tmp_dir, 'media'), PROTECTED_MEDIA_VOLUMES={},
+                                  LISTING_CACHE_TTL=0):
+            self.primary = os.path.join(tmp_dir, 'primary.sqlite3')
+            self.replica = os.path.join(tmp_dir, 'replica.sqlite3')
+            try:
+                connections.close_all()
+                connections['default'].settings_dict['NAME'] = self.primary
+                connections[REPLICA_ALIAS].settings_dict['NAME'] = self.replica
+                call_command('migrate', verbosity=0, interactive=False)
+                self._scenarios(opts)
+            finally:
+                connections.close_all()
+                for alias, name in originals.items():
+                    connections[alias].settings_dict['NAME'] = name
+
+        if self.failures:
+            raise CommandError("Replica routing checks failed:\n  " + "\n  ".join(self.failures))
+        self.stdout.write(self.style.SUCCESS("✅ Replica routing checks passed."))
+
+    # ------------------------------------------------------
+    def _sync(self):
+        """'Replicate': copy the primary onto the replica file."""
+        src, dst = sqlite3.connect(self.primary), sqlite3.connect(self.replica)
+        try:
+            src.backup(dst)
+        finally:
+            src.close()
+            dst.close()
+
+    def _check(self, ok, label):
+        self.stdout.write(f"{'✅' if ok else '❌'} {label}")
+        if not ok:
+            self.failures.append(label)
+
+    def _dashboard(self, client):
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections[REPLICA_ALIAS]) as replica:
+            response = client.get(reverse('sharing:dashboard'))
+        if response.status_code != 200:
+            raise CommandError(f"dashboard returned HTTP {response.status_code}")
+        listing = lambda captured: sum('sharing_app_file' in q['sql'] for q in captured.captured_queries)
+        return response.content.decode(), listing(primary), listing(replica)
+
+    def _upload(self, client, name):
+        client.post(reverse('sharing:upload_file'), {'file': SimpleUploadedFile(name, b'replica check')})
+        # Drop the "uploaded" flash message: it would put the name in any page
+        client.cookies.pop('messages', None)
+
+    def _scenarios(self, opts):
+        user = get_user_model().objects.create(username='replica-check', email='replica@example.com')
+        File.objects.create(user=user, name='synced.txt', original_name='synced.txt', file='check/synced.txt')
+        self._sync()
+
+        client = Client()
+        client.force_login(user)
+
+        html, on_primary, on_replica = self._dashboard(client)
+        self._check(on_replica and not on_primary and 'synced.txt' in html,
+                    f"listing reads from the replica (primary={on_primary}, replica={on_replica})")
+
+        # Lag: a write the replica hasn't received yet
+        File.objects.create(user=user, name='lagged.txt', original_name='lagged.txt', file='check/lagged.txt')
+        html, _, _ = self._dashboard(client)
+        self._check('lagged.txt' not in html, "a lagging replica serves the stale listing")
+
+        # Read-your-writes: the upload response pins this client to the primary
+        self._upload(client, 'mine.txt')
+        self._check(STICKY_COOKIE in client.cookies, "a write sets the sticky-primary cookie")
+        html, on_primary, _ = self._dashboard(client)
+        self._check(on_primary and 'mine.txt' in html, "the writer sees its upload before replication")
+
+        del client.cookies[STICKY_COOKIE]
+        html, _, _ = self._dashboard(client)
+        self._check('mine.txt' not in html, "without the cookie the listing is from the replica again")
+
+        self._sync()
+        html, _, _ = self._dashboard(client)
+        self._check('mine.txt' in html and 'lagged.txt' in html, "the replica catches up after replication")
+
+        # Soak: replicate every --lag seconds while uploading and listing
+        stale_sticky = self._soak(client, opts, sticky=True)
+        stale_plain = self._soak(client, opts, sticky=False)
+        self.stdout.write(
+            f"   soak (lag {opts['lag']}s, {opts['iterations']} round trips): "
+            f"stale reads {stale_sticky} with stickiness, {stale_plain} without"
+        )
+        self._check(stale_sticky == 0, "no stale read-after-write with stickiness under lag")
+
+    def _soak(self, client, opts, sticky):
+        stop = threading.Event()
+
+        def replicator():
+            while not stop.wait(opts['lag']):
+                self._sync()
+
+        thread = threading.Thread(target=replicator, daemon=True)
+        thread.start()
+        stale = 0
+        try:
+            for i in range(opts['iterations']):
+                name = f"soak_{'s' if sticky else 'p'}_{i}.txt"
+                self._upload(client, name)
+                if not sticky:
+                    client.cookies.pop(STICKY_COOKIE, None)
+                html, _, _ = self._dashboard(client)
+                stale += name not in html
+        finally:
+            stop.set()
+            thread.join()
+        return stale
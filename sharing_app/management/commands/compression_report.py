@@ -0,0 +1,107 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
+from django.template.defaultfilters import filesizeformat
+
+from sharing_app import compression
+from sharing_app.models import File
+
+
+def _cpu(func, data):
+    start = time.thread_time()
+    out = func(data)
+    return out, time.thread_time() - start
+
+
+def _compress(codec, data):
+    compressor = compression.CODECS[codec][0]()
+    return compressor.compress(data) + compressor.flush()
+
+
+def _decompress(codec, data):
+    decompressor = compression.CODECS[codec][1]()
+    return decompressor.decompress(data) + decompressor.flush()
+
+
+def _rate(nbytes, seconds):
+    return f"{nbytes / (1024 * 1024) / seconds:8.1f} MB/s" if seconds else "       - MB/s"
+
+
+class Command(BaseCommand):
+    help = (
+        "Report disk saved by compression at rest, per codec, and the CPU cost of each "
+        "available codec on a sample of compressible stored files."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sample', type=int, default=20,
+                            help="Most recent compressible files to time the codecs on (default 20; 0 = skip).")
+
+    def handle(self, *args, **opts):
+        self._disk_saved()
+        if opts['sample'] > 0:
+            self._cpu_cost(opts['sample'])
+
+    def _disk_saved(self):
+        self.stdout.write("💾 Disk saved (all files, Trash included):")
+        rows = (File.objects.values('content_encoding')
+                .annotate(files=Count('pk'), content=Sum('size'), stored=Sum(Coalesce('stored_size', 'size')))
+                .order_by('content_encoding'))
+        total_saved = 0
+        for row in rows:
+            saved = row['content'] - row['stored']
+            total_saved += saved
+            ratio = row['stored'] / row['content'] if row['content'] else 1
+            self.stdout.write(
+                f"  {row['content_encoding'] or '(as is)':<8} {row['files']:>7} file(s)  "
+                f"{filesizeformat(row['content']):>10} → {filesizeformat(row['stored']):>10}  "
+                f"saved {filesizeformat(saved):>10}  ({ratio:.1%} of original)"
+            )
+        self.stdout.write(self.style.SUCCESS(f"  Total saved: {filesizeformat(total_saved)}"))
+
+        # Uploaded before compression was on, or didn't shrink enough
+        plain = sum(
+            1 for name in File.objects.filter(content_encoding='').values_list('original_name', flat=True).iterator()
+            if compression.codec_for(name)
+        )
+        if plain:
+            self.stdout.write(f"  {plain} file(s) of a compressible type are stored as is.")
+
+    def _cpu_cost(self, sample):
+        candidates = File.objects.filter(is_deleted=False, is_corrupt=False, is_encrypted=False).order_by('-pk')
+        contents = []
+        for pk, name, blob, encoding in candidates.values_list(
+                'pk', 'original_name', 'file', 'content_encoding').iterator():
+            if len(contents) >= sample:
+                break
+            if not (encoding or compression.codec_for(name)):
+                continue
+            try:
+                with compression.open_decoded(blob, encoding) as f:
+                    contents.append(f.read())
+            except OSError:
+                continue
+        if not contents:
+            self.stdout.write("⏱️ No compressible files to sample.")
+            return
+
+        total = sum(len(data) for data in contents)
+        self.stdout.write(
+            f"⏱️ CPU cost per codec ({len(contents)} file(s), {filesizeformat(total)}, one thread):"
+        )
+        for codec in compression.CODECS:
+            stored = compress_cpu = decompress_cpu = 0.0
+            for data in contents:
+                packed, seconds = _cpu(lambda d: _compress(codec, d), data)
+                compress_cpu += seconds
+                stored += len(packed)
+                _, seconds = _cpu(lambda d: _decompress(codec, d), packed)
+                decompress_cpu += seconds
+            mb = total / (1024 * 1024)
+            self.stdout.write(
+                f"  {codec:<5} ratio {stored / total:6.1%}  "
+                f"compress {_rate(total, compress_cpu)} ({compress_cpu * 1000 / mb:7.1f} ms CPU/MB)  "
+                f"decompress {_rate(total, decompress_cpu)} ({decompress_cpu * 1000 / mb:6.1f} ms CPU/MB)"
+            )
@@ -0,0 +1,135 @@
+import os
+import posixpath
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from sharing_app.models import File, SharedFile, UploadedFile
+from sharing_app.storage import ShardedStorage, copy_blob
+from sharing_app.utils import RateLimiter
+
+# Per-user directories of the old `user_upload_path`
+LEGACY_USER_DIR = re.compile(r'^user_\d+$')
+
+
+def _place_blob(src, dst):
+    """
+    Make `dst` a complete copy of `src` without touching `src`
+    (runs in a pool thread). Returns (status, error).
+    """
+    try:
+        if os.path.exists(dst):
+            return 'present', None
+        if not os.path.exists(src):
+            return 'missing', None
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        try:
+            # Same filesystem: a hard link is instant and atomic
+            os.link(src, dst)
+        except OSError:
+            copy_blob(src, dst)
+        return 'placed', None
+    except Exception as e:
+        return 'failed', f"{type(e).__name__}: {e}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Move blobs from the legacy flat layout (user_<id>/...) into the "
+        "sharded layout and update File/SharedFile/UploadedFile rows in batches. "
+        "Online: a blob is copied/linked first, rows are switched, then the old "
+        "path is removed. Safe to interrupt and re-run."
+    )
+
+    MODELS = [File, SharedFile, UploadedFile]
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--max-files-per-sec', type=float, default=None)
+        parser.add_argument('--dry-run', action='store_true', help="Only count legacy blobs.")
+
+    def handle(self, *args, **opts):
+        storage = default_storage
+        if not isinstance(storage, ShardedStorage):
+            raise CommandError("STORAGES['default'] is not sharing_app.storage.ShardedStorage.")
+        self.storage = storage
+        prefixes = [f"{label}/" for label in storage.volumes]
+
+        if opts['dry_run']:
+            for model in self.MODELS:
+                self.stdout.write(f"{model.__name__}: {self._legacy(model, prefixes).count()} legacy row(s)")
+            return
+
+        limiter = RateLimiter(opts['max_files_per_sec'])
+        totals = {'moved': 0, 'missing': 0, 'failed': 0, 'rows': 0}
+
+        with ThreadPoolExecutor(max_workers=opts['workers']) as pool:
+            for model in self.MODELS:
+                last_pk = 0
+                while True:
+                    rows = list(
+                        self._legacy(model, prefixes).filter(pk__gt=last_pk)
+                        .order_by('pk').values_list('pk', 'file')[:opts['batch_size']]
+                    )
+                    if not rows:
+                        break
+                    last_pk = rows[-1][0]
+                    self._migrate_batch(pool, limiter, {name for _, name in rows}, totals)
+                    self.stdout.write(f"  {model.__name__}: up to #{last_pk} ({totals['moved']} moved)")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Moved {totals['moved']} blob(s), updated {totals['rows']} row(s); "
+            f"{totals['missing']} missing, {totals['failed']} failed."
+        ))
+
+    def _legacy(self, model, prefixes):
+        qs = model.objects.exclude(file='')
+        for prefix in prefixes:
+            qs = qs.exclude(file__startswith=prefix)
+        return qs
+
+    def _target(self, name):
+        """`user_<id>/<uuid>_<file>` → `<uuid>_<file>`; other dirs are kept."""
+        dirname, basename = posixpath.split(name)
+        return basename if LEGACY_USER_DIR.match(dirname) else name
+
+    def _migrate_batch(self, pool, limiter, names, totals):
+        storage = self.storage
+        plan = {name: storage.shard_name(self._target(name)) for name in names}
+
+        futures = {}
+        for old, new in plan.items():
+            limiter.wait(1)
+            futures[old] = pool.submit(_place_blob, storage.path(old), storage.path(new))
+
+        mapping = {}
+        for old, future in futures.items():
+            status, error = future.result()
+            if status == 'missing':
+                totals['missing'] += 1
+                self.stderr.write(f"⚠️ Missing blob: {old}")
+            elif status == 'failed':
+                totals['failed'] += 1
+                self.stderr.write(f"❌ {old}: {error}")
+            else:
+                mapping[old] = plan[old]
+        if not mapping:
+            return
+
+        # Switch every row that points at a moved blob (shares reuse File paths)
+        with transaction.atomic():
+            for model in self.MODELS:
+                objs = list(model.objects.filter(file__in=list(mapping)).only('pk', 'file'))
+                for obj in objs:
+                    obj.file = mapping[obj.file.name]
+                model.objects.bulk_update(objs, ['file'], batch_size=500)
+                totals['rows'] += len(objs)
+
+        # Rows are committed → the old names are unreferenced
+        for old in mapping:
+            storage.delete(old)
+        totals['moved'] += len(mapping)
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from sharing_app.tasks import purge_expired_trash, schedule_purge_trash
+
+
+class Command(BaseCommand):
+    help = (
+        "Permanently delete files that sat in Trash longer than TRASH_RETENTION_DAYS now "
+        "(what the purge_trash job does), or start the recurring purge_trash job with --enqueue."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help="Retention in days (default TRASH_RETENTION_DAYS).")
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--enqueue', action='store_true',
+                            help="Queue the self-rescheduling purge_trash job instead of purging here.")
+
+    def handle(self, *args, **opts):
+        if opts['enqueue']:
+            schedule_purge_trash(delay=0)
+            self.stdout.write(self.style.SUCCESS(
+                "✅ purge_trash queued; it reschedules itself every TRASH_PURGE_INTERVAL."
+            ))
+            return
+
+        total = 0
+        while True:
+            purged, more = purge_expired_trash(opts['days'], opts['batch_size'])
+            total += purged
+            if not more:
+                break
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Purged {total} file(s) from Trash; their blobs are queued as delete_blob jobs "
+            "(blobs still used by a share are kept)."
+        ))
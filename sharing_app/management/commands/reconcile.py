@@ -0,0 +1,277 @@
+import hashlib
+import heapq
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.template.defaultfilters import filesizeformat
+
+from sharing_app.models import Chunk, File, FileVersion, SharedFile, UploadedFile
+from sharing_app.storage import STAGING_DIR, ShardedStorage
+
+QUARANTINE_DIR = '.quarantine'
+
+
+def _is_shard_path(rel):
+    """True for `.../ab/cd/<base>` where ab/cd is the hash of <base> (see shard_name)."""
+    parts = rel.split('/')
+    if len(parts) < 3:
+        return False
+    digest = hashlib.md5(parts[-1].encode(), usedforsecurity=False).hexdigest()
+    return parts[-3] == digest[:2] and parts[-2] == digest[2:4]
+
+
+def _walk(path, rel=''):
+    """Yield (relative name, absolute path, size, mtime) of every file below `path`."""
+    try:
+        with os.scandir(path) as it:
+            entries = list(it)
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        name = f"{rel}{entry.name}"
+        if entry.is_dir(follow_symlinks=False):
+            yield from _walk(entry.path, f"{name}/")
+        elif entry.is_file(follow_symlinks=False):
+            st = entry.stat(follow_symlinks=False)
+            yield name, entry.path, st.st_size, st.st_mtime
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the blobs on disk with the names stored in File, SharedFile, "
+        "UploadedFile, FileVersion and Chunk. Reports orphaned blobs (no row), missing blobs (row without "
+        "a file) and their sizes; orphans can be quarantined or deleted."
+    )
+
+    # (model, FileField) pairs that reference blobs
+    FIELDS = [(File, 'file'), (SharedFile, 'file'), (UploadedFile, 'file'),
+              (FileVersion, 'blob'), (Chunk, 'blob')]
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--min-age', type=int, default=3600,
+                            help="Ignore orphans modified in the last N seconds (uploads in flight).")
+        action = parser.add_mutually_exclusive_group()
+        action.add_argument('--quarantine', action='store_true',
+                            help=f"Move orphans to <volume>/{QUARANTINE_DIR}/<timestamp>/.")
+        action.add_argument('--delete', action='store_true', help="Delete orphans.")
+        parser.add_argument('--verbose-list', action='store_true',
+                            help="Print every orphan and missing blob, not just the first 20.")
+
+    def handle(self, *args, **opts):
+        storage = default_storage
+        if not isinstance(storage, ShardedStorage):
+            raise CommandError("reconcile only walks local volumes (STORAGES['default'] is not a ShardedStorage).")
+        self.storage = storage
+        self.opts = opts
+        self.cutoff = time.time() - opts['min_age']
+        self.stamp = time.strftime('%Y%m%d-%H%M%S')
+
+        # root → labels stored there; MEDIA_ROOT also holds unlabelled legacy names
+        self.media_root = os.path.abspath(storage.location)
+        self.roots = {}
+        for label, root in storage.volumes.items():
+            self.roots.setdefault(root, []).append(label)
+        self.roots.setdefault(self.media_root, [])
+
+        # One partition per top-level directory of each root, walked in parallel;
+        # files lying directly in a root form the `''` partition of that root
+        partitions = []
+        for root in self.roots:
+            try:
+                with os.scandir(root) as it:
+                    entries = list(it)
+            except FileNotFoundError:
+                continue
+            partitions.append((root, ''))
+            for entry in entries:
+                if not entry.is_dir(follow_symlinks=False) or entry.name.startswith('.'):
+                    continue
+                if os.path.abspath(entry.path) in self.roots:
+                    continue    # another volume nested in this root
+                partitions.append((root, entry.name))
+
+        totals = {'blobs': 0, 'bytes': 0, 'orphans': 0, 'orphan_bytes': 0,
+                  'recent': 0, 'missing': 0, 'moved': 0, 'deleted': 0, 'failed': 0}
+        orphans, missing = [], []
+        with ThreadPoolExecutor(max_workers=opts['workers']) as pool:
+            for result in pool.map(self._reconcile_partition, partitions):
+                for key in ('blobs', 'bytes', 'recent'):
+                    totals[key] += result[key]
+                orphans.extend(result['orphans'])
+                missing.extend(result['missing'])
+
+            # Rows whose partition wasn't walked (no such directory, or a file at a root)
+            walked = {p for p in partitions if p[1]}
+            missing.extend(self._missing_outside(walked))
+            orphans.extend(self._stale_staged())
+
+            totals['orphans'] = len(orphans)
+            totals['orphan_bytes'] = sum(size for _, size in orphans)
+            totals['missing'] = len(missing)
+            self._report(orphans, missing)
+
+            if opts['quarantine'] or opts['delete']:
+                for status in pool.map(self._dispose, orphans):
+                    totals[status] += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {totals['blobs']} blob(s) on disk ({filesizeformat(totals['bytes'])}); "
+            f"{totals['orphans']} orphaned ({filesizeformat(totals['orphan_bytes'])}), "
+            f"{totals['recent']} too recent to judge, {totals['missing']} missing; "
+            f"{totals['moved']} quarantined, {totals['deleted']} deleted, {totals['failed']} failed."
+        ))
+
+    # ------------------------------------------------------
+    # Disk ↔ DB merge (one partition, runs in a pool thread)
+    # ------------------------------------------------------
+    def _stored_name(self, root, rel):
+        """The name a row would store for the blob at `root/rel`."""
+        labels = self.roots[root]
+        if labels and (root != self.media_root or _is_shard_path(rel)):
+            return f"{labels[0]}/{rel}"
+        return rel
+
+    def _db_names(self, prefix):
+        """Names starting with `prefix` from every model, sorted and deduplicated."""
+        # `prefix` ends in '/', and '0' sorts right after '/': an index range scan
+        upper = prefix[:-1] + '0'
+        streams = [self._model_names(model, field, prefix, upper) for model, field in self.FIELDS]
+        last = None
+        for name in heapq.merge(*streams):
+            if name != last:
+                yield name
+                last = name
+
+    def _model_names(self, model, field, lower, upper):
+        batch_size = self.opts['batch_size']
+        while True:
+            names = list(
+                model.objects.filter(**{f'{field}__gte': lower, f'{field}__lt': upper}).order_by(field)
+                .values_list(field, flat=True).distinct()[:batch_size]
+            )
+            yield from names
+            if len(names) < batch_size:
+                return
+            lower = names[-1] + '\0'    # keyset: strictly after the last name
+
+    def _reconcile_partition(self, partition):
+        root, top = partition
+        result = {'blobs': 0, 'bytes': 0, 'recent': 0, 'orphans': [], 'missing': []}
+        try:
+            if top:
+                disk = sorted(
+                    (self._stored_name(root, rel), path, size, mtime)
+                    for rel, path, size, mtime in _walk(os.path.join(root, top), f"{top}/")
+                )
+                prefixes = [f"{label}/{top}/" for label in self.roots[root]]
+                if root == self.media_root:
+                    prefixes.append(f"{top}/")
+                db = heapq.merge(*(self._db_names(prefix) for prefix in prefixes))
+            else:
+                disk = self._root_files(root)
+                db = iter(sorted(self._existing([name for name, *_ in disk])))
+
+            # Merge join of two sorted streams
+            db_name = next(db, None)
+            for name, path, size, mtime in disk:
+                while db_name is not None and db_name < name:
+                    result['missing'].append(db_name)
+                    db_name = next(db, None)
+                if db_name == name:
+                    db_name = next(db, None)
+                elif mtime > self.cutoff:
+                    # Possibly an upload whose row isn't committed yet
+                    result['recent'] += 1
+                else:
+                    result['orphans'].append((path, size))
+                result['blobs'] += 1
+                result['bytes'] += size
+            if top:
+                while db_name is not None:
+                    result['missing'].append(db_name)
+                    db_name = next(db, None)
+        finally:
+            connections.close_all()     # this thread's connections only
+        return result
+
+    def _root_files(self, root):
+        files = []
+        with os.scandir(root) as it:
+            for entry in it:
+                if entry.is_file(follow_symlinks=False):
+                    st = entry.stat(follow_symlinks=False)
+                    files.append((self._stored_name(root, entry.name), entry.path, st.st_size, st.st_mtime))
+        return sorted(files)
+
+    def _existing(self, names):
+        found = set()
+        for i in range(0, len(names), 500):
+            chunk = names[i:i + 500]
+            for model, field in self.FIELDS:
+                found.update(model.objects.filter(**{f'{field}__in': chunk}).values_list(field, flat=True))
+        return found
+
+    def _missing_outside(self, walked):
+        """Stream every stored name (sorted, in batches); check those outside `walked` one by one."""
+        missing = []
+        last = None
+        streams = [self._model_names(model, field, '', '\U0010ffff') for model, field in self.FIELDS]
+        for name in heapq.merge(*streams):
+            if not name or name == last:
+                continue
+            last = name
+            path = self.storage.path(name)
+            rel = os.path.relpath(path, self._root_of(path))
+            if (self._root_of(path), rel.split(os.sep)[0]) in walked and os.sep in rel:
+                continue
+            if not os.path.exists(path):
+                missing.append(name)
+        return missing
+
+    def _stale_staged(self):
+        """Staged uploads (<root>/.incoming) left behind by a request that died mid-upload."""
+        return [
+            (path, size)
+            for root in self.roots
+            for _, path, size, mtime in _walk(os.path.join(root, STAGING_DIR))
+            if mtime <= self.cutoff
+        ]
+
+    def _root_of(self, path):
+        return max((r for r in self.roots if path.startswith(r + os.sep)), key=len, default=self.media_root)
+
+    # ------------------------------------------------------
+    # Output + actions
+    # ------------------------------------------------------
+    def _report(self, orphans, missing):
+        limit = None if self.opts['verbose_list'] else 20
+        for path, size in orphans[:limit]:
+            self.stdout.write(f"  👻 orphan  {path} ({filesizeformat(size)})")
+        for name in missing[:limit]:
+            self.stdout.write(f"  🕳️ missing {name}")
+        hidden = max(len(orphans) - (limit or len(orphans)), 0) + max(len(missing) - (limit or len(missing)), 0)
+        if hidden:
+            self.stdout.write(f"  … {hidden} more (use --verbose-list)")
+
+    def _dispose(self, orphan):
+        """Runs in a pool thread. Returns a totals key."""
+        path, _ = orphan
+        try:
+            if self.opts['delete']:
+                os.remove(path)
+                return 'deleted'
+            root = self._root_of(path)
+            target = os.path.join(root, QUARANTINE_DIR, self.stamp, os.path.relpath(path, root))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(path, target)
+            return 'moved'
+        except OSError as e:
+            self.stderr.write(f"❌ {path}: {e}")
+            return 'failed'
+
@@ -0,0 +1,59 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from sharing_app.models import Chunk, File
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild CustomUser.storage_used from File.size plus version chunks (SQL aggregates). "
+        "--backfill-sizes first records sizes of rows created before File.size "
+        "existed, by asking storage once per such blob."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backfill-sizes', action='store_true')
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **opts):
+        if opts['backfill_sizes']:
+            self._backfill(opts)
+
+        usage = (File.objects.filter(user=OuterRef('pk')).order_by()
+                 .values('user').annotate(total=Sum('size')).values('total'))
+        history = (Chunk.objects.filter(owner=OuterRef('pk')).order_by()
+                   .values('owner').annotate(total=Sum('size')).values('total'))
+        updated = get_user_model().objects.update(
+            storage_used=Coalesce(Subquery(usage), Value(0)) + Coalesce(Subquery(history), Value(0))
+        )
+        self.stdout.write(self.style.SUCCESS(f"✅ Recounted storage for {updated} user(s)."))
+
+    def _backfill(self, opts):
+        filled = missing = 0
+        last_pk = 0
+        with ThreadPoolExecutor(max_workers=opts['workers']) as pool:
+            while True:
+                rows = list(File.objects.filter(size=0, pk__gt=last_pk).exclude(file='')
+                            .order_by('pk')[:opts['batch_size']])
+                if not rows:
+                    break
+                last_pk = rows[-1].pk
+                for f, size in zip(rows, pool.map(self._size, rows)):
+                    if size is None:
+                        missing += 1
+                    f.size = size or 0
+                File.objects.bulk_update(rows, ['size'], batch_size=500)
+                filled += len(rows)
+        self.stdout.write(f"📏 Sized {filled} file(s); {missing} blob(s) missing.")
+
+    @staticmethod
+    def _size(f):
+        try:
+            return f.file.storage.size(f.file.name)
+        except (OSError, NotImplementedError):
+            return None
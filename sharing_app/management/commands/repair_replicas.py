@@ -0,0 +1,99 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from sharing_app.jobs import enqueue
+from sharing_app.models import File, SharedFile, UploadedFile
+from sharing_app.storage import ReplicatedStorage
+
+
+class Command(BaseCommand):
+    help = (
+        "Find blobs with fewer copies than configured (primary + BLOB_REPLICAS), or "
+        "replicas whose size/SHA-256 differ from the primary, and re-replicate them, "
+        "inline with a thread pool or as replicate_blob jobs."
+    )
+
+    MODELS = [File, SharedFile, UploadedFile]
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--enqueue', action='store_true',
+                            help="Queue replicate_blob jobs instead of copying here.")
+        parser.add_argument('--size-only', action='store_true',
+                            help="Compare replicas by size only (skip reading them for SHA-256).")
+        parser.add_argument('--dry-run', action='store_true', help="Only report.")
+
+    def handle(self, *args, **opts):
+        storage = default_storage
+        if not isinstance(storage, ReplicatedStorage):
+            raise CommandError("STORAGES['default'] is not sharing_app.storage.ReplicatedStorage.")
+        if not storage.replicas:
+            raise CommandError("BLOB_REPLICAS is empty; nothing to replicate to.")
+        self.storage = storage
+
+        totals = {'checked': 0, 'healthy': 0, 'under': 0, 'lost': 0, 'repaired': 0, 'queued': 0, 'failed': 0}
+        missing_by_label = {}
+        seen = set()
+
+        check = lambda name: storage.stale_locations(name, checksum=not opts['size_only'])
+        with ThreadPoolExecutor(max_workers=opts['workers']) as pool:
+            for model in self.MODELS:
+                last_pk = 0
+                while True:
+                    rows = list(
+                        model.objects.exclude(file='').filter(pk__gt=last_pk)
+                        .order_by('pk').values_list('pk', 'file')[:opts['batch_size']]
+                    )
+                    if not rows:
+                        break
+                    last_pk = rows[-1][0]
+                    # Shares point at File blobs: check each name once
+                    names = [name for _, name in rows if name not in seen]
+                    seen.update(names)
+
+                    to_repair = []
+                    for name, missing in zip(names, pool.map(check, names)):
+                        totals['checked'] += 1
+                        if not missing:
+                            totals['healthy'] += 1
+                            continue
+                        for label, _ in missing:
+                            missing_by_label[label] = missing_by_label.get(label, 0) + 1
+                        if len(missing) == len(storage.locations(name)):
+                            totals['lost'] += 1
+                            self.stderr.write(f"💀 No copy left: {name}")
+                            continue
+                        totals['under'] += 1
+                        if opts['dry_run']:
+                            continue
+                        if opts['enqueue']:
+                            enqueue('replicate_blob', {'name': name, 'overwrite': True})
+                            totals['queued'] += 1
+                        else:
+                            to_repair.append(name)
+
+                    for name, error in zip(to_repair, pool.map(self._replicate, to_repair)):
+                        if error:
+                            totals['failed'] += 1
+                            self.stderr.write(f"❌ {name}: {error}")
+                        else:
+                            totals['repaired'] += 1
+
+        for label, count in sorted(missing_by_label.items()):
+            self.stdout.write(f"  {label}: {count} missing or stale")
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Checked {totals['checked']} blob(s): {totals['healthy']} healthy, "
+            f"{totals['under']} under-replicated or stale, {totals['lost']} lost; "
+            f"{totals['repaired']} repaired, {totals['queued']} queued, {totals['failed']} failed."
+        ))
+
+    def _replicate(self, name):
+        """Runs in a pool thread. Returns an error string or None."""
+        try:
+            self.storage.replicate(name, overwrite=True)
+        except OSError as e:
+            return str(e)
+        return None
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from cryptography.fernet import Fernet, MultiFernet
+from django.conf import settings
+from django.core.files.storage import storages
+from django.core.management.base import BaseCommand, CommandError
+
+from django.contrib.auth import get_user_model
+
+from sharing_app.integrity import record_checksum
+from sharing_app.models import File, SharedFile
+from sharing_app.utils import USER_KEY_ID, RateLimiter, atomic_write, rewrap_data_key
+
+_storage = None     # (pid, storage) of this pool process
+
+
+def _blob_storage():
+    """This process's own default storage (a client inherited through fork isn't safe to reuse)."""
+    global _storage
+    if _storage is None or _storage[0] != os.getpid():
+        _storage = (os.getpid(), storages.create_storage(settings.STORAGES['default']))
+    return _storage[1]
+
+
+def _rotate_blob(name, keys, old_key_id):
+    """
+    Re-encrypt one blob to the newest key (runs in a pool process).
+    Returns (bytes_processed, sha256 of the new blob, error).
+    """
+    try:
+        ring = [(key_id, Fernet(key.encode())) for key_id, key in keys]
+        primary = ring[0][1]
+        # Try the recorded key first, then the rest; re-encrypt with primary.
+        others = sorted(ring, key=lambda item: item[0] != old_key_id)
+        multi = MultiFernet([primary] + [fernet for _, fernet in others])
+
+        storage = _blob_storage()
+        with storage.open(name, 'rb') as f:
+            token = f.read()
+
+        rotated = multi.rotate(token)
+        storage.overwrite(name, rotated)
+        return len(token), hashlib.sha256(rotated).hexdigest(), None
+    except Exception as e:
+        return 0, None, f"{type(e).__name__}: {e}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-wrap per-user data keys and re-encrypt master-key File/SharedFile blobs "
+        "to the newest FERNET_KEYS entry. Parallel, throttled and resumable; "
+        "safe to run while the site is up."
+    )
+
+    TARGETS = {'shared': SharedFile, 'file': File}
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=['all', *self.TARGETS], default='all')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--max-files-per-sec', type=float, default=None)
+        parser.add_argument('--max-mb-per-sec', type=float, default=None)
+        parser.add_argument(
+            '--checkpoint',
+            default=str(settings.BASE_DIR / '.rotate_keys.checkpoint.json'),
+            help="Progress file used to resume an interrupted run.",
+        )
+        parser.add_argument('--reset', action='store_true', help="Ignore the saved checkpoint.")
+
+    # ------------------------------------------------------
+    # Checkpoint
+    # ------------------------------------------------------
+    def _load_checkpoint(self, path, primary, reset):
+        if reset or not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            data = json.load(f)
+        # New primary key since last run → start over
+        return data.get('progress', {}) if data.get('primary') == primary else {}
+
+    def _save_checkpoint(self, path, primary, progress):
+        atomic_write(path, json.dumps({'primary': primary, 'progress': progress}).encode())
+
+    # ------------------------------------------------------
+    def handle(self, *args, **opts):
+        keys = [(key_id, key) for key_id, key in settings.FERNET_KEYS]
+        if not keys:
+            raise CommandError("FERNET_KEYS is empty.")
+        primary = keys[0][0]
+
+        targets = self.TARGETS if opts['model'] == 'all' else {opts['model']: self.TARGETS[opts['model']]}
+        progress = self._load_checkpoint(opts['checkpoint'], primary, opts['reset'])
+
+        files_limit = RateLimiter(opts['max_files_per_sec'])
+        bytes_limit = RateLimiter(opts['max_mb_per_sec'] and opts['max_mb_per_sec'] * 1024 * 1024)
+
+        totals = {'rotated': 0, 'failed': 0, 'bytes': 0}
+
+        # Envelope-encrypted blobs only need their data key re-wrapped
+        rewrapped = 0
+        users = get_user_model().objects.exclude(data_key='').exclude(data_key_wrapped_by=primary)
+        for user in users.only('pk', 'data_key', 'data_key_wrapped_by').iterator(chunk_size=1000):
+            rewrapped += rewrap_data_key(user)
+        self.stdout.write(f"🔑 Re-wrapped {rewrapped} user data key(s) with '{primary}'")
+
+        self.stdout.write(f"🔑 Rotating blobs to key '{primary}' with {opts['workers']} worker(s)")
+
+        with ProcessPoolExecutor(max_workers=opts['workers']) as pool:
+            for label, model in targets.items():
+                last_pk = progress.get(label, 0)
+
+                while True:
+                    rows = list(
+                        model.objects.filter(is_encrypted=True, pk__gt=last_pk)
+                        .exclude(key_id__in=[primary, USER_KEY_ID])
+                        .order_by('pk')
+                        .values_list('pk', 'file', 'key_id')[:opts['batch_size']]
+                    )
+                    if not rows:
+                        break
+
+                    storage = model._meta.get_field('file').storage
+                    futures = {}
+                    for pk, name, old_key_id in rows:
+                        files_limit.wait(1)
+                        try:
+                            bytes_limit.wait(storage.size(name))
+                        except OSError:
+                            pass
+                        futures[pool.submit(_rotate_blob, name, keys, old_key_id)] = (pk, name, old_key_id)
+
+                    done_by_key = {}
+                    for future in as_completed(futures):
+                        pk, name, old_key_id = futures[future]
+                        size, digest, error = future.result()
+                        if error:
+                            totals['failed'] += 1
+                            self.stderr.write(f"❌ {label} #{pk}: {error}")
+                            continue
+                        record_checksum(name, digest)
+                        totals['rotated'] += 1
+                        totals['bytes'] += size
+                        done_by_key.setdefault(old_key_id, []).append(pk)
+
+                    # Only flip rows whose key_id is still what we rotated from
+                    for old_key_id, pks in done_by_key.items():
+                        model.objects.filter(pk__in=pks, key_id=old_key_id).update(key_id=primary)
+
+                    last_pk = rows[-1][0]
+                    progress[label] = last_pk
+                    self._save_checkpoint(opts['checkpoint'], primary, progress)
+                    self.stdout.write(f"  {label}: up to #{last_pk} ({totals['rotated']} rotated)")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Rotated {totals['rotated']} blob(s), {totals['bytes'] / 1024 / 1024:.1f} MB; "
+            f"{totals['failed']} failed."
+        ))
+        if totals['failed']:
+            self.stdout.write("👉 Re-run with --reset to retry failed blobs.")
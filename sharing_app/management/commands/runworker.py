@@ -0,0 +1,90 @@
+import json
+import multiprocessing
+import signal
+import threading
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+def _process_main(index, queues, burst, max_jobs):
+    """Entry point for worker processes (safe for fork and spawn)."""
+    django.setup()
+    from sharing_app.jobs import Worker, make_worker_id
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    Worker(make_worker_id(f"p{index}"), queues, stop_event=stop).run_forever(
+        max_jobs=max_jobs, burst=burst
+    )
+
+
+class Command(BaseCommand):
+    help = "Run background job workers (threads or processes) for sharing_app."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help="Number of workers.")
+        parser.add_argument('--mode', choices=['thread', 'process'], default='thread')
+        parser.add_argument('--queues', default='', help="Comma-separated queues (default: all).")
+        parser.add_argument('--burst', action='store_true', help="Exit when the queue is empty.")
+        parser.add_argument('--max-jobs', type=int, default=None, help="Stop each worker after N jobs.")
+        parser.add_argument('--stats', action='store_true', help="Print queue depth/latency and exit.")
+
+    def handle(self, *args, **opts):
+        from sharing_app.jobs import Worker, make_worker_id, queue_stats
+
+        if opts['stats']:
+            self.stdout.write(json.dumps(queue_stats(), indent=2))
+            return
+
+        queues = [q.strip() for q in opts['queues'].split(',') if q.strip()] or None
+        count = max(opts['workers'], 1)
+        self.stdout.write(f"⚙️ Starting {count} {opts['mode']} worker(s) on {queues or 'all queues'}")
+
+        if opts['mode'] == 'process':
+            # Never share SQLite connections across fork()
+            connections.close_all()
+            procs = [
+                multiprocessing.Process(
+                    target=_process_main,
+                    args=(i, queues, opts['burst'], opts['max_jobs']),
+                    daemon=False,
+                )
+                for i in range(count)
+            ]
+            for p in procs:
+                p.start()
+            try:
+                for p in procs:
+                    p.join()
+            except KeyboardInterrupt:
+                for p in procs:
+                    p.terminate()
+                for p in procs:
+                    p.join()
+            return
+
+        stop = threading.Event()
+        workers = [
+            Worker(make_worker_id(f"t{i}"), queues, stop_event=stop) for i in range(count)
+        ]
+        threads = [
+            threading.Thread(
+                target=w.run_forever,
+                kwargs={'max_jobs': opts['max_jobs'], 'burst': opts['burst']},
+                name=w.worker_id,
+            )
+            for w in workers
+        ]
+        for t in threads:
+            t.start()
+        try:
+            for t in threads:
+                while t.is_alive():
+                    t.join(0.5)
+        except KeyboardInterrupt:
+            self.stdout.write("🛑 Stopping workers after current jobs…")
+            stop.set()
+            for t in threads:
+                t.join()
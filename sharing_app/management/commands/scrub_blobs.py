@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from sharing_app import integrity
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-hash due blobs against their stored SHA-256 now (what the scrub_blobs "
+        "job does), or start the recurring scrub_blobs job with --enqueue."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-seconds', type=float, default=None,
+                            help="Time budget (default SCRUB_MAX_SECONDS).")
+        parser.add_argument('--max-mb-per-sec', type=float, default=None,
+                            help="I/O budget (default SCRUB_MB_PER_SEC; 0 = unthrottled).")
+        parser.add_argument('--enqueue', action='store_true',
+                            help="Queue the self-rescheduling scrub_blobs job instead of scrubbing here.")
+
+    def handle(self, *args, **opts):
+        if opts['enqueue']:
+            integrity.schedule_scrub(delay=0)
+            self.stdout.write(self.style.SUCCESS("✅ scrub_blobs queued; it reschedules itself every SCRUB_INTERVAL."))
+            return
+
+        totals = integrity.scrub(opts['max_seconds'], opts['max_mb_per_sec'])
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Verified {totals['ok']} blob(s), recorded {totals['recorded']} new checksum(s) "
+            f"({filesizeformat(totals['bytes'])}); {totals['corrupt']} corrupt, {totals['missing']} missing."
+        ))
+        if totals['corrupt'] or totals['missing']:
+            self.stdout.write("👉 Flagged rows have is_corrupt set; their downloads are refused.")
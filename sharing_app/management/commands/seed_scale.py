@@ -0,0 +1,240 @@
+import os
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from sharing_app.models import File, Folder, SharedFile
+from sharing_app.storage import ShardedStorage
+
+EXTENSIONS = ['.pdf', '.txt', '.png', '.jpg', '.docx', '.xlsx', '.csv', '.mp4', '.mp3']
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a large synthetic dataset (users, folder trees, files, shares) "
+        "for scale testing. Deterministic for a given --seed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--files', type=int, default=100_000, help="Total File rows.")
+        parser.add_argument('--folders-per-user', type=int, default=20)
+        parser.add_argument('--max-depth', type=int, default=5, help="Maximum folder nesting depth.")
+        parser.add_argument('--protected-fraction', type=float, default=0.1)
+        parser.add_argument('--root-fraction', type=float, default=0.3,
+                            help="Share of files stored outside any folder.")
+        parser.add_argument('--trashed-fraction', type=float, default=0.05)
+        parser.add_argument('--shares', type=int, default=10_000)
+        parser.add_argument('--expired-fraction', type=float, default=0.5)
+        parser.add_argument('--skew', type=float, default=1.2,
+                            help="Pareto shape for files-per-user (lower = more skewed).")
+        parser.add_argument('--blobs', choices=['none', 'sparse', 'real'], default='none',
+                            help="Write blob files to storage (sparse = no disk blocks).")
+        parser.add_argument('--blob-size', type=int, default=64 * 1024)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--prefix', default='seed')
+        parser.add_argument('--clear', action='store_true', help="Delete previously seeded users first.")
+
+    # ------------------------------------------------------
+    def handle(self, *args, **opts):
+        if opts['blobs'] != 'none' and not isinstance(default_storage, ShardedStorage):
+            raise CommandError("--blobs writes files on local volumes (STORAGES['default'] is not a ShardedStorage).")
+        self.rng = random.Random(opts['seed'])
+        self.opts = opts
+        self.batch = opts['batch_size']
+        User = get_user_model()
+        started = time.monotonic()
+
+        if opts['clear']:
+            deleted, _ = User.objects.filter(username__startswith=f"{opts['prefix']}_").delete()
+            self.stdout.write(f"🧹 Removed {deleted} seeded row(s)")
+
+        users = self._users(User)
+        folders = self._folders(users)
+        files = self._files(users, folders)
+        self._shares(files)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Seeded {len(users)} users, {sum(len(v) for v in folders.values())} folders, "
+            f"{files['count']} files, {opts['shares']} shares in {elapsed:.1f}s"
+        ))
+
+    def _bulk(self, model, objs):
+        with transaction.atomic():
+            return model.objects.bulk_create(objs, batch_size=self.batch)
+
+    # ------------------------------------------------------
+    # 🧑 Users
+    # ------------------------------------------------------
+    def _users(self, User):
+        prefix = self.opts['prefix']
+        # One hash for everyone: hashing per user would dominate the runtime
+        password = make_password('seed-password')
+        users = [
+            User(username=f"{prefix}_{i}", email=f"{prefix}_{i}@example.com", password=password)
+            for i in range(self.opts['users'])
+        ]
+        users = self._bulk(User, users)
+        self.stdout.write(f"🧑 {len(users)} users")
+        return [u.pk for u in users]
+
+    # ------------------------------------------------------
+    # 📂 Folder trees (created level by level)
+    # ------------------------------------------------------
+    def _folders(self, user_ids):
+        opts, rng = self.opts, self.rng
+        protected_hash = make_password('folder-password')
+        by_user = {uid: [] for uid in user_ids}
+
+        # Pick a depth for every folder, then build each level on the last
+        levels = {uid: [] for uid in user_ids}
+        for uid in user_ids:
+            for n in range(opts['folders_per_user']):
+                depth = min(int(rng.expovariate(1.0)), opts['max_depth'] - 1)
+                levels[uid].append((depth, n))
+
+        parents = {uid: [None] for uid in user_ids}
+        for depth in range(opts['max_depth']):
+            pending = []
+            for uid in user_ids:
+                for d, n in levels[uid]:
+                    if d != depth:
+                        continue
+                    protected = rng.random() < opts['protected_fraction']
+                    pending.append(Folder(
+                        user_id=uid,
+                        parent_id=rng.choice(parents[uid]),
+                        name=f"folder_{depth}_{n}",
+                        is_protected=protected,
+                        password_hash=protected_hash if protected else None,
+                    ))
+            if not pending:
+                continue
+            created = self._bulk(Folder, pending)
+            for folder in created:
+                parents[folder.user_id].append(folder.pk)
+                by_user[folder.user_id].append(folder.pk)
+
+        self.stdout.write(f"📂 {sum(len(v) for v in by_user.values())} folders")
+        return by_user
+
+    # ------------------------------------------------------
+    # 🗂️ Files
+    # ------------------------------------------------------
+    def _blob_path(self, uid, filename):
+        """Same layout as `user_upload_path`, but seeded for reproducibility."""
+        return default_storage.generate_filename(f"{self.rng.getrandbits(128):032x}_{filename}")
+
+    def _write_blob(self, name):
+        path = default_storage.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        size = self.opts['blob_size']
+        with open(path, 'wb') as f:
+            if self.opts['blobs'] == 'sparse':
+                f.truncate(size)
+            else:
+                f.write(self.rng.randbytes(size))
+
+    def _raw_insert(self, model, rows):
+        """
+        executemany() INSERT for plain dict rows (values already DB-ready).
+        Columns missing from a row take the field default. Skips the ORM's
+        per-value compilation, which dominates bulk_create at this volume.
+        """
+        fields = [f for f in model._meta.concrete_fields if not f.primary_key]
+        defaults = {
+            f.attname: f.get_db_prep_save(f.get_default(), connection) for f in fields
+        }
+        qn = connection.ops.quote_name
+        sql = "INSERT INTO {} ({}) VALUES ({})".format(
+            qn(model._meta.db_table),
+            ", ".join(qn(f.column) for f in fields),
+            ", ".join(["%s"] * len(fields)),
+        )
+        names = [f.attname for f in fields]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, [tuple(row.get(n, defaults[n]) for n in names) for row in rows])
+
+    def _files(self, user_ids, folders):
+        opts, rng = self.opts, self.rng
+        now = timezone.now()
+        # Pre-adapted timestamps (one per day) keep per-row work minimal
+        days_ago = [
+            connection.ops.adapt_datetimefield_value(now - timedelta(days=d)) for d in range(366)
+        ]
+        weights = [rng.paretovariate(opts['skew']) for _ in user_ids]
+        sample = {'count': 0, 'rows': []}
+
+        remaining = opts['files']
+        while remaining > 0:
+            n = min(self.batch, remaining)
+            owners = rng.choices(user_ids, weights=weights, k=n)
+            pending = []
+            for i, uid in enumerate(owners):
+                index = opts['files'] - remaining + i
+                filename = f"file_{index}{rng.choice(EXTENSIONS)}"
+                user_folders = folders[uid]
+                folder_id = (
+                    rng.choice(user_folders)
+                    if user_folders and rng.random() >= opts['root_fraction'] else None
+                )
+                trashed = rng.random() < opts['trashed_fraction']
+                age = rng.randint(0, 365)
+                name = self._blob_path(uid, filename)
+                pending.append({
+                    'user_id': uid,
+                    'folder_id': folder_id,
+                    'file': name,
+                    'name': filename,
+                    'original_name': filename,
+                    'uploaded_at': days_ago[age],
+                    'updated_at': days_ago[age],
+                    'is_deleted': trashed,
+                    'deleted_at': days_ago[rng.randint(0, age)] if trashed else None,
+                })
+                if opts['blobs'] != 'none':
+                    self._write_blob(name)
+                # Keep a sample of live files to share
+                if not trashed and len(sample['rows']) < opts['shares'] * 2:
+                    sample['rows'].append((uid, name, filename))
+
+            self._raw_insert(File, pending)
+            sample['count'] += n
+            remaining -= n
+            self.stdout.write(f"🗂️ {sample['count']}/{opts['files']} files")
+
+        return sample
+
+    # ------------------------------------------------------
+    # 🔗 Shares (active or expired)
+    # ------------------------------------------------------
+    def _shares(self, files):
+        opts, rng = self.opts, self.rng
+        if not files['rows'] or not opts['shares']:
+            return
+        now = timezone.now()
+        pending = []
+        for _ in range(opts['shares']):
+            uid, name, original = rng.choice(files['rows'])
+            expired = rng.random() < opts['expired_fraction']
+            limit = rng.choice([1, 5, 10, 100])
+            pending.append(SharedFile(
+                owner_id=uid,
+                file=name,
+                name=original,
+                shared_expiry=now + timedelta(minutes=rng.randint(-10_000, -1) if expired
+                                              else rng.randint(1, 10_000)),
+                max_share_limit=limit,
+                share_count=rng.randint(0, limit),
+            ))
+        self._bulk(SharedFile, pending)
+        self.stdout.write(f"🔗 {len(pending)} shares")
@@ -0,0 +1,177 @@
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections, transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from sharing_app.models import File, Folder, SharedFile
+
+# What SQLite/Django do with no tuning: rollback journal, fsync on commit
+BASELINE_PRAGMAS = {'journal_mode': 'DELETE', 'synchronous': 'FULL'}
+
+# Writer operation mix (weights)
+WRITE_MIX = {'share_hit': 4, 'trash_toggle': 2, 'upload': 2, 'session': 2}
+
+
+class Command(BaseCommand):
+    help = (
+        "Run N concurrent writers (and readers) against a scratch SQLite database "
+        "using the app's hot write paths; report throughput and 'database is locked' "
+        "errors. --compare runs untuned SQLite first, then SQLITE_PRAGMAS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--readers', type=int, default=2)
+        parser.add_argument('--duration', type=float, default=10.0, help="Seconds per run.")
+        mode = parser.add_mutually_exclusive_group()
+        mode.add_argument('--baseline', action='store_true', help="Only run untuned SQLite.")
+        mode.add_argument('--compare', action='store_true', help="Run untuned, then tuned.")
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **opts):
+        if connection.vendor != 'sqlite':
+            raise CommandError("sqlite_stress only applies to the SQLite backend.")
+
+        tuned = getattr(settings, 'SQLITE_PRAGMAS', {})
+        if opts['baseline']:
+            runs = [('baseline', BASELINE_PRAGMAS)]
+        elif opts['compare']:
+            runs = [('baseline', BASELINE_PRAGMAS), ('tuned', tuned)]
+        else:
+            runs = [('tuned', tuned)]
+
+        db = connections['default'].settings_dict
+        original_name = db['NAME']
+        results = {}
+        try:
+            for label, pragmas in runs:
+                with tempfile.TemporaryDirectory(prefix='sqlite-stress-') as tmp_dir, \
+                        override_settings(SQLITE_PRAGMAS=pragmas):
+                    # Every thread's connection is built from this dict
+                    connections.close_all()
+                    db['NAME'] = os.path.join(tmp_dir, 'stress.sqlite3')
+                    call_command('migrate', verbosity=0, interactive=False)
+                    self.stdout.write(f"🔧 {label}: {pragmas or 'SQLite defaults'}")
+                    results[label] = self._run(self._fixture(), opts)
+                    connections.close_all()
+                self._report(label, results[label])
+        finally:
+            connections.close_all()
+            db['NAME'] = original_name
+
+        if 'baseline' in results and 'tuned' in results:
+            base, new = results['baseline'], results['tuned']
+            speedup = new['writes_per_s'] / base['writes_per_s'] if base['writes_per_s'] else float('inf')
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ Writes/s {base['writes_per_s']:.0f} → {new['writes_per_s']:.0f} ({speedup:.1f}x); "
+                f"lock errors {base['lock_errors']} → {new['lock_errors']}"
+            ))
+
+    # ------------------------------------------------------
+    def _fixture(self):
+        user = get_user_model().objects.create(username='stress', email='stress@example.com')
+        folder = Folder.objects.create(user=user, name='stress')
+        files = File.objects.bulk_create([
+            File(user=user, folder=folder, name=f's{i}.txt', original_name=f's{i}.txt', file=f'stress/s{i}.txt')
+            for i in range(200)
+        ])
+        shares = SharedFile.objects.bulk_create([
+            SharedFile(owner=user, file=f.file.name, name=f.name, max_share_limit=10 ** 9)
+            for f in files[:20]
+        ])
+        return {'user': user, 'folder': folder, 'files': files, 'shares': shares}
+
+    def _write_op(self, op, fx, rng):
+        if op == 'share_hit':
+            rng.choice(fx['shares']).register_download()
+        elif op == 'trash_toggle':
+            f = rng.choice(fx['files'])
+            f.is_deleted = not f.is_deleted
+            f.deleted_at = timezone.now() if f.is_deleted else None
+            f.save(update_fields=['is_deleted', 'deleted_at'])
+        elif op == 'upload':
+            with transaction.atomic():
+                File(user=fx['user'], folder=fx['folder'], name='up.txt',
+                     original_name='up.txt', file='stress/up.txt').save()
+        elif op == 'session':
+            store = SessionStore()
+            store['_auth_user_id'] = str(fx['user'].pk)
+            store.save()
+
+    def _read_op(self, fx):
+        list(File.objects.filter(user=fx['user'], folder=fx['folder'], is_deleted=False)
+             .select_related('user')[:50])
+
+    def _run(self, fx, opts):
+        deadline = time.monotonic() + opts['duration']
+        lock = threading.Lock()
+        stats = {'writes': 0, 'reads': 0, 'lock_errors': 0, 'other_errors': 0, 'latencies': []}
+        ops, weights = list(WRITE_MIX), list(WRITE_MIX.values())
+
+        def worker(index, writer):
+            rng = random.Random(opts['seed'] * 1000 + index)
+            local = {'writes': 0, 'reads': 0, 'lock_errors': 0, 'other_errors': 0, 'latencies': []}
+            try:
+                while time.monotonic() < deadline:
+                    start = time.perf_counter()
+                    try:
+                        if writer:
+                            self._write_op(rng.choices(ops, weights)[0], fx, rng)
+                        else:
+                            self._read_op(fx)
+                    except OperationalError as e:
+                        key = 'lock_errors' if 'locked' in str(e) or 'busy' in str(e) else 'other_errors'
+                        local[key] += 1
+                        continue
+                    if writer:
+                        local['writes'] += 1
+                        local['latencies'].append(time.perf_counter() - start)
+                    else:
+                        local['reads'] += 1
+            finally:
+                connections['default'].close()
+                with lock:
+                    for key in ('writes', 'reads', 'lock_errors', 'other_errors'):
+                        stats[key] += local[key]
+                    stats['latencies'].extend(local['latencies'])
+
+        threads = [threading.Thread(target=worker, args=(i, True)) for i in range(opts['writers'])]
+        threads += [threading.Thread(target=worker, args=(opts['writers'] + i, False))
+                    for i in range(opts['readers'])]
+        started = time.monotonic()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.monotonic() - started
+
+        latencies = sorted(stats['latencies']) or [0.0]
+        return {
+            'writes': stats['writes'],
+            'reads': stats['reads'],
+            'lock_errors': stats['lock_errors'],
+            'other_errors': stats['other_errors'],
+            'writes_per_s': stats['writes'] / elapsed,
+            'reads_per_s': stats['reads'] / elapsed,
+            'p50_ms': statistics.median(latencies) * 1000,
+            'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        }
+
+    def _report(self, label, r):
+        self.stdout.write(
+            f"  {label:<9} writes {r['writes']:>7} ({r['writes_per_s']:>7.0f}/s)  "
+            f"reads {r['reads']:>7} ({r['reads_per_s']:>7.0f}/s)  "
+            f"p50 {r['p50_ms']:>7.2f} ms  p99 {r['p99_ms']:>8.2f} ms  "
+            f"locked {r['lock_errors']:>5}  other errors {r['other_errors']}"
+        )
@@ -0,0 +1,299 @@
+# ==========================================================
+# 📈 metrics.py — In-process metrics with Prometheus text export
+# ==========================================================
+"""
+Counters and histograms are kept in a per-process registry (a dict plus a
+lock, so recording is cheap). Each process periodically dumps its registry
+to `METRICS_DIR/<pid>-<start>.json`; the metrics endpoint sums every file,
+so numbers are correct under multi-worker servers (gunicorn, uwsgi). Files
+of processes that have exited are folded into `archive.json` on scrape, so
+restarts don't grow the directory. METRICS_DIR is per host: PIDs are only
+checked locally.
+
+    from sharing_app import metrics
+    metrics.inc('share_downloads_total', result='admitted')
+    metrics.observe('upload_size_bytes', uploaded_file.size)
+"""
+import atexit
+import glob
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .utils import atomic_write
+
+try:
+    import fcntl
+except ModuleNotFoundError:     # Windows: no cross-process lock, no compaction
+    fcntl = None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (
+    1024, 16 * 1024, 128 * 1024, 1024 ** 2, 5 * 1024 ** 2,
+    25 * 1024 ** 2, 100 * 1024 ** 2, 1024 ** 3,
+)
+
+# name → (type, help, buckets)
+DEFINITIONS = {
+    'http_requests_total': ('counter', "Requests by view, method and status.", None),
+    'http_request_duration_seconds': ('histogram', "Request latency by view.", LATENCY_BUCKETS),
+    'http_response_bytes_total': ('counter', "Response body bytes sent (streamed included).", None),
+    'db_queries_per_request': ('histogram', "DB queries per request by view.", QUERY_BUCKETS),
+    'db_query_seconds_total': ('counter', "Time spent in DB queries by view.", None),
+    'clamav_scan_duration_seconds': ('histogram', "clamd scan duration.", LATENCY_BUCKETS),
+    'clamav_scans_total': ('counter', "clamd scans by result.", None),
+    'scan_verdict_cache_total': ('counter', "Upload scan verdict cache lookups by result (hit/miss).", None),
+    'upload_size_bytes': ('histogram', "Uploaded file sizes.", SIZE_BUCKETS),
+    'share_downloads_total': ('counter', "Public share hits by admission result.", None),
+    'listing_cache_requests_total': ('counter', "Folder listing cache lookups by result (hit/miss).", None),
+    'write_behind_flushed_total': ('counter', "Buffered items written by write-behind flushes.", None),
+    'write_behind_dropped_total': ('counter', "Buffered items dropped after a failed flush.", None),
+    'corrupt_blob_requests_total': ('counter', "Downloads refused because the blob failed its integrity check.", None),
+    'blob_codec_bytes_total': ('counter', "Bytes into/out of blob compression by codec, op and side.", None),
+    'blob_codec_cpu_seconds_total': ('counter', "CPU time spent in blob compression by codec and op.", None),
+    'compressed_downloads_total': ('counter', "Downloads of compressed blobs by mode (passthrough/decoded).", None),
+}
+
+
+# ==========================================================
+# 🧮 Registry (this process)
+# ==========================================================
+_lock = threading.Lock()
+_counters = {}      # (name, labels) → value
+_histograms = {}    # (name, labels) → [bucket counts..., +Inf], sum
+_last_flush = 0.0
+_file_id = None     # (pid, file name); regenerated after fork
+
+
+def _labels(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name, value=1, **labels):
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, value, **labels):
+    buckets = DEFINITIONS[name][2]
+    key = (name, _labels(labels))
+    with _lock:
+        state = _histograms.get(key)
+        if state is None:
+            state = _histograms[key] = [[0] * (len(buckets) + 1), 0.0]
+        # Non-cumulative per bucket here; cumulated at export time
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                state[0][i] += 1
+                break
+        else:
+            state[0][-1] += 1
+        state[1] += value
+
+
+def snapshot():
+    with _lock:
+        return {
+            'counters': [[n, list(l), v] for (n, l), v in _counters.items()],
+            'histograms': [[n, list(l), list(s[0]), s[1]] for (n, l), s in _histograms.items()],
+        }
+
+
+# ==========================================================
+# 💾 Multi-process aggregation
+# ==========================================================
+def _metrics_dir():
+    return str(getattr(settings, 'METRICS_DIR', settings.BASE_DIR / '.metrics'))
+
+
+def _file_name():
+    """One file per process; the timestamp keeps recycled PIDs apart."""
+    global _file_id
+    pid = os.getpid()
+    if _file_id is None or _file_id[0] != pid:
+        _file_id = (pid, f"{pid}-{int(time.time() * 1000)}.json")
+    return _file_id[1]
+
+
+def flush(force=False):
+    """Write this process's registry to METRICS_DIR (rate-limited)."""
+    global _last_flush
+    now = time.monotonic()
+    if not force and now - _last_flush < getattr(settings, 'METRICS_FLUSH_INTERVAL', 5):
+        return
+    _last_flush = now
+    directory = _metrics_dir()
+    os.makedirs(directory, exist_ok=True)
+    atomic_write(os.path.join(directory, _file_name()), json.dumps(snapshot()).encode())
+
+
+def _at_exit():
+    try:
+        if _counters or _histograms:
+            flush(force=True)
+    except Exception:
+        pass
+
+
+atexit.register(_at_exit)
+
+
+ARCHIVE = 'archive.json'
+
+
+def _load(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _merge(snapshots):
+    """Sum snapshots into registry-shaped dicts."""
+    counters, histograms = {}, {}
+    for data in snapshots:
+        for name, labels, value in data.get('counters', []):
+            key = (name, tuple(tuple(x) for x in labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, buckets, total in data.get('histograms', []):
+            key = (name, tuple(tuple(x) for x in labels))
+            state = histograms.setdefault(key, [[0] * len(buckets), 0.0])
+            state[0] = [a + b for a, b in zip(state[0], buckets)]
+            state[1] += total
+    return counters, histograms
+
+
+def _exited(path):
+    """Whether the process that wrote `<pid>-<start>.json` is gone."""
+    pid = os.path.basename(path).split('-', 1)[0]
+    if not pid.isdigit() or int(pid) == os.getpid():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass    # alive, another user's
+    return False
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+@contextmanager
+def _exclusive(directory):
+    """Serialise collect() across processes; yields False where that isn't possible."""
+    if fcntl is None:
+        yield False
+        return
+    with open(os.path.join(directory, '.lock'), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _compact(directory, archive):
+    """Fold the files of exited processes into the archive and delete them."""
+    # Inputs of a compaction that died before deleting them are already counted
+    for name in archive.get('folded', []):
+        _remove(os.path.join(directory, name))
+    dead = [path for path in glob.glob(os.path.join(directory, '*-*.json')) if _exited(path)]
+    if not dead and not archive.get('folded'):
+        return archive
+    counters, histograms = _merge([archive] + [data for data in map(_load, dead) if data])
+    archive = {
+        'counters': [[n, list(l), v] for (n, l), v in counters.items()],
+        'histograms': [[n, list(l), s[0], s[1]] for (n, l), s in histograms.items()],
+        'folded': [os.path.basename(path) for path in dead],
+    }
+    atomic_write(os.path.join(directory, ARCHIVE), json.dumps(archive).encode())
+    for path in dead:
+        _remove(path)
+    return archive
+
+
+def collect():
+    """Sum the archive, every live process file and this process's registry."""
+    flush(force=True)
+    directory = _metrics_dir()
+    with _exclusive(directory) as locked:
+        archive = _load(os.path.join(directory, ARCHIVE)) or {}
+        if locked:
+            archive = _compact(directory, archive)
+        folded = set(archive.get('folded', []))
+        snapshots = [archive]
+        for path in glob.glob(os.path.join(directory, '*-*.json')):
+            data = None if os.path.basename(path) in folded else _load(path)
+            if data:
+                snapshots.append(data)
+    return _merge(snapshots)
+
+
+# ==========================================================
+# 📤 Prometheus text format
+# ==========================================================
+def _fmt_labels(labels, extra=None):
+    items = list(labels) + (extra or [])
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in items) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _fmt_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(gauges=None):
+    """
+    Render all metrics (and optional extra gauges) as Prometheus text.
+    `gauges` is {name: (help, [(labels_dict, value), ...])}.
+    """
+    counters, histograms = collect()
+    lines = []
+
+    for name, (kind, help_text, buckets) in DEFINITIONS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == 'counter':
+            for (n, labels), value in sorted(counters.items()):
+                if n == name:
+                    lines.append(f"{name}{_fmt_labels(labels)} {_fmt_value(value)}")
+        else:
+            for (n, labels), (counts, total) in sorted(histograms.items()):
+                if n != name:
+                    continue
+                running = 0
+                for bound, count in zip(list(buckets) + [math.inf], counts):
+                    running += count
+                    le = _fmt_labels(labels, [('le', _fmt_value(bound))])
+                    lines.append(f"{name}_bucket{le} {running}")
+                lines.append(f"{name}_sum{_fmt_labels(labels)} {_fmt_value(total)}")
+                lines.append(f"{name}_count{_fmt_labels(labels)} {running}")
+
+    for name, (help_text, samples) in (gauges or {}).items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        for labels, value in samples:
+            lines.append(f"{name}{_fmt_labels(_labels(labels))} {_fmt_value(value)}")
+
+    return '\n'.join(lines) + '\n'
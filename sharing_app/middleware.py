@@ -0,0 +1,174 @@
+# ==========================================================
+# 🧩 middleware.py — Request instrumentation
+# ==========================================================
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils import timezone
+
+from . import db_router, metrics
+
+logger = logging.getLogger(__name__)
+
+
+class _QueryCounter:
+    """execute_wrapper hook: counts queries and time spent in the DB."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+class MetricsMiddleware:
+    """
+    📈 Records per-URL-name latency, DB query count/time and response bytes
+    (streamed bodies are counted as they are sent). Exported at
+    `sharing:metrics` in Prometheus format.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        queries = _QueryCounter()
+
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(queries))
+            response = self.get_response(request)
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name if match else None) or 'unresolved'
+        labels = {'view': view}
+
+        metrics.inc('http_requests_total', view=view, method=request.method,
+                    status=response.status_code)
+        metrics.observe('db_queries_per_request', queries.count, **labels)
+        metrics.inc('db_query_seconds_total', queries.seconds, **labels)
+
+        if response.streaming:
+            response.streaming_content = self._count_stream(
+                response.streaming_content, start, labels
+            )
+        else:
+            metrics.inc('http_response_bytes_total', len(response.content), **labels)
+            metrics.observe('http_request_duration_seconds', time.perf_counter() - start, **labels)
+            metrics.flush()
+
+        return response
+
+    @staticmethod
+    def _count_stream(content, start, labels):
+        """Count bytes of a streamed body; latency includes streaming time."""
+        sent = 0
+        try:
+            for chunk in content:
+                sent += len(chunk)
+                yield chunk
+        finally:
+            metrics.inc('http_response_bytes_total', sent, **labels)
+            metrics.observe('http_request_duration_seconds', time.perf_counter() - start, **labels)
+            metrics.flush()
+
+
+class ProfilerMiddleware:
+    """
+    🔬 Opt-in request profiler (PROFILER_ENABLED).
+
+    Profiles a request when a staff user sends the PROFILER_HEADER header or
+    the PROFILER_QUERY_PARAM query parameter, or for a random
+    PROFILER_SAMPLE_RATE fraction of all requests. Disabled → the middleware
+    removes itself at startup, so it costs nothing.
+    Must come after AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILER_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'PROFILER_SAMPLE_RATE', 0.0)
+        self.header = getattr(settings, 'PROFILER_HEADER', 'X-Profile')
+        self.param = getattr(settings, 'PROFILER_QUERY_PARAM', '_profile')
+
+    def _trigger(self, request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated and user.is_staff:
+            if request.headers.get(self.header) or self.param in request.GET:
+                return 'staff'
+        if self.sample_rate and random.random() < self.sample_rate:
+            return 'sampled'
+        return None
+
+    def __call__(self, request):
+        trigger = self._trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+
+        from . import profiling
+
+        capture = profiling.Capture()
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(capture))
+            with capture:
+                response = self.get_response(request)
+
+        match = getattr(request, 'resolver_match', None)
+        try:
+            profile_id = profiling.save(capture, {
+                'path': request.get_full_path(),
+                'method': request.method,
+                'view': (match.view_name if match else None) or 'unresolved',
+                'status': response.status_code,
+                'user': request.user.get_username() if request.user.is_authenticated else '',
+                'trigger': trigger,
+                'started_at': timezone.now().isoformat(),
+            })
+            response['X-Profile-Id'] = profile_id
+        except Exception:
+            logger.exception("Could not save request profile")
+        return response
+
+
+class ReplicaStickinessMiddleware:
+    """
+    🔀 Read-your-writes for `@use_replica` views: if anything in this
+    request wrote to the database, pin the client to the primary for
+    REPLICA_STICKY_SECONDS with a cookie. Sits outside SessionMiddleware
+    so session saves count as writes too.
+    """
+
+    def __init__(self, get_response):
+        if not db_router.replica_configured():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = {'wrote': False}
+        token = db_router._request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            db_router._request_state.reset(token)
+
+        if state['wrote']:
+            seconds = db_router.sticky_seconds()
+            response.set_cookie(
+                db_router.STICKY_COOKIE, f"{time.time() + seconds:.3f}",
+                max_age=seconds, httponly=True, samesite='Lax',
+            )
+        return response
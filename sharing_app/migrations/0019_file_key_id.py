@@ -0,0 +1,28 @@
+# Generated by Django 5.0.6 on 2026-10-19 06:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sharing_app', '0018_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='is_encrypted',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='file',
+            name='key_id',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='sharedfile',
+            name='key_id',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.6 on 2026-10-19 06:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sharing_app', '0019_file_key_id'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='last_accessed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(fields=['user', '-last_accessed_at'], name='file_recent_opened_idx'),
+        ),
+    ]
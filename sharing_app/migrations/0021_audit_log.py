@@ -0,0 +1,59 @@
+# Generated by Django 5.0.6 on 2026-10-19 07:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sharing_app', '0020_file_last_accessed_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditRollupState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rolled_until', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AuditEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event', models.CharField(choices=[('download', 'Download'), ('view', 'View'), ('share_created', 'Share created'), ('folder_unlock', 'Folder unlocked'), ('folder_unlock_failed', 'Folder unlock failed')], max_length=32)),
+                ('at', models.DateTimeField(db_index=True)),
+                ('ip', models.GenericIPAddressField(blank=True, null=True)),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('file', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='sharing_app.file')),
+                ('folder', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='sharing_app.folder')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('share', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='sharing_app.sharedfile')),
+            ],
+            options={
+                'ordering': ['-at'],
+                'indexes': [models.Index(fields=['share', 'at'], name='audit_share_at_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='AuditHourly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('event', models.CharField(choices=[('download', 'Download'), ('view', 'View'), ('share_created', 'Share created'), ('folder_unlock', 'Folder unlocked'), ('folder_unlock_failed', 'Folder unlock failed')], max_length=32)),
+                ('count', models.PositiveIntegerField()),
+                ('unique_ips', models.PositiveIntegerField()),
+                ('file', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='sharing_app.file')),
+                ('folder', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='sharing_app.folder')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('share', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='sharing_app.sharedfile')),
+            ],
+            options={
+                'ordering': ['-hour'],
+                'indexes': [models.Index(fields=['owner', 'hour'], name='audit_hourly_owner_idx'), models.Index(fields=['share', 'hour'], name='audit_hourly_share_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-19 07:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sharing_app', '0021_audit_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='size',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.6 on 2026-10-19 07:09
+
+import sharing_app.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sharing_app', '0022_file_size'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='file',
+            name='file',
+            field=models.FileField(db_index=True, upload_to=sharing_app.models.user_upload_path),
+        ),
+        migrations.AlterField(
+            model_name='sharedfile',
+            name='file',
+            field=models.FileField(db_index=True, upload_to='shared/'),
+        ),
+        migrations.AlterField(
+            model_name='uploadedfile',
+            name='file',
+            field=models.FileField(db_index=True, upload_to='uploads/'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.0.6 on 2026-10-19 07:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sharing_app', '0023_file_name_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='is_corrupt',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='file',
+            name='last_verified_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='file',
+            name='sha256',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='sharedfile',
+            name='is_corrupt',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='sharedfile',
+            name='last_verified_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sharedfile',
+            name='sha256',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
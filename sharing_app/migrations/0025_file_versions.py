@@ -0,0 +1,64 @@
+# Generated by Django 5.0.6 on 2026-10-19 07:17
+
+import django.db.models.deletion
+import django.utils.timezone
+import sharing_app.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sharing_app', '0024_integrity_checksums'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='FileVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField()),
+                ('size', models.BigIntegerField()),
+                ('sha256', models.CharField(blank=True, max_length=64)),
+                ('blob', models.FileField(blank=True, db_index=True, upload_to=sharing_app.models.user_upload_path)),
+                ('chunks', models.JSONField(blank=True, null=True)),
+                ('restored_from', models.PositiveIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='versions', to='sharing_app.file')),
+            ],
+            options={
+                'ordering': ['-number'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Chunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64)),
+                ('blob', models.FileField(db_index=True, upload_to=sharing_app.models.chunk_upload_path)),
+                ('size', models.PositiveIntegerField()),
+                ('refs', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['refs', 'created_at'], name='chunk_gc_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='chunk',
+            constraint=models.UniqueConstraint(fields=('owner', 'digest'), name='chunk_owner_digest_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='fileversion',
+            constraint=models.UniqueConstraint(fields=('file', 'number'), name='file_version_number_uniq'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.6 on 2026-10-19 07:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sharing_app', '0025_file_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='content_encoding',
+            field=models.CharField(blank=True, max_length=16),
+        ),
+        migrations.AddField(
+            model_name='file',
+            name='stored_size',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='fileversion',
+            name='content_encoding',
+            field=models.CharField(blank=True, max_length=16),
+        ),
+        migrations.AddField(
+            model_name='sharedfile',
+            name='content_encoding',
+            field=models.CharField(blank=True, max_length=16),
+        ),
+    ]
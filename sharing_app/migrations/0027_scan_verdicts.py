@@ -0,0 +1,29 @@
+# Generated by Django 5.0.6 on 2026-10-19 07:29
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sharing_app', '0026_compression_at_rest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScanVerdict',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64)),
+                ('signatures', models.CharField(max_length=128)),
+                ('infected', models.BooleanField(default=False)),
+                ('virus', models.CharField(blank=True, max_length=255)),
+                ('scanned_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='scanverdict',
+            constraint=models.UniqueConstraint(fields=('sha256', 'signatures'), name='scan_verdict_uniq'),
+        ),
+    ]
@@ -1,19 +1,24 @@
-import os
+import hashlib
 import uuid
 from django.db import models
+from django.db.models import F
 from django.conf import settings
 from django.utils import timezone
 from django.contrib.auth.hashers import make_password, check_password
-from cryptography.fernet import Fernet
+
+from .utils import blob_key_id, decrypt_bytes, encrypt_bytes
 
 
 # ==========================================================
 # 📁 Helper: File Upload Path
 # ==========================================================
 def user_upload_path(instance, filename):
-    """Generate a unique upload path for each user's uploaded file."""
-    unique_name = f"{uuid.uuid4().hex}_{filename}"
-    return f"user_{instance.user.id}/{unique_name}"
+    """
+    Generate a unique name for an uploaded file. The storage backend
+    (`ShardedStorage`) places it under `<volume>/ab/cd/`; the owner is
+    on the row, so it is not part of the path.
+    """
+    return f"{uuid.uuid4().hex}_{filename}"
 
 
 # ==========================================================
@@ -57,7 +62,7 @@ class Folder(models.Model):
         else:
             self.password_hash = None
             self.is_protected = False
-        self.save(update_fields=['password_hash', 'is_protected'])
+        self.save(update_fields=['password_hash', 'is_protected', 'updated_at'])
 
     # 🔑 Validate Password
     def check_password(self, raw_password):
@@ -80,21 +85,104 @@ class File(models.Model):
         related_name='files'
     )
 
-    file = models.FileField(upload_to=user_upload_path)
+    # Indexed: manage.py reconcile reads names in sorted ranges
+    file = models.FileField(upload_to=user_upload_path, db_index=True)
     name = models.CharField(max_length=512)
     original_name = models.CharField(max_length=512, blank=True, null=True)
 
     display_name = models.CharField(max_length=255, blank=True)
+    # Bytes charged to the owner's quota (sharing_app/quota.py)
+    size = models.BigIntegerField(default=0)
 
     uploaded_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Current FileVersion number; 0 = never replaced (sharing_app/versions.py)
+    version = models.PositiveIntegerField(default=0)
+    # Written behind the request (sharing_app/access_tracking.py)
+    last_accessed_at = models.DateTimeField(null=True, blank=True)
 
     # Soft Delete Fields
     is_deleted = models.BooleanField(default=False)
     deleted_at = models.DateTimeField(null=True, blank=True)
 
+    # Encryption (key_id = FERNET_KEYS entry, or 'user' for the owner's data key)
+    is_encrypted = models.BooleanField(default=False)
+    key_id = models.CharField(max_length=64, blank=True)
+
+    # Integrity (sharing_app/integrity.py): SHA-256 of the stored bytes
+    sha256 = models.CharField(max_length=64, blank=True)
+    last_verified_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    is_corrupt = models.BooleanField(default=False)
+
+    # Compression at rest (sharing_app/compression.py): HTTP content-coding of
+    # the stored bytes ('' = stored as is) and their size when compressed
+    content_encoding = models.CharField(max_length=16, blank=True)
+    stored_size = models.BigIntegerField(null=True, blank=True)
+
     class Meta:
         ordering = ['-uploaded_at']
+        indexes = [
+            # "Recently opened": WHERE user_id = ? ORDER BY last_accessed_at DESC
+            models.Index(fields=['user', '-last_accessed_at'], name='file_recent_opened_idx'),
+        ]
+
+
+# ==========================================================
+# 🕘 File versions on a content-defined chunk store
+# ==========================================================
+def chunk_upload_path(instance, filename):
+    return f"chunks/{instance.digest}"
+
+
+class FileVersion(models.Model):
+    """
+    One revision of a File. `chunks` is the ordered list of Chunk digests
+    (filled in by the chunk_version job once the version is superseded);
+    `blob` is a full copy, kept while the version is current or not chunked
+    yet.
+    """
+    file = models.ForeignKey(File, on_delete=models.CASCADE, related_name='versions')
+    number = models.PositiveIntegerField()
+    size = models.BigIntegerField()
+    sha256 = models.CharField(max_length=64, blank=True)
+
+    blob = models.FileField(upload_to=user_upload_path, blank=True, db_index=True)
+    content_encoding = models.CharField(max_length=16, blank=True)    # of `blob`
+    chunks = models.JSONField(null=True, blank=True)
+    restored_from = models.PositiveIntegerField(null=True, blank=True)
+
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True,
+                                   on_delete=models.SET_NULL, related_name='+')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-number']
+        constraints = [
+            # Also what stops two concurrent edits from both becoming version N
+            models.UniqueConstraint(fields=['file', 'number'], name='file_version_number_uniq'),
+        ]
+
+
+class Chunk(models.Model):
+    """
+    Content-addressed piece of file versions, per owner. `refs` counts
+    uses across version manifests; unreferenced chunks are removed by the
+    gc_chunks job.
+    """
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    digest = models.CharField(max_length=64)    # SHA-256 of the bytes
+    blob = models.FileField(upload_to=chunk_upload_path, db_index=True)
+    size = models.PositiveIntegerField()
+    refs = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'digest'], name='chunk_owner_digest_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['refs', 'created_at'], name='chunk_gc_idx'),
+        ]
 
 
 # ==========================================================
@@ -106,7 +194,7 @@ class UploadedFile(models.Model):
     """
 
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
-    file = models.FileField(upload_to="uploads/")
+    file = models.FileField(upload_to="uploads/", db_index=True)
     folder = models.ForeignKey("Folder", on_delete=models.SET_NULL, null=True, blank=True)
 
     is_deleted = models.BooleanField(default=False)
@@ -130,7 +218,7 @@ class SharedFile(models.Model):
         related_name='shared_files'
     )
 
-    file = models.FileField(upload_to='shared/')
+    file = models.FileField(upload_to='shared/', db_index=True)
     name = models.CharField(max_length=512)
 
     created_at = models.DateTimeField(default=timezone.now)
@@ -146,8 +234,17 @@ class SharedFile(models.Model):
 
     is_public = models.BooleanField(default=False)
 
-    # Encryption
+    # Encryption (key_id = FERNET_KEYS entry, or 'user' for the owner's data key)
     is_encrypted = models.BooleanField(default=False)
+    key_id = models.CharField(max_length=64, blank=True)
+
+    # Integrity (sharing_app/integrity.py): SHA-256 of the stored bytes
+    sha256 = models.CharField(max_length=64, blank=True)
+    last_verified_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    is_corrupt = models.BooleanField(default=False)
+
+    # Compression at rest, copied from the File (sharing_app/compression.py)
+    content_encoding = models.CharField(max_length=16, blank=True)
 
     class Meta:
         ordering = ['-created_at']
@@ -155,40 +252,56 @@ class SharedFile(models.Model):
     def __str__(self):
         return f"{self.name} (Shared by {self.owner.username})"
 
+    # ======================================================
+    # ⬇️ Download admission
+    # ======================================================
+    def register_download(self):
+        """
+        Count one download if the link is still under its limit. A single
+        conditional UPDATE: no read-modify-write race, and the SQLite write
+        lock is held for one statement only.
+        """
+        admitted = SharedFile.objects.filter(
+            pk=self.pk, share_count__lt=F('max_share_limit')
+        ).update(share_count=F('share_count') + 1)
+        if admitted:
+            self.share_count += 1
+        return bool(admitted)
+
     # ======================================================
     # 🔒 Encrypt/Decrypt
     # ======================================================
     def encrypt_file(self):
-        file_path = self.file.path
-        if not os.path.exists(file_path):
+        storage, name = self.file.storage, self.file.name
+        if not name or not storage.exists(name):
             return False
 
-        fernet = Fernet(settings.FERNET_KEY.encode())
-
-        with open(file_path, "rb") as f:
+        with storage.open(name, "rb") as f:
             data = f.read()
 
-        encrypted = fernet.encrypt(data)
-
-        with open(file_path, "wb") as f:
-            f.write(encrypted)
+        # Envelope encryption: the owner's data key encrypts the blob
+        token = encrypt_bytes(data, self.owner)
+        storage.overwrite(name, token)
 
         self.is_encrypted = True
-        self.save(update_fields=['is_encrypted'])
+        self.key_id = blob_key_id()
+        self.save(update_fields=['is_encrypted', 'key_id'])
+
+        # New bytes → new checksum, on every row sharing the blob
+        from .integrity import record_checksum
+        record_checksum(self.file.name, hashlib.sha256(token).hexdigest())
         return True
 
     def decrypt_file(self):
-        file_path = self.file.path
-        if not os.path.exists(file_path):
+        storage, name = self.file.storage, self.file.name
+        if not name or not storage.exists(name):
             return None
 
-        fernet = Fernet(settings.FERNET_KEY.encode())
-
-        with open(file_path, "rb") as f:
+        with storage.open(name, "rb") as f:
             encrypted = f.read()
 
         try:
-            return fernet.decrypt(encrypted)
+            return decrypt_bytes(encrypted, self.key_id, self.owner)
         except Exception:
             return None
 
@@ -208,3 +321,153 @@ class SharedFile(models.Model):
         from django.urls import reverse
         share_path = reverse('sharing:download_public', args=[self.share_key])
         return request.build_absolute_uri(share_path)
+
+
+# ==========================================================
+# ⚙️ Background Job Queue (DB-backed, no external broker)
+# ==========================================================
+class Job(models.Model):
+    """
+    ⚙️ A unit of background work picked up by `manage.py runworker`.
+    Workers claim jobs with a lease; expired leases are reclaimed.
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    queue = models.CharField(max_length=50, default='default')
+    payload = models.JSONField(default=dict, blank=True)
+
+    # Higher priority runs first
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+
+    # Same key → same job (enqueue is a no-op the second time)
+    idempotency_key = models.CharField(max_length=255, unique=True, blank=True, null=True)
+
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+
+    # Lease
+    locked_by = models.CharField(max_length=100, blank=True)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-priority', 'run_after', 'id']
+        indexes = [
+            models.Index(fields=['queue', 'status', 'priority', 'run_after'], name='job_claim_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+# ==========================================================
+# 🧾 Audit log (append-only) + hourly rollups
+# ==========================================================
+class AuditEvent(models.Model):
+    """
+    🧾 One download, view, share creation or folder unlock. Written in
+    batches by sharing_app.audit, never updated; compacted into
+    AuditHourly and deleted after AUDIT_RAW_RETENTION_DAYS.
+    """
+    DOWNLOAD = 'download'
+    VIEW = 'view'
+    SHARE_CREATED = 'share_created'
+    FOLDER_UNLOCK = 'folder_unlock'
+    FOLDER_UNLOCK_FAILED = 'folder_unlock_failed'
+    EVENT_CHOICES = [
+        (DOWNLOAD, 'Download'),
+        (VIEW, 'View'),
+        (SHARE_CREATED, 'Share created'),
+        (FOLDER_UNLOCK, 'Folder unlocked'),
+        (FOLDER_UNLOCK_FAILED, 'Folder unlock failed'),
+    ]
+
+    event = models.CharField(max_length=32, choices=EVENT_CHOICES)
+    at = models.DateTimeField(db_index=True)
+
+    # Whose file/share/folder it was, and who did it (None = anonymous)
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True,
+                              on_delete=models.SET_NULL, related_name='+')
+    ip = models.GenericIPAddressField(null=True, blank=True)
+
+    file = models.ForeignKey(File, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    share = models.ForeignKey(SharedFile, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    folder = models.ForeignKey(Folder, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+
+    class Meta:
+        ordering = ['-at']
+        indexes = [
+            models.Index(fields=['share', 'at'], name='audit_share_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event} by {self.actor_id or self.ip or 'anonymous'} at {self.at:%Y-%m-%d %H:%M}"
+
+
+class AuditHourly(models.Model):
+    """
+    📊 AuditEvent counts per (hour, owner, event, file/share/folder),
+    rebuilt hour by hour by the `rollup_audit` job. Analytics read these.
+    """
+    hour = models.DateTimeField()
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    event = models.CharField(max_length=32, choices=AuditEvent.EVENT_CHOICES)
+
+    file = models.ForeignKey(File, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    share = models.ForeignKey(SharedFile, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    folder = models.ForeignKey(Folder, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+
+    count = models.PositiveIntegerField()
+    unique_ips = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ['-hour']
+        indexes = [
+            models.Index(fields=['owner', 'hour'], name='audit_hourly_owner_idx'),
+            models.Index(fields=['share', 'hour'], name='audit_hourly_share_idx'),
+        ]
+
+
+class AuditRollupState(models.Model):
+    """⏱️ Singleton: AuditHourly is complete for every hour before `rolled_until`."""
+    rolled_until = models.DateTimeField(null=True, blank=True)
+
+    @classmethod
+    def get(cls):
+        return cls.objects.get_or_create(pk=1)[0]
+
+
+# ==========================================================
+# 🦠 Virus scan verdicts (sharing_app/scan_cache.py)
+# ==========================================================
+class ScanVerdict(models.Model):
+    """clamd's verdict on some content (by SHA-256) under one signature database."""
+    sha256 = models.CharField(max_length=64)
+    # clamd VERSION reply, e.g. "ClamAV 1.0.3/27103/Mon Nov 20 08:39:37 2023"
+    signatures = models.CharField(max_length=128)
+    infected = models.BooleanField(default=False)
+    virus = models.CharField(max_length=255, blank=True)
+    scanned_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['sha256', 'signatures'], name='scan_verdict_uniq'),
+        ]
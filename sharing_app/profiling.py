@@ -0,0 +1,156 @@
+# ==========================================================
+# 🔬 profiling.py — On-demand request profiles (ring buffer on disk)
+# ==========================================================
+"""
+Profiles are written by `ProfilerMiddleware` and browsed by staff at
+`sharing:profiles`. Each capture is two files in PROFILER_DIR:
+
+    <id>.json   request info, SQL queries, text summary
+    <id>.prof   cProfile stats (open with snakeviz / pstats)
+    <id>.html   ...or a pyinstrument report, when pyinstrument is installed
+
+Only the newest PROFILER_MAX_PROFILES captures are kept.
+"""
+import io
+import json
+import os
+import pstats
+import re
+import time
+import uuid
+
+from django.conf import settings
+
+from .utils import atomic_write
+
+try:
+    import pyinstrument
+except ModuleNotFoundError:
+    pyinstrument = None
+
+PROFILE_ID_RE = re.compile(r'^[0-9]{13}-[0-9a-f]{8}$')
+
+
+def profiles_dir():
+    return str(getattr(settings, 'PROFILER_DIR', settings.BASE_DIR / '.profiles'))
+
+
+# ==========================================================
+# ⏺️ Capture
+# ==========================================================
+class Capture:
+    """Wraps one request: call stack profiler + SQL recorder."""
+
+    def __init__(self):
+        self.queries = []
+        self.engine = 'pyinstrument' if pyinstrument else 'cprofile'
+        if pyinstrument:
+            self.profiler = pyinstrument.Profiler()
+        else:
+            import cProfile
+            self.profiler = cProfile.Profile()
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        if pyinstrument:
+            self.profiler.start()
+        else:
+            self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc):
+        if pyinstrument:
+            self.profiler.stop()
+        else:
+            self.profiler.disable()
+        self.duration = time.perf_counter() - self.started
+        return False
+
+    # execute_wrapper hook
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({'sql': sql, 'ms': round((time.perf_counter() - start) * 1000, 3)})
+
+    def summary(self, limit=40):
+        if pyinstrument:
+            return self.profiler.output_text(unicode=True, color=False)
+        out = io.StringIO()
+        pstats.Stats(self.profiler, stream=out).sort_stats('cumulative').print_stats(limit)
+        return out.getvalue()
+
+
+def save(capture, info):
+    """Write a capture to disk and prune the ring buffer. Returns the id."""
+    directory = profiles_dir()
+    os.makedirs(directory, exist_ok=True)
+    profile_id = f"{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}"
+
+    if capture.engine == 'pyinstrument':
+        atomic_write(os.path.join(directory, f"{profile_id}.html"),
+                     capture.profiler.output_html().encode())
+    else:
+        capture.profiler.dump_stats(os.path.join(directory, f"{profile_id}.prof"))
+
+    record = {
+        'id': profile_id,
+        'engine': capture.engine,
+        'duration_ms': round(capture.duration * 1000, 2),
+        'query_count': len(capture.queries),
+        'query_ms': round(sum(q['ms'] for q in capture.queries), 2),
+        'queries': capture.queries,
+        'summary': capture.summary(),
+        **info,
+    }
+    atomic_write(os.path.join(directory, f"{profile_id}.json"), json.dumps(record).encode())
+    prune()
+    return profile_id
+
+
+def prune():
+    """Keep only the newest PROFILER_MAX_PROFILES captures."""
+    keep = getattr(settings, 'PROFILER_MAX_PROFILES', 200)
+    ids = list_ids()
+    for profile_id in ids[keep:]:
+        for ext in ('.json', '.prof', '.html'):
+            try:
+                os.remove(os.path.join(profiles_dir(), profile_id + ext))
+            except FileNotFoundError:
+                pass
+
+
+# ==========================================================
+# 📂 Browse
+# ==========================================================
+def list_ids():
+    """Profile ids, newest first."""
+    try:
+        names = os.listdir(profiles_dir())
+    except FileNotFoundError:
+        return []
+    ids = {n.rsplit('.', 1)[0] for n in names if n.endswith('.json')}
+    return sorted((i for i in ids if PROFILE_ID_RE.match(i)), reverse=True)
+
+
+def load(profile_id):
+    """Return the JSON record for a profile, or None."""
+    if not PROFILE_ID_RE.match(profile_id or ''):
+        return None
+    try:
+        with open(os.path.join(profiles_dir(), f"{profile_id}.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def artifact_path(profile_id):
+    """Path of the .prof/.html file for a profile, or None."""
+    if not PROFILE_ID_RE.match(profile_id or ''):
+        return None
+    for ext in ('.prof', '.html'):
+        path = os.path.join(profiles_dir(), profile_id + ext)
+        if os.path.exists(path):
+            return path
+    return None
@@ -0,0 +1,61 @@
+# ==========================================================
+# 💾 quota.py — Per-user storage quotas from a running counter
+# ==========================================================
+"""
+`CustomUser.storage_used` is adjusted with F() updates in the same
+transaction as the File row it accounts for: charged on ingest (`charge`,
+which is also the final, race-free admission check) and released when the
+row is deleted (permanent delete, trash purge, folder delete; see the
+File post_delete signal). Files in Trash still count, and so do the
+chunks of older versions (sharing_app/versions.py). A file's current
+version is only counted once, as `File.size`: it isn't chunked while it
+is current.
+
+Uploads are turned away earlier too, before any bytes reach disk, by
+QuotaUploadHandler (sharing_app/upload_handlers.py).
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import F
+
+
+class QuotaExceeded(Exception):
+    pass
+
+
+def quota_for(user):
+    """Quota in bytes, or None for unlimited."""
+    if user.storage_quota is not None:
+        return user.storage_quota
+    return getattr(settings, 'STORAGE_QUOTA_DEFAULT', None)
+
+
+def remaining(user):
+    """Bytes `user` may still store (None = unlimited), as of `user.storage_used`."""
+    quota = quota_for(user)
+    return None if quota is None else max(quota - user.storage_used, 0)
+
+
+def charge(user, nbytes):
+    """
+    Add `nbytes` to the user's usage if it fits, atomically. Call inside the
+    transaction that creates the File row; raises QuotaExceeded otherwise.
+    """
+    users = get_user_model().objects.filter(pk=user.pk)
+    quota = quota_for(user)
+    if quota is not None:
+        users = users.filter(storage_used__lte=quota - nbytes)
+    if not users.update(storage_used=F('storage_used') + nbytes):
+        raise QuotaExceeded(f"Storage quota exceeded ({nbytes} bytes requested).")
+    user.storage_used += nbytes
+
+
+def add(user_id, nbytes):
+    """Unchecked charge, for bytes stored on the user's behalf in the background (version history)."""
+    if nbytes:
+        get_user_model().objects.filter(pk=user_id).update(storage_used=F('storage_used') + nbytes)
+
+
+def release(user_id, nbytes):
+    if nbytes:
+        get_user_model().objects.filter(pk=user_id).update(storage_used=F('storage_used') - nbytes)
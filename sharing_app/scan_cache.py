@@ -0,0 +1,66 @@
+# ==========================================================
+# 🦠 scan_cache.py — clamd verdicts cached by content hash
+# ==========================================================
+"""
+The same files get uploaded again and again; scanning identical bytes
+twice under the same signatures can only give the same answer. Verdicts
+are kept in ScanVerdict keyed by the upload's SHA-256 plus clamd's VERSION
+reply (engine / signature database number / date), so:
+
+- known content (clean or infected) skips the clamd round trip;
+- when freshclam loads new signatures the version changes, nothing cached
+  matches any more, and each file is scanned once under the new database.
+
+The version is asked for at most every CLAMAV_VERSION_TTL seconds per
+process, so a signature update takes effect within that time. Whenever
+it changes, verdicts under other databases that are over a day old are
+deleted.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import ScanVerdict
+from .utils import TTLCache
+
+STALE_AFTER = timedelta(days=1)
+
+_versions = TTLCache(maxsize=1, ttl=getattr(settings, 'CLAMAV_VERSION_TTL', 60))
+_last_seen = {'signatures': None}
+
+
+def enabled():
+    return getattr(settings, 'SCAN_VERDICT_CACHE', True)
+
+
+def signature_version(cd):
+    """clamd's current engine + signature database version (cached briefly)."""
+    signatures = _versions.get('clamd')
+    if signatures is None:
+        signatures = cd.version().strip()[:128]
+        _versions.set('clamd', signatures)
+        if _last_seen['signatures'] != signatures:
+            _last_seen['signatures'] = signatures
+            prune(signatures)
+    return signatures
+
+
+def lookup(sha256, signatures):
+    """The cached ScanVerdict for this content under these signatures, or None."""
+    return ScanVerdict.objects.filter(sha256=sha256, signatures=signatures).first()
+
+
+def record(sha256, signatures, virus=None):
+    """Remember a fresh scan result (`virus` = the signature name if infected)."""
+    # A concurrent upload of the same content may have recorded it first: same answer
+    ScanVerdict.objects.bulk_create([ScanVerdict(
+        sha256=sha256, signatures=signatures, infected=bool(virus), virus=virus or '',
+    )], ignore_conflicts=True)
+
+
+def prune(signatures):
+    """Drop verdicts of other signature databases once they are a day old."""
+    ScanVerdict.objects.exclude(signatures=signatures).filter(
+        scanned_at__lt=timezone.now() - STALE_AFTER
+    ).delete()
@@ -1,13 +1,91 @@
-from django.db.models.signals import post_save, post_delete
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
 from django.dispatch import receiver
-from .models import File
+from django.utils import timezone
+from .models import File, FileVersion, Folder
+from . import listing_cache, quota, versions
+
+
+# Touch the parent folder with a single UPDATE: no SELECT of the folder,
+# no full-row save, and no post_save cascade holding the write lock.
+def _touch_folder(instance):
+    if instance.folder_id:
+        Folder.objects.filter(pk=instance.folder_id).update(updated_at=timezone.now())
 
 @receiver(post_save, sender=File)
 def touch_folder_on_file_save(sender, instance, **kwargs):
-    if instance.folder:
-        instance.folder.save()
+    _touch_folder(instance)
 
 @receiver(post_delete, sender=File)
 def touch_folder_on_file_delete(sender, instance, **kwargs):
-    if instance.folder:
-        instance.folder.save()
+    _touch_folder(instance)
+
+# Runs inside the delete's transaction, so the counter can't drift from the rows
+@receiver(post_delete, sender=File)
+def release_quota_on_file_delete(sender, instance, **kwargs):
+    quota.release(instance.user_id, instance.size)
+
+# Chunk references and any spare full copy (also on the File delete cascade)
+@receiver(post_delete, sender=FileVersion)
+def release_version_storage(sender, instance, **kwargs):
+    versions.forget(instance)
+
+
+# ==========================================================
+# 🗂️ Listing cache invalidation (see listing_cache.py)
+# ==========================================================
+# Upload, rename, trash, restore and delete all save/delete a File; a move
+# is a save with a new folder, so the folder it left is bumped too.
+# Bumps wait for the commit: bumped earlier, a reader could cache the old
+# rows under the new version and keep serving them until the next write.
+def _bump_on_commit(user_id, *folder_ids):
+    def bump():
+        for folder_id in folder_ids:
+            listing_cache.bump(user_id, folder_id)
+    transaction.on_commit(bump)
+
+@receiver(pre_save, sender=File)
+def remember_file_folder(sender, instance, update_fields=None, **kwargs):
+    if listing_cache.enabled() and instance.pk and (update_fields is None or 'folder' in update_fields):
+        instance._previous_folder_id = (
+            File.objects.filter(pk=instance.pk).values_list('folder_id', flat=True).first()
+        )
+
+@receiver(post_save, sender=File)
+@receiver(post_delete, sender=File)
+def bump_file_listing(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_folder_id', instance.folder_id)
+    if previous != instance.folder_id:
+        _bump_on_commit(instance.user_id, instance.folder_id, previous)
+    else:
+        _bump_on_commit(instance.user_id, instance.folder_id)
+
+# Deleting a folder moves its files to root (File.folder is SET_NULL) with a
+# bulk UPDATE that sends no signal; note beforehand whether there are any
+@receiver(pre_delete, sender=Folder)
+def remember_folder_files(sender, instance, **kwargs):
+    if listing_cache.enabled():
+        instance._had_files = File.objects.filter(folder_id=instance.pk).exists()
+
+# A folder shows up as a card in its parent, and its own view shows its name
+@receiver(post_save, sender=Folder)
+@receiver(post_delete, sender=Folder)
+def bump_folder_listing(sender, instance, **kwargs):
+    if getattr(instance, '_had_files', False) and instance.parent_id is not None:
+        _bump_on_commit(instance.user_id, instance.parent_id, instance.pk, None)
+    else:
+        _bump_on_commit(instance.user_id, instance.parent_id, instance.pk)
+
+
+# ==========================================================
+# 🗄️ SQLite connection tuning (see SQLITE_PRAGMAS)
+# ==========================================================
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f"PRAGMA {name} = {value}")
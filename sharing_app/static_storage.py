@@ -0,0 +1,85 @@
+# ==========================================================
+# 🗜️ static_storage.py — Hashed + precompressed static files
+# ==========================================================
+"""
+`collectstatic` writes every asset under a content-hashed name
+(`css/drive.3f2a9c.css`, ManifestStaticFilesStorage) plus `.gz` and, when
+the optional `brotli` package is installed, `.br` variants of the text
+assets. A hashed name never changes content, so it can be cached forever
+(STATIC_MAX_AGE); `views.static_asset` or a front-end server picks the
+variant the client accepts.
+
+    STORAGES['staticfiles'] = {'BACKEND': 'sharing_app.static_storage.CompressedManifestStaticFilesStorage'}
+"""
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.utils.functional import cached_property
+
+from .utils import atomic_write
+
+try:
+    import brotli
+except ModuleNotFoundError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.mjs', '.map', '.svg', '.json', '.txt', '.html', '.xml', '.ico'}
+
+# Content-Encoding → file suffix, best first
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+def _compressors():
+    yield 'gzip', '.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0)
+    if brotli is not None:
+        yield 'br', '.br', lambda data: brotli.compress(data, quality=11)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest storage that also writes `.gz`/`.br` siblings of hashed text assets."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        hashed = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                hashed.add(hashed_name)
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for hashed_name in sorted(hashed):
+            for compressed in self._compress(hashed_name):
+                yield hashed_name, compressed, True
+
+    def _compress(self, name):
+        if os.path.splitext(name)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+            return
+        with self.open(name) as f:
+            data = f.read()
+        for _, suffix, compress in _compressors():
+            packed = compress(data)
+            if len(packed) < len(data):     # Tiny files can grow; skip those
+                atomic_write(self.path(name + suffix), packed)
+                yield name + suffix
+
+    def stored_name(self, name):
+        # A {% static %} name missing from the manifest (or from disk) renders
+        # unhashed, as with plain StaticFilesStorage, instead of failing the page
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    @cached_property
+    def immutable_names(self):
+        """Hashed names from the manifest: safe to cache forever."""
+        return frozenset(self.hashed_files.values())
+
+    def precompressed(self, name, accept_encoding):
+        """(path, encoding) of the best variant of `name` the client accepts."""
+        accepted = {part.split(';')[0].strip() for part in accept_encoding.split(',')}
+        path = self.path(name)
+        for encoding, suffix in ENCODINGS:
+            if encoding in accepted and os.path.exists(path + suffix):
+                return path + suffix, encoding
+        return path, None
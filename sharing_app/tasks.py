@@ -0,0 +1,155 @@
+# ==========================================================
+# ⚙️ tasks.py — Background jobs for sharing_app
+# ==========================================================
+# Registered on app start (see apps.py). Enqueue with
+# `sharing_app.jobs.enqueue('<name>', {...})`.
+import logging
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from . import audit, integrity, versions
+from .jobs import job, enqueue
+from .models import File, FileVersion, SharedFile
+
+logger = logging.getLogger(__name__)
+
+
+# ==========================================================
+# 🗑️ Blob deletion
+# ==========================================================
+@job('delete_blob', queue='maintenance')
+def delete_blob(name=None, path=None):
+    """
+    Remove a blob from storage (by storage name; `path` is the older
+    absolute-path form). Missing files count as deleted.
+    """
+    if name:
+        default_storage.delete(name)
+        return
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+# ==========================================================
+# 🪞 Blob replication (ReplicatedStorage)
+# ==========================================================
+@job('replicate_blob', queue='replication')
+def replicate_blob(name, overwrite=False):
+    """Copy a blob to every replica root that lacks it (or, with `overwrite`, differs)."""
+    storage = default_storage
+    if not hasattr(storage, 'replicate'):
+        return
+    if storage.replicate(name, overwrite=overwrite) is None:
+        logger.warning("replicate_blob: no copy of %s left to replicate from", name)
+
+
+# ==========================================================
+# 🧹 Purge old trash
+# ==========================================================
+def purge_expired_trash(days=None, batch_size=500):
+    """
+    Permanently delete up to `batch_size` files that sat in Trash longer
+    than `days` (TRASH_RETENTION_DAYS). Blob removal is queued as separate
+    jobs. Returns (files deleted, more left).
+    """
+    days = days if days is not None else getattr(settings, 'TRASH_RETENTION_DAYS', 30)
+    cutoff = timezone.now() - timedelta(days=days)
+
+    expired = File.objects.filter(is_deleted=True, deleted_at__lt=cutoff).order_by('id')
+    purged = 0
+    for file_obj in expired[:batch_size]:
+        name = file_obj.file.name
+        file_obj.delete()
+        purged += 1
+        # Shares reuse the File's blob: a live public link keeps it
+        if name and not SharedFile.objects.filter(file=name).exists():
+            enqueue('delete_blob', {'name': name})
+    return purged, expired.exists()
+
+
+def schedule_purge_trash(delay=None):
+    """Queue the next purge_trash run (once per TRASH_PURGE_INTERVAL slot)."""
+    interval = getattr(settings, 'TRASH_PURGE_INTERVAL', 86400)
+    run_after = timezone.now() + timedelta(seconds=interval if delay is None else delay)
+    slot = int(run_after.timestamp()) // interval
+    enqueue('purge_trash', run_after=run_after, idempotency_key=f"purge_trash:{slot}")
+
+
+@job('purge_trash', queue='maintenance')
+def purge_trash(days=None, batch_size=500):
+    """Purge expired Trash in batches, then reschedule."""
+    _, more = purge_expired_trash(days, batch_size)
+    # More left → continue in a follow-up job
+    if more:
+        enqueue('purge_trash', {'days': days, 'batch_size': batch_size})
+    else:
+        schedule_purge_trash()
+
+
+# ==========================================================
+# 🧾 Audit log rollup + retention (sharing_app/audit.py)
+# ==========================================================
+@job('rollup_audit', queue='maintenance')
+def rollup_audit():
+    """Fold complete hours of AuditEvent into AuditHourly, then reschedule."""
+    hours, rows, more = audit.rollup()
+    logger.info("rollup_audit: %d hour(s) → %d rollup row(s)", hours, rows)
+    if more:
+        enqueue('rollup_audit')     # Backlog: keep going now
+        return
+    # Next hour, and retention once a day (idempotency keys dedupe both)
+    now = timezone.now()
+    audit.schedule_rollup(now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1))
+    enqueue('compact_audit', idempotency_key=f"compact_audit:{now.date().isoformat()}")
+
+
+@job('compact_audit', queue='maintenance')
+def compact_audit():
+    """Delete rolled-up raw events and rollups past their retention."""
+    raw, hourly = audit.compact()
+    logger.info("compact_audit: deleted %d raw event(s), %d hourly row(s)", raw, hourly)
+
+
+# ==========================================================
+# 🩺 Integrity scrub (sharing_app/integrity.py)
+# ==========================================================
+@job('scrub_blobs', queue='maintenance')
+def scrub_blobs():
+    """Re-hash due blobs within the I/O and time budget, then reschedule."""
+    totals = integrity.scrub()
+    logger.info("scrub_blobs: %s", totals)
+    integrity.schedule_scrub()
+
+
+# ==========================================================
+# 🕘 File versions (sharing_app/versions.py)
+# ==========================================================
+@job('chunk_version', queue='maintenance')
+def chunk_version(version_id):
+    """Store a superseded version as deduplicated chunks, then drop its full copy."""
+    version = FileVersion.objects.select_related('file').filter(pk=version_id).first()
+    if version:
+        versions.chunk_version(version)
+
+
+@job('materialize_version', queue='maintenance')
+def materialize_version(version_id):
+    """Write a restored version back as its File's blob."""
+    version = FileVersion.objects.select_related('file').filter(pk=version_id).first()
+    if version:
+        versions.materialize(version)
+
+
+@job('gc_chunks', queue='maintenance')
+def gc_chunks(batch_size=500):
+    """Delete chunks no version references any more (after VERSION_CHUNK_GC_GRACE)."""
+    deleted, more = versions.collect_garbage(batch_size)
+    logger.info("gc_chunks: deleted %d chunk(s)", deleted)
+    if more:
+        enqueue('gc_chunks', {'batch_size': batch_size})
@@ -0,0 +1,193 @@
+# ==========================================================
+# 📥 upload_handlers.py — Reject uploads before they hit disk
+# ==========================================================
+"""
+QuotaUploadHandler runs first in FILE_UPLOAD_HANDLERS. It turns an upload
+away as soon as it is known not to fit the user's remaining quota: from
+Content-Length before the first file part is read, then from the running
+total of file bytes as chunks arrive (several files, or a body the header
+understates). The view reports `request.upload_rejection`.
+
+UploadLimitsHandler adds the upload policy from forms.py on top: an
+extension outside ALLOWED_EXT, a first few bytes that don't match the
+extension (a renamed .exe is not a PDF), or a file over MAX_MB, declared or
+streamed, are all refused at the first point they are known.
+
+A rejected body is drained (so the browser gets the redirect) only when
+little of it is left; a larger remainder is never read, and the server
+closes the connection. Clients that send `Expect: 100-continue` (curl,
+most upload libraries) never send it at all.
+
+The authoritative check is still quota.charge() when the File row is saved.
+
+StagedUploadHandler replaces Django's TemporaryFileUploadHandler: large
+files are spooled into the storage's staging directory on a blob volume
+instead of FILE_UPLOAD_TEMP_DIR, so saving them is a rename rather than
+writing every byte a second time.
+"""
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import TemporaryUploadedFile, UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload, TemporaryFileUploadHandler
+from django.template.defaultfilters import filesizeformat
+
+from . import quota
+from .forms import ALLOWED_EXT, MAX_MB
+
+# Content-Length also counts form fields and multipart boundaries
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class QuotaUploadHandler(FileUploadHandler):
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        self.received = 0
+        self.remaining = None
+        self.body_length = content_length
+        user = getattr(self.request, 'user', None)
+        if user is not None and user.is_authenticated:
+            self.remaining = quota.remaining(user)
+
+    def reject(self, message):
+        self.request.upload_rejection = message
+        unread = self.body_length - self.received
+        raise StopUpload(connection_reset=unread > getattr(settings, 'UPLOAD_REJECT_DRAIN_MAX', 256 * 1024))
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        if self.remaining is not None and self.body_length - MULTIPART_OVERHEAD > self.remaining:
+            self.reject(f"⚠️ Not enough storage: {filesizeformat(self.remaining)} left.")
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.remaining is not None and self.received > self.remaining:
+            self.reject(f"⚠️ Not enough storage: {filesizeformat(self.remaining)} left.")
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None     # The next handler builds the UploadedFile
+
+
+# ==========================================================
+# 🔎 Type sniffing
+# ==========================================================
+SNIFF_BYTES = 16
+
+ZIP = (b'PK\x03\x04',)
+OLE = (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1',)    # .doc/.xls/.ppt compound file
+JPEG = (b'\xff\xd8\xff',)
+
+# extension → accepted leading bytes
+MAGIC = {
+    '.pdf': (b'%PDF-',),
+    '.png': (b'\x89PNG\r\n\x1a\n',),
+    '.jpg': JPEG,
+    '.jpeg': JPEG,
+    '.gif': (b'GIF87a', b'GIF89a'),
+    '.doc': OLE,
+    '.docx': ZIP,
+    '.xlsx': ZIP,
+}
+
+
+def _is_mp4(head):
+    return head[4:8] == b'ftyp'
+
+
+def _is_mp3(head):
+    # ID3 tag, or straight into an MPEG audio frame (11 sync bits)
+    return head.startswith(b'ID3') or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0)
+
+
+def _is_text(head):
+    # UTF-16 text (Excel's "Unicode text" CSV) is full of NULs; anything else isn't text
+    return head.startswith((b'\xff\xfe', b'\xfe\xff')) or b'\x00' not in head
+
+
+SNIFFERS = {
+    '.mp4': _is_mp4,
+    '.mp3': _is_mp3,
+    '.txt': _is_text,
+    '.csv': _is_text,
+}
+
+
+def matches_type(ext, head):
+    """Whether a file's first bytes fit its extension (unknown extensions pass)."""
+    if not head:
+        return True     # Empty file: nothing to check
+    if ext in MAGIC:
+        return head.startswith(MAGIC[ext])
+    sniff = SNIFFERS.get(ext)
+    return sniff(head) if sniff else True
+
+
+class UploadLimitsHandler(QuotaUploadHandler):
+    """QuotaUploadHandler plus ALLOWED_EXT, MAX_MB and a magic-byte check, per file."""
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        super().handle_raw_input(input_data, META, content_length, boundary, encoding)
+        self.max_bytes = MAX_MB * 1024 * 1024
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        self.file_received = 0
+        self.head = b''
+        self.ext = os.path.splitext(file_name)[1].lower()
+        if self.ext not in ALLOWED_EXT:
+            self.reject("⚠️ File type not allowed.")
+        # The part's own Content-Length is rarely sent; the body's bounds it
+        declared = content_length if content_length is not None else self.body_length - MULTIPART_OVERHEAD
+        if declared > self.max_bytes:
+            self.reject(f"⚠️ File too large. Max {MAX_MB} MB allowed.")
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+
+    def receive_data_chunk(self, raw_data, start):
+        raw_data = super().receive_data_chunk(raw_data, start)
+        self.file_received += len(raw_data)
+        if self.file_received > self.max_bytes:
+            self.reject(f"⚠️ File too large. Max {MAX_MB} MB allowed.")
+        if self.head is not None:
+            self.head += raw_data[:SNIFF_BYTES - len(self.head)]
+            if len(self.head) >= SNIFF_BYTES:
+                self._check_type()
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.head is not None and not matches_type(self.ext, self.head):
+            # Shorter than SNIFF_BYTES and already received: the view drops it
+            self.request.upload_rejection = "⚠️ File content doesn't match its type."
+        return super().file_complete(file_size)
+
+    def _check_type(self):
+        head, self.head = self.head, None
+        if not matches_type(self.ext, head):
+            self.reject("⚠️ File content doesn't match its type.")
+
+
+# ==========================================================
+# 📦 Staging on the destination volume
+# ==========================================================
+class StagedUploadedFile(TemporaryUploadedFile):
+    """TemporaryUploadedFile created in `directory` instead of FILE_UPLOAD_TEMP_DIR."""
+
+    def __init__(self, name, content_type, size, charset, content_type_extra=None, directory=None):
+        _, ext = os.path.splitext(name)
+        file = tempfile.NamedTemporaryFile(suffix='.upload' + ext, dir=directory)
+        UploadedFile.__init__(self, file, name, content_type, size, charset, content_type_extra)
+
+
+class StagedUploadHandler(TemporaryFileUploadHandler):
+    """
+    Stream large files into ShardedStorage.staging_dir(); storages without
+    one (S3 reads the upload from its path anyway) use FILE_UPLOAD_TEMP_DIR.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super(TemporaryFileUploadHandler, self).new_file(*args, **kwargs)
+        staging_dir = getattr(default_storage, 'staging_dir', None)
+        self.file = StagedUploadedFile(
+            self.file_name, self.content_type, 0, self.charset, self.content_type_extra,
+            directory=staging_dir() if staging_dir else settings.FILE_UPLOAD_TEMP_DIR,
+        )
@@ -45,6 +45,13 @@ urlpatterns = [
     # =====================================================
     path('file/<int:file_id>/', views.file_view, name='file_view'),
 
+    # =====================================================
+    # 🕘 FILE VERSIONS
+    # =====================================================
+    path('file/<int:pk>/versions/', views.file_versions, name='file_versions'),
+    path('file/<int:pk>/versions/<int:number>/restore/', views.restore_version, name='restore_version'),
+    path('file/<int:pk>/versions/<int:number>/download/', views.download_version, name='download_version'),
+
     # =====================================================
     # 🔗 SHARING
     # =====================================================
@@ -69,11 +76,19 @@ urlpatterns = [
     # =====================================================
     path('download/private/<int:pk>/', views.download_private, name='download_private'),
     path('download/public/<uuid:share_key>/', views.download_public, name='download_public'),
+    path('blob/<str:token>/', views.blob_download, name='blob_download'),
 
     # =====================================================
     # 🕒 RECENT & TRASH
     # =====================================================
     path('recent/', views.recent_files, name='recent_files'),
+    path('recent/opened/', views.recently_opened, name='recently_opened'),
+    path('shares/analytics/', views.share_analytics, name='share_analytics'),
+
+    # =====================================================
+    # 📈 METRICS (staff only)
+    # =====================================================
+    path('metrics/', views.metrics_view, name='metrics'),
 
     # =====================================================
     # 🚪 LOGOUT
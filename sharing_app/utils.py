@@ -1,38 +1,218 @@
-from cryptography.fernet import Fernet
+from collections import OrderedDict
+from cryptography.fernet import Fernet, MultiFernet
 from django.conf import settings
 import os
+import tempfile
+import threading
+import time
 
 
-def get_fernet():
+# ==========================================================
+# 🗄️ Bounded TTL cache (per process)
+# ==========================================================
+class TTLCache:
     """
-    Load Fernet encryption key from Django settings.
+    Small thread-safe LRU cache whose entries expire after `ttl` seconds.
+    Used to keep unwrapped data keys and cipher objects off the hot path.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# ==========================================================
+# 🔑 Master key ring (FERNET_KEYS)
+# ==========================================================
+_keyring_cache = {}
+
+
+def _configured_keys():
+    keys = getattr(settings, 'FERNET_KEYS', None)
+    if not keys:
+        key = getattr(settings, 'FERNET_KEY', None)
+        keys = [('default', key)] if key else []
+    if not keys:
+        raise RuntimeError("❌ FERNET_KEYS is not configured in settings.py")
+    return tuple((key_id, key) for key_id, key in keys)
+
+
+def get_keyring():
+    """
+    Return the configured keys as a list of (key_id, Fernet), newest first.
+    Fernet objects are built once per configuration and reused.
     Raise error if missing.
     """
-    key = getattr(settings, 'FERNET_KEY', None)
-    if not key:
-        raise RuntimeError("❌ FERNET_KEY is not configured in settings.py")
-    return Fernet(key.encode())
+    keys = _configured_keys()
+    ring = _keyring_cache.get(keys)
+    if ring is None:
+        ring = [(key_id, Fernet(key.encode())) for key_id, key in keys]
+        _keyring_cache.clear()
+        _keyring_cache[keys] = ring
+    return list(ring)
+
+
+def current_key_id() -> str:
+    """ID of the master key new blobs / data keys are encrypted with."""
+    return get_keyring()[0][0]
+
 
+_multi_cache = {}
 
-def encrypt_bytes(data: bytes) -> bytes:
+
+def get_fernet(key_id: str | None = None) -> MultiFernet:
     """
-    Encrypt in-memory bytes using Fernet.
+    MultiFernet over the whole key ring for decryption.
+    Tries `key_id` first (if given), then every other key.
+    Use `encrypt_bytes()` for new data so the newest key is always used.
     """
-    f = get_fernet()
-    return f.encrypt(data)
+    cache_key = (_configured_keys(), key_id)
+    multi = _multi_cache.get(cache_key)
+    if multi is None:
+        ring = get_keyring()
+        if key_id:
+            ring.sort(key=lambda item: item[0] != key_id)
+        multi = MultiFernet([fernet for _, fernet in ring])
+        _multi_cache[cache_key] = multi
+    return multi
+
+
+# ==========================================================
+# ✉️ Envelope encryption — per-user data keys
+# ==========================================================
+# Blobs encrypted with the owner's data key store this as their key_id.
+USER_KEY_ID = 'user'
 
+_data_key_cache = TTLCache(
+    maxsize=getattr(settings, 'DATA_KEY_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'DATA_KEY_CACHE_TTL', 300),
+)
 
-def decrypt_bytes(data: bytes) -> bytes:
+
+def get_user_fernet(user) -> Fernet:
     """
-    Decrypt in-memory bytes using Fernet.
+    Return a Fernet for the user's data key, creating and wrapping a new
+    data key with the newest master key on first use. Unwrapped keys are
+    cached for DATA_KEY_CACHE_TTL seconds.
     """
-    f = get_fernet()
-    return f.decrypt(data)
+    cached = _data_key_cache.get(user.pk)
+    if cached is not None:
+        return cached
+
+    if not user.data_key:
+        wrapped = encrypt_bytes(Fernet.generate_key()).decode()
+        # Conditional update: if another request won the race, use its key
+        type(user).objects.filter(pk=user.pk, data_key='').update(
+            data_key=wrapped, data_key_wrapped_by=current_key_id()
+        )
+        user.refresh_from_db(fields=['data_key', 'data_key_wrapped_by'])
+
+    data_key = decrypt_bytes(user.data_key.encode(), user.data_key_wrapped_by)
+    fernet = Fernet(data_key)
+    _data_key_cache.set(user.pk, fernet)
+    return fernet
 
 
-def encrypt_file(file_path: str) -> bool:
+def rewrap_data_key(user) -> bool:
     """
-    Encrypt a file on disk using Fernet.
+    Re-wrap one user's data key with the newest master key.
+    Blobs are untouched because the data key itself does not change.
+    """
+    primary = current_key_id()
+    if not user.data_key or user.data_key_wrapped_by == primary:
+        return False
+    data_key = decrypt_bytes(user.data_key.encode(), user.data_key_wrapped_by)
+    rewrapped = encrypt_bytes(data_key).decode()
+    return bool(type(user).objects.filter(
+        pk=user.pk, data_key=user.data_key
+    ).update(data_key=rewrapped, data_key_wrapped_by=primary))
+
+
+def blob_key_id() -> str:
+    """key_id to record for a newly encrypted blob."""
+    if getattr(settings, 'ENVELOPE_ENCRYPTION', True):
+        return USER_KEY_ID
+    return current_key_id()
+
+
+def encrypt_bytes(data: bytes, user=None) -> bytes:
+    """
+    Encrypt in-memory bytes.
+    With `user` (and ENVELOPE_ENCRYPTION on) the user's data key is used,
+    otherwise the newest master key.
+    """
+    if user is not None and getattr(settings, 'ENVELOPE_ENCRYPTION', True):
+        return get_user_fernet(user).encrypt(data)
+    return get_keyring()[0][1].encrypt(data)
+
+
+def decrypt_bytes(data: bytes, key_id: str | None = None, user=None) -> bytes:
+    """
+    Decrypt in-memory bytes using the user's data key (key_id == 'user')
+    or the master key ring.
+    """
+    if key_id == USER_KEY_ID:
+        if user is None:
+            raise RuntimeError("❌ A user is required to decrypt a data-key blob.")
+        return get_user_fernet(user).decrypt(data)
+    return get_fernet(key_id).decrypt(data)
+
+
+def atomic_write(file_path: str, data: bytes) -> None:
+    """
+    Write `data` to a temp file next to `file_path`, fsync it, then rename
+    it into place. Readers see either the old or the new blob, never half.
+    """
+    directory = os.path.dirname(file_path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def encrypt_file(file_path: str, user=None) -> bool:
+    """
+    Encrypt a file on disk (see `encrypt_bytes`).
+    Record `blob_key_id()` (with a user) or `current_key_id()` on the row.
     """
     if not os.path.exists(file_path):
         return False
@@ -40,16 +220,11 @@ def encrypt_file(file_path: str) -> bool:
     with open(file_path, 'rb') as f:
         plaintext = f.read()
 
-    fernet = get_fernet()
-    ciphertext = fernet.encrypt(plaintext)
-
-    with open(file_path, 'wb') as f:
-        f.write(ciphertext)
-
+    atomic_write(file_path, encrypt_bytes(plaintext, user))
     return True
 
 
-def decrypt_file(file_path: str) -> bytes | None:
+def decrypt_file(file_path: str, key_id: str | None = None, user=None) -> bytes | None:
     """
     Decrypt and return file bytes.
     """
@@ -60,7 +235,29 @@ def decrypt_file(file_path: str) -> bytes | None:
         encrypted_data = f.read()
 
     try:
-        fernet = get_fernet()
-        return fernet.decrypt(encrypted_data)
+        return decrypt_bytes(encrypted_data, key_id, user)
     except Exception:
         return None
+
+
+class RateLimiter:
+    """
+    Simple pacing limiter: `wait(n)` blocks so that the average rate
+    stays at or below `rate` units per second. `rate=None` disables it.
+    """
+
+    def __init__(self, rate: float | None):
+        self.rate = rate
+        self.started = None
+        self.consumed = 0.0
+
+    def wait(self, amount: float = 1.0) -> None:
+        if not self.rate:
+            return
+        now = time.monotonic()
+        if self.started is None:
+            self.started = now
+        self.consumed += amount
+        ahead = self.consumed / self.rate - (now - self.started)
+        if ahead > 0:
+            time.sleep(ahead)
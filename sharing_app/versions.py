@@ -0,0 +1,389 @@
+# ==========================================================
+# 🕘 versions.py — File history on a content-defined chunk store
+# ==========================================================
+"""
+A File's current content is always its `file` blob, so downloads, shares,
+replication and the integrity scrub work exactly as before. History sits
+beside it:
+
+- `add_version(file, content, user)` makes new content the current blob
+  and records a FileVersion (version 1 is created on the first edit, from
+  the blob that was there).
+- Once a version is superseded, the `chunk_version` job splits it into
+  content-defined chunks (gear rolling hash, FastCDC-style, so an edit
+  only changes the chunks around it) and stores each distinct chunk once
+  per owner, keyed by its SHA-256. The version is then just a manifest of
+  digests and its full copy is dropped. The current version is not
+  chunked: its full copy is the `file` blob already.
+- `restore(file, number, user)` is a metadata operation: a new version
+  that reuses the old manifest. Downloads stream it from chunks until the
+  `materialize_version` job has written it back as the current blob.
+
+Full copies are compressed at rest like uploads (sharing_app/compression.py);
+chunks hold the plain content, so dedup sees through it. A version's
+`sha256` is that of its content.
+
+Chunks are reference-counted by manifests; `gc_chunks` deletes the
+unreferenced ones after VERSION_CHUNK_GC_GRACE seconds. Chunk bytes count
+towards the owner's quota on top of `File.size`, which covers the current
+version.
+"""
+import hashlib
+import tempfile
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File as DjangoFile
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import compression, integrity, quota
+from .jobs import enqueue
+from .models import Chunk, File, FileVersion, SharedFile
+
+CHUNK_MIN = 16 * 1024
+CHUNK_AVG = 64 * 1024
+CHUNK_MAX = 256 * 1024
+READ_SIZE = 4 * 1024 * 1024
+STORE_BATCH = 64            # chunks looked up per query while storing
+LOOKUP_BATCH = 500
+
+# 256 fixed 32-bit values, derived from SHA-256 so they can never change
+# (new values would move every boundary and end deduplication)
+GEAR = [int.from_bytes(hashlib.sha256(bytes([i])).digest()[:4], 'big') for i in range(256)]
+# Normalised chunking: harder to cut before CHUNK_AVG, easier after it
+MASK_HARD = ((1 << 18) - 1) << 14
+MASK_EASY = ((1 << 14) - 1) << 18
+
+
+class VersionError(Exception):
+    pass
+
+
+# ==========================================================
+# ✂️ Content-defined chunking
+# ==========================================================
+def _cut(buf, start, end):
+    """End offset of the chunk that starts at `start` in buf[start:end]."""
+    if end - start <= CHUNK_MIN:
+        return end
+    limit = min(end, start + CHUNK_MAX)
+    middle = min(limit, start + CHUNK_AVG)
+    gear = GEAR
+    h = 0
+    for i, b in enumerate(buf[start + CHUNK_MIN:middle], start + CHUNK_MIN + 1):
+        h = ((h << 1) + gear[b]) & 0xFFFFFFFF
+        if not h & MASK_HARD:
+            return i
+    for i, b in enumerate(buf[middle:limit], middle + 1):
+        h = ((h << 1) + gear[b]) & 0xFFFFFFFF
+        if not h & MASK_EASY:
+            return i
+    return limit
+
+
+def iter_chunks(f):
+    """Split a binary file object into content-defined chunks (bytes)."""
+    buf, pos, eof = b'', 0, False
+    while True:
+        if not eof and len(buf) - pos < CHUNK_MAX:
+            data = f.read(READ_SIZE)
+            eof = not data
+            buf, pos = buf[pos:] + data, 0
+            continue
+        if pos >= len(buf):
+            return
+        cut = _cut(buf, pos, len(buf))
+        yield buf[pos:cut]
+        pos = cut
+
+
+# ==========================================================
+# 🧱 Chunk store
+# ==========================================================
+def _store_chunks(owner_id, pieces):
+    """Make sure a Chunk exists for every (digest, bytes) in `pieces`."""
+    existing = set(
+        Chunk.objects.filter(owner_id=owner_id, digest__in=[d for d, _ in pieces])
+        .values_list('digest', flat=True)
+    )
+    for digest, data in pieces:
+        if digest in existing:
+            continue
+        existing.add(digest)
+        chunk = Chunk(owner_id=owner_id, digest=digest, size=len(data))
+        chunk.blob.save(digest, ContentFile(data), save=False)
+        try:
+            with transaction.atomic():
+                chunk.save()
+                quota.add(owner_id, len(data))
+        except IntegrityError:
+            # Stored by a concurrent job in the meantime: keep theirs
+            chunk.blob.storage.delete(chunk.blob.name)
+
+
+def _adjust_refs(owner_id, digests, sign):
+    """Add (sign=1) or drop (sign=-1) one manifest's references. False if a chunk is gone."""
+    by_count = {}
+    for digest, n in Counter(digests).items():
+        by_count.setdefault(n, []).append(digest)
+    updated = 0
+    for n, group in by_count.items():
+        for i in range(0, len(group), LOOKUP_BATCH):
+            updated += Chunk.objects.filter(
+                owner_id=owner_id, digest__in=group[i:i + LOOKUP_BATCH]
+            ).update(refs=F('refs') + sign * n)
+    return updated == sum(len(group) for group in by_count.values())
+
+
+def iter_version(version, owner_id=None):
+    """Yield a version's bytes from its chunks, checking each against its digest."""
+    if owner_id is None:
+        owner_id = File.objects.filter(pk=version.file_id).values_list('user_id', flat=True).first()
+    digests = version.chunks or []
+    for i in range(0, len(digests), LOOKUP_BATCH):
+        batch = digests[i:i + LOOKUP_BATCH]
+        names = dict(Chunk.objects.filter(owner_id=owner_id, digest__in=set(batch)).values_list('digest', 'blob'))
+        for digest in batch:
+            if digest not in names:
+                raise VersionError(f"Chunk {digest} of version {version.number} is missing.")
+            with default_storage.open(names[digest], 'rb') as f:
+                data = f.read()
+            if hashlib.sha256(data).hexdigest() != digest:
+                raise VersionError(f"Chunk {digest} of version {version.number} is corrupt.")
+            yield data
+
+
+# ==========================================================
+# 🕘 Versions
+# ==========================================================
+def _charge(user, delta):
+    if delta > 0:
+        quota.charge(user, delta)
+    else:
+        quota.release(user.pk, -delta)
+
+
+def add_version(file, content, user):
+    """
+    Make `content` (an uploaded or Django File) the current content of
+    `file`, keeping what was there as a version. Returns the new
+    FileVersion; raises VersionError or quota.QuotaExceeded.
+    """
+    if file.is_encrypted:
+        raise VersionError("Encrypted files don't keep versions.")
+    name = file.original_name or file.name
+    version = FileVersion(file=file, size=content.size, sha256=integrity.content_sha256(content), created_by=user)
+    with compression.encoded(content, name) as (stored, encoding):
+        stored_sha256 = integrity.content_sha256(stored) if encoding else version.sha256
+        stored_size = stored.size if encoding else None
+        version.content_encoding = encoding
+        version.blob.save(name, stored, save=False)
+    try:
+        with transaction.atomic():
+            if not file.version:
+                # Version sha256 is of the content: unknown until chunked if stored compressed
+                FileVersion.objects.create(
+                    file=file, number=1, size=file.size, sha256='' if file.content_encoding else file.sha256,
+                    blob=file.file.name, content_encoding=file.content_encoding,
+                    created_by_id=file.user_id, created_at=file.updated_at,
+                )
+            version.number = max(file.version, 1) + 1
+            version.save()
+            _charge(file.user, version.size - file.size)
+            file.file = version.blob.name
+            file.size = version.size
+            file.sha256 = stored_sha256
+            file.content_encoding = version.content_encoding
+            file.stored_size = stored_size
+            file.version = version.number
+            file.last_verified_at = timezone.now()
+            file.is_corrupt = False
+            file.save(update_fields=['file', 'size', 'sha256', 'content_encoding', 'stored_size', 'version',
+                                     'last_verified_at', 'is_corrupt', 'updated_at'])
+    except IntegrityError:
+        version.blob.storage.delete(version.blob.name)
+        raise VersionError("The file was changed at the same time; please try again.")
+    except quota.QuotaExceeded:
+        version.blob.storage.delete(version.blob.name)
+        raise
+
+    transaction.on_commit(lambda: schedule_chunking(file))
+    return version
+
+
+def restore(file, number, user):
+    """
+    Make version `number` current again, as a new version that shares its
+    chunks. No content is copied here; see `materialize`.
+    """
+    if number == file.version:
+        raise VersionError(f"Version {number} is already the current version.")
+    old = file.versions.get(number=number)
+    if old.chunks is None:
+        raise VersionError(f"Version {number} is still being processed; try again in a moment.")
+    version = FileVersion(file=file, number=file.version + 1, size=old.size, sha256=old.sha256,
+                          chunks=old.chunks, restored_from=old.number, created_by=user)
+    try:
+        with transaction.atomic():
+            version.save()
+            if not _adjust_refs(file.user_id, old.chunks, 1):
+                raise VersionError(f"Version {number} can no longer be restored (chunks missing).")
+            _charge(file.user, old.size - file.size)
+            file.version = version.number
+            file.size = version.size
+            file.save(update_fields=['version', 'size', 'updated_at'])
+    except IntegrityError:
+        raise VersionError("The file was changed at the same time; please try again.")
+
+    transaction.on_commit(lambda: enqueue('materialize_version', {'version_id': version.pk},
+                                          idempotency_key=_job_key('materialize_version', version)))
+    transaction.on_commit(lambda: schedule_chunking(file))
+    return version
+
+
+def current(file):
+    """The FileVersion `file` currently shows, or None if it has no history."""
+    return file.versions.filter(number=file.version).first() if file.version else None
+
+
+# ==========================================================
+# ⚙️ Background work (jobs in tasks.py)
+# ==========================================================
+def _job_key(name, version):
+    # Not the pk alone: SQLite can hand out a deleted row's id again after a
+    # table rebuild, and the earlier job's key would swallow the new one
+    return f"{name}:{version.pk}:{version.created_at.timestamp()}"
+
+
+def schedule_chunking(file):
+    # Only superseded versions, going by the row: a version never becomes current again
+    pending = file.versions.filter(chunks__isnull=True).exclude(blob='').exclude(number=F('file__version'))
+    for version in pending.only('pk', 'created_at'):
+        enqueue('chunk_version', {'version_id': version.pk}, idempotency_key=_job_key('chunk_version', version))
+
+
+def chunk_version(version):
+    """Store a superseded version's blob as chunks and record its manifest (idempotent)."""
+    if version.chunks is not None or not version.blob:
+        return
+    if File.objects.filter(pk=version.file_id, version=version.number).exists():
+        return      # Still current: File.file is its copy (and File.size its quota)
+    owner_id = version.file.user_id
+    digests, pieces = [], []
+    whole = hashlib.sha256()
+    with compression.open_decoded(version.blob.name, version.content_encoding) as f:
+        for data in iter_chunks(f):
+            digest = hashlib.sha256(data).hexdigest()
+            whole.update(data)
+            digests.append(digest)
+            pieces.append((digest, data))
+            if len(pieces) >= STORE_BATCH:
+                _store_chunks(owner_id, pieces)
+                pieces = []
+    _store_chunks(owner_id, pieces)
+
+    sha256 = whole.hexdigest()
+    if version.sha256 and version.sha256 != sha256:
+        raise VersionError(f"Blob of version {version.number} doesn't match its checksum; not chunked.")
+    with transaction.atomic():
+        if FileVersion.objects.filter(pk=version.pk, chunks__isnull=True).update(chunks=digests, sha256=sha256):
+            if not _adjust_refs(owner_id, digests, 1):
+                # A chunk was collected between storing and referencing: retry
+                raise VersionError(f"Chunks of version {version.number} changed while storing; retrying.")
+    version.refresh_from_db()
+    release_blob(version)
+
+
+def materialize(version):
+    """Write a restored version back as the File's blob (idempotent)."""
+    if version.blob:
+        return
+    file = version.file
+    filename = file.original_name or file.name
+    with tempfile.TemporaryFile(dir=settings.FILE_UPLOAD_TEMP_DIR) as tmp:
+        for data in iter_version(version, file.user_id):
+            tmp.write(data)
+        tmp.seek(0)
+        with compression.encoded(DjangoFile(tmp, name=filename), filename) as (stored, encoding):
+            stored_sha256 = integrity.content_sha256(stored) if encoding else version.sha256
+            stored_size = stored.size if encoding else None
+            version.blob.save(filename, stored, save=False)
+    name = version.blob.name
+    previous = file.file.name
+
+    with transaction.atomic():
+        claimed = FileVersion.objects.filter(pk=version.pk, blob='').update(blob=name, content_encoding=encoding)
+        is_current = claimed and File.objects.filter(pk=file.pk, version=version.number).exists()
+        if is_current:
+            file.file = name
+            file.sha256 = stored_sha256
+            file.content_encoding = encoding
+            file.stored_size = stored_size
+            file.last_verified_at = timezone.now()
+            file.is_corrupt = False
+            file.save(update_fields=['file', 'sha256', 'content_encoding', 'stored_size', 'last_verified_at',
+                                     'is_corrupt', 'updated_at'])
+    if not claimed:
+        default_storage.delete(name)    # Written by a concurrent run
+        return
+    # Whichever copy is no longer current can go (its content is in chunks)
+    for stale in file.versions.filter(blob__in=[previous, name]).exclude(chunks__isnull=True):
+        release_blob(stale)
+
+
+def release_blob(version):
+    """Drop the full copy of a chunked version that is no longer current."""
+    name = version.blob.name
+    if not name or version.chunks is None or File.objects.filter(file=name).exists():
+        return
+    if FileVersion.objects.filter(pk=version.pk, blob=name).update(blob='', content_encoding=''):
+        version.blob, version.content_encoding = '', ''
+        # A share made while it was current keeps serving it
+        if not SharedFile.objects.filter(file=name).exists():
+            enqueue('delete_blob', {'name': name})
+
+
+def forget(version):
+    """A FileVersion row was deleted: drop its chunk references and spare copy."""
+    owner_id = File.objects.filter(pk=version.file_id).values_list('user_id', flat=True).first()
+    if version.chunks and owner_id is not None:
+        _adjust_refs(owner_id, version.chunks, -1)
+        schedule_gc()
+    name = version.blob.name
+    if name and not (File.objects.filter(file=name).exists() or SharedFile.objects.filter(file=name).exists()):
+        enqueue('delete_blob', {'name': name})
+
+
+def _gc_grace():
+    return getattr(settings, 'VERSION_CHUNK_GC_GRACE', 3600)
+
+
+def schedule_gc():
+    grace = _gc_grace()
+    run_after = timezone.now() + timedelta(seconds=grace)
+    enqueue('gc_chunks', run_after=run_after,
+            idempotency_key=f"gc_chunks:{int(run_after.timestamp()) // grace}")
+
+
+def collect_garbage(batch_size=500):
+    """Delete unreferenced chunks older than the grace period. Returns (deleted, more)."""
+    cutoff = timezone.now() - timedelta(seconds=_gc_grace())
+    rows = list(
+        Chunk.objects.filter(refs=0, created_at__lt=cutoff)
+        .values_list('pk', 'owner_id', 'blob', 'size')[:batch_size]
+    )
+    deleted = 0
+    for pk, owner_id, name, size in rows:
+        with transaction.atomic():
+            # Conditional: a manifest may have picked it up again meanwhile
+            if not Chunk.objects.filter(pk=pk, refs=0).delete()[0]:
+                continue
+            quota.release(owner_id, size)
+        default_storage.delete(name)
+        deleted += 1
+    return deleted, len(rows) == batch_size
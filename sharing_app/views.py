@@ -1,27 +1,41 @@
 # ==========================================================
 # 📁 Secure File Sharing - views.py (Final Updated Version)
 # ==========================================================
+import hmac
 import os
 import subprocess
 import uuid
 import mimetypes
+import logging
+import time
 from datetime import timedelta
 from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import logout
-from django.http import HttpResponse, Http404, HttpResponseForbidden, FileResponse
+from django.http import HttpResponse, Http404, HttpResponseForbidden, HttpResponseRedirect, FileResponse, StreamingHttpResponse
 from django.contrib import messages
 from django.utils import timezone
 from django.urls import reverse
+from django.db import transaction
+from django.db.models import BooleanField, ExpressionWrapper, Q
 import clamd
 
 from django.shortcuts import redirect, get_object_or_404
 from .models import UploadedFile
 from django.conf import settings
 
-from .models import SharedFile, Folder, File
+from .models import SharedFile, Folder, File, FileVersion, AuditEvent
 from .forms import RenameFolderForm, FolderPasswordForm, ConfirmDeleteForm, RenameFileForm
+from .storage import LocalObjectStorage, content_disposition
+from .db_router import use_replica
+from . import audit, compression, integrity, listing_cache, metrics, quota, scan_cache, versions
+from .access_tracking import record_access
+from .jobs import enqueue
+
+logger = logging.getLogger(__name__)
 
 # ---------------------------
 # Safe ClamAV scan function
@@ -30,7 +44,7 @@ try:
     import clamd
 except ModuleNotFoundError:
     clamd = None
-    print("⚠️ clamd module not installed. Virus scanning disabled.")
+    logging.getLogger(__name__).warning("clamd module not installed. Virus scanning disabled.")
 
 
 def scan_file_with_clamav(path):
@@ -39,22 +53,235 @@ def scan_file_with_clamav(path):
     Returns True if file is clean or scanning is disabled, False if infected.
     """
     if clamd is None:
-        print(f"⚠️ Skipping virus scan for {path}.")
+        logger.warning("Skipping virus scan for %s (clamd not installed).", path)
+        metrics.inc('clamav_scans_total', result='skipped')
         return True  # Allow in development/testing
 
+    start = time.perf_counter()
     try:
         cd = clamd.ClamdNetworkSocket()  
         result = cd.scan(path)
         # result example: {'filepath': ('OK', None)} or {'filepath': ('FOUND', 'EICAR-Test-Signature')}
         for res in result.values():
             if res[0] == 'FOUND':
-                print(f"❌ Virus detected in file: {path}")
+                logger.warning("Virus detected in file: %s (%s)", path, res[1])
+                metrics.inc('clamav_scans_total', result='infected')
                 return False  # infected
-        print(f"✅ File is clean: {path}")
+        logger.info("File is clean: %s", path)
+        metrics.inc('clamav_scans_total', result='clean')
         return True  # clean
     except Exception as e:
-        print(f"⚠️ ClamAV scan failed for {path}: {e}")
+        logger.error("ClamAV scan failed for %s: %s", path, e)
+        metrics.inc('clamav_scans_total', result='error')
+        return False
+    finally:
+        metrics.observe('clamav_scan_duration_seconds', time.perf_counter() - start)
+
+
+def scan_upload(request, uploaded_file):
+    """
+    clamd INSTREAM scan of an upload, skipped when the same content already
+    has a verdict under clamd's current signatures (sharing_app/scan_cache.py).
+    Returns False (with a message queued) if it is infected; an unreachable
+    clamd, or one that answers with an error, only warns (and nothing is cached).
+    """
+    try:
+        cd = clamd.ClamdNetworkSocket('127.0.0.1', 3310)
+        if scan_cache.enabled():
+            sha256 = integrity.content_sha256(uploaded_file)
+            signatures = scan_cache.signature_version(cd)
+            verdict = scan_cache.lookup(sha256, signatures)
+            metrics.inc('scan_verdict_cache_total', result='miss' if verdict is None else 'hit')
+            infected = verdict.infected if verdict is not None else _instream(cd, uploaded_file)
+            if verdict is None:
+                scan_cache.record(sha256, signatures, infected)
+        else:
+            infected = _instream(cd, uploaded_file)
+    except Exception as e:
+        metrics.inc('clamav_scans_total', result='error')
+        messages.warning(request, f"⚠️ Virus scan unavailable: {e}. Uploading without scan.")
+        return True
+
+    if infected:
+        messages.error(request, "⚠️ Virus detected! File upload blocked.")
         return False
+    return True
+
+
+def _instream(cd, uploaded_file):
+    """
+    Scan the uploaded file directly (in memory). Returns the virus name, or
+    None if clean; any other reply means nothing was scanned and raises.
+    """
+    scan_start = time.perf_counter()
+    try:
+        result = cd.instream(uploaded_file.file)
+    finally:
+        metrics.observe('clamav_scan_duration_seconds', time.perf_counter() - scan_start)
+    for status, virus in result.values():
+        if status == 'FOUND':
+            metrics.inc('clamav_scans_total', result='infected')
+            return virus or 'unknown'
+        if status != 'OK':
+            # e.g. ('ERROR', 'INSTREAM size limit exceeded'): never cache it as clean
+            raise clamd.ResponseError(f"{status}: {virus}" if virus else status)
+    metrics.inc('clamav_scans_total', result='clean')
+    return None
+
+
+# ==========================================================
+# 📋 Listing helpers (shared by dashboard + folder_view)
+# ==========================================================
+def add_listing_info(files):
+    """Attach `uploader_name` and `safe_size` to each file for templates."""
+    for f in files:
+        uploader = getattr(f, 'user', None)
+        f.uploader_name = getattr(uploader, 'username', '—') if uploader else '—'
+
+        try:
+            if f.file and getattr(f.file, 'path', None) and os.path.exists(f.file.path):
+                f.safe_size = f.file.size
+            else:
+                f.safe_size = 0
+        except Exception:
+            f.safe_size = 0
+    return files
+
+
+# ?sort= values → file ordering (folders are always by name)
+LISTING_SORTS = {
+    'newest': '-uploaded_at',
+    'oldest': 'uploaded_at',
+    'name': 'original_name',
+    'updated': '-updated_at',
+}
+
+
+def listing_sort(request):
+    sort = request.GET.get('sort')
+    return sort if sort in LISTING_SORTS else 'newest'
+
+
+def folder_listing(user, folder, sort):
+    """Child folders + files of `folder` (None = root), via the listing cache."""
+    def build():
+        folders = Folder.objects.filter(user=user, parent=folder).defer('password_hash').order_by('name')
+        # Uploader joined in: no per-row user query
+        files = File.objects.filter(
+            user=user, folder=folder, is_deleted=False
+        ).select_related('user').order_by(LISTING_SORTS[sort])
+        return {'folders': list(folders), 'files': add_listing_info(list(files))}
+
+    # cursor: page position, for when listings are paginated
+    return listing_cache.get_listing(user.id, folder.id if folder else None, sort, None, build)
+
+
+def file_download_response(path, filename):
+    """Build the attachment response used by private + public downloads."""
+    mime, _ = mimetypes.guess_type(path)
+    with open(path, 'rb') as f:
+        response = HttpResponse(f.read(), content_type=mime or 'application/octet-stream')
+        response['Content-Disposition'] = f'attachment; filename="%s"' % filename
+        return response
+
+
+def blob_response(field_file, filename, encrypted=False, disposition='attachment',
+                  content_encoding='', request=None, size=None):
+    """
+    Serve a stored blob after the caller has authorized the request.
+    Object storages get a redirect to a short-lived presigned URL so the
+    bytes never pass through Django; encrypted blobs must not leave that
+    way, so they (and plain disk storage) are served from here. So are
+    compressed blobs, which need their Content-Encoding handled.
+    """
+    if content_encoding and not encrypted:
+        return encoded_blob_response(request, field_file, filename, content_encoding, size, disposition)
+
+    storage = field_file.storage
+    if getattr(storage, 'supports_presigned_urls', False) and not encrypted:
+        return HttpResponseRedirect(
+            storage.presigned_url(field_file.name, filename=filename, disposition=disposition)
+        )
+
+    try:
+        if hasattr(storage, 'read_path'):
+            # Replicated storage: healthiest copy, failing over on errors
+            path = storage.read_path(field_file.name)
+        else:
+            path = field_file.path
+    except NotImplementedError:
+        # Remote storage: stream it through
+        try:
+            handle = field_file.open('rb')
+        except FileNotFoundError:
+            raise Http404("File not found")
+        return FileResponse(handle, as_attachment=disposition == 'attachment', filename=filename)
+
+    if not path or not os.path.exists(path):
+        raise Http404("File not found")
+    if disposition != 'attachment':
+        return FileResponse(open(path, 'rb'), as_attachment=False, filename=filename)
+    return file_download_response(path, filename)
+
+
+def encoded_blob_response(request, field_file, filename, codec, size=None, disposition='attachment'):
+    """
+    A blob stored compressed (sharing_app/compression.py): the stored bytes
+    as they are when the client accepts the codec, else decoded while
+    streaming. `size` is the decoded size, if known.
+    """
+    try:
+        handle = field_file.storage.open(field_file.name, 'rb')
+    except FileNotFoundError:
+        raise Http404("File not found")
+    mime, _ = mimetypes.guess_type(filename or '')
+    mime = mime or 'application/octet-stream'
+
+    accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '') if request is not None else ''
+    if compression.accepts(accept_encoding, codec):
+        metrics.inc('compressed_downloads_total', mode='passthrough')
+        response = FileResponse(handle, content_type=mime, as_attachment=disposition == 'attachment',
+                                filename=filename)
+        response['Content-Encoding'] = codec
+    else:
+        metrics.inc('compressed_downloads_total', mode='decoded')
+        response = StreamingHttpResponse(compression.stream_decoded(handle, codec), content_type=mime)
+        if size is not None:
+            response['Content-Length'] = size
+        response['Content-Disposition'] = content_disposition(filename, disposition)
+    response['Vary'] = 'Accept-Encoding'
+    return response
+
+
+def corrupt_blob_response():
+    """The integrity scrub flagged this blob (sharing_app/integrity.py): send nothing."""
+    metrics.inc('corrupt_blob_requests_total')
+    return HttpResponse(
+        "⚠️ This file failed an integrity check and can't be downloaded. Please contact support.",
+        status=500, content_type='text/plain; charset=utf-8',
+    )
+
+
+def version_response(version, filename, disposition='attachment', request=None):
+    """A FileVersion's content: its full copy if it still has one, else streamed from its chunks."""
+    if version.blob:
+        return blob_response(version.blob, filename, disposition=disposition,
+                             content_encoding=version.content_encoding, request=request, size=version.size)
+    mime, _ = mimetypes.guess_type(filename or '')
+    response = StreamingHttpResponse(versions.iter_version(version), content_type=mime or 'application/octet-stream')
+    response['Content-Length'] = version.size
+    response['Content-Disposition'] = content_disposition(filename, disposition)
+    return response
+
+
+def file_response(file_obj, disposition='attachment', request=None):
+    """A File's current content (a just-restored version streams until it is written back)."""
+    head = versions.current(file_obj)
+    if head is not None and not head.blob:
+        return version_response(head, file_obj.original_name, disposition)
+    return blob_response(file_obj.file, file_obj.original_name, encrypted=file_obj.is_encrypted,
+                         disposition=disposition, content_encoding=file_obj.content_encoding,
+                         request=request, size=file_obj.size)
 
 
 
@@ -79,6 +306,7 @@ def user_logout(request):
 # 📊 Dashboard (Root + Files) — FINAL UPDATED
 # ==========================================================
 @login_required
+@use_replica
 def dashboard(request, folder_id=None):
     """
     Default Dashboard (root folder).
@@ -91,31 +319,16 @@ def dashboard(request, folder_id=None):
     if folder_id:
         return redirect('sharing:folder_view', folder_id=folder_id)
 
-    # Root folders + files
-    folders = Folder.objects.filter(user=user, parent=None).order_by('name')
-    files = File.objects.filter(
-        user=user, folder=None, is_deleted=False
-    ).order_by('-uploaded_at')
-
-    # Add uploader & safe_size for templates
-    for f in files:
-        uploader = getattr(f, 'user', None)
-        f.uploader_name = getattr(uploader, 'username', '—') if uploader else '—'
-
-        try:
-            if f.file and getattr(f.file, 'path', None) and os.path.exists(f.file.path):
-                f.safe_size = f.file.size
-            else:
-                f.safe_size = 0
-        except Exception:
-            f.safe_size = 0
+    # Root folders + files (uploader name + safe_size attached)
+    listing = folder_listing(user, None, listing_sort(request))
 
     return render(request, 'sharing_app/dashboard.html', {
-        'folders': folders,
-        'files': files,
+        'folders': listing['folders'],
+        'files': listing['files'],
         'current_folder': None,
         'folder_name': "My Drive",
-        'storage_total': '15 GB',
+        'storage_used': user.storage_used,
+        'storage_quota': quota.quota_for(user),
     })
 
 
@@ -123,6 +336,7 @@ def dashboard(request, folder_id=None):
 # 📁 Folder View (PASSWORD PROTECTED) — FINAL UPDATED
 # ==========================================================
 @login_required
+@use_replica
 def folder_view(request, folder_id):
     """
     Folder handler:
@@ -140,8 +354,10 @@ def folder_view(request, folder_id):
             pwd = request.POST.get('folder_password', '')
             if folder.check_password(pwd):
                 request.session[access_key] = True
+                audit.record(AuditEvent.FOLDER_UNLOCK, request, owner_id=folder.user_id, folder=folder)
                 return redirect(request.GET.get("next") or request.path)
             else:
+                audit.record(AuditEvent.FOLDER_UNLOCK_FAILED, request, owner_id=folder.user_id, folder=folder)
                 messages.error(request, "❌ Wrong password for this folder!")
 
         return render(request, 'sharing_app/folder_password_prompt.html', {
@@ -150,32 +366,15 @@ def folder_view(request, folder_id):
         })
 
     # Access granted → load child folders + files
-    subfolders = Folder.objects.filter(
-        parent=folder, user=request.user
-    ).order_by('name')
-
-    files = File.objects.filter(
-        folder=folder, user=request.user, is_deleted=False
-    ).order_by('-uploaded_at')
-
-    # Add uploader + safe_size
-    for f in files:
-        uploader = getattr(f, 'user', None)
-        f.uploader_name = getattr(uploader, 'username', '—') if uploader else '—'
-
-        try:
-            if f.file and getattr(f.file, 'path', None) and os.path.exists(f.file.path):
-                f.safe_size = f.file.size
-            else:
-                f.safe_size = 0
-        except Exception:
-            f.safe_size = 0
+    listing = folder_listing(request.user, folder, listing_sort(request))
 
     return render(request, 'sharing_app/dashboard.html', {
         'current_folder': folder,
-        'folders': subfolders,
-        'files': files,
+        'folders': listing['folders'],
+        'files': listing['files'],
         'folder_name': folder.name,
+        'storage_used': request.user.storage_used,
+        'storage_quota': quota.quota_for(request.user),
     })
 
  
@@ -226,7 +425,7 @@ def rename_folder(request, folder_id):
         form = RenameFolderForm(request.POST)
         if form.is_valid():
             folder.name = form.cleaned_data['name']
-            folder.save(update_fields=['name'])
+            folder.save(update_fields=['name', 'updated_at'])
             messages.success(request, "📁 Folder renamed successfully.")
             return redirect(request.GET.get('next') or reverse('sharing:dashboard'))
     else:
@@ -319,7 +518,8 @@ def rename_file(request, pk):
         # UPDATE BOTH FIELDS
         file_obj.name = new_name
         file_obj.display_name = new_name
-        file_obj.save()
+        # update_fields: never write back a stale `file` path (see migrate_blobs)
+        file_obj.save(update_fields=['name', 'display_name', 'updated_at'])
 
         messages.success(request, "✅ File renamed successfully!")
 
@@ -347,9 +547,14 @@ def upload_file(request):
     display_name = request.POST.get('display_name', '').strip()
     folder_id = request.POST.get('folder_id') or None
 
+    # Turned away by UploadLimitsHandler while parsing: nothing was stored
+    if getattr(request, 'upload_rejection', None):
+        messages.error(request, request.upload_rejection)
+        return redirect('sharing:upload_file')
+
     if not uploaded_file:
         messages.error(request, "⚠️ Please select a file.")
-        return redirect('sharing:upload')
+        return redirect('sharing:upload_file')
 
     folder = None
     if folder_id:
@@ -361,22 +566,29 @@ def upload_file(request):
     # Duplicate check
     if File.objects.filter(user=request.user, folder=folder, original_name=final_name).exists():
         messages.error(request, f"⚠️ File '{final_name}' already exists.")
-        return redirect('sharing:upload')
+        return redirect('sharing:upload_file')
 
-    # ====== Virus Scan using clamd ======
-    try:
-        cd = clamd.ClamdNetworkSocket('127.0.0.1', 3310)
-        # Scan the uploaded file directly (in memory)
-        result = cd.instream(uploaded_file.file)
-        if any('FOUND' in res for res in result.values()):
-            messages.error(request, "⚠️ Virus detected! File upload blocked.")
-            return redirect('sharing:upload')
-    except Exception as e:
-        messages.warning(request, f"⚠️ Virus scan unavailable: {e}. Uploading without scan.")
+    metrics.observe('upload_size_bytes', uploaded_file.size)
+
+    if not scan_upload(request, uploaded_file):
+        return redirect('sharing:upload_file')
 
-    # Save file
-    f = File.objects.create(user=request.user, original_name=final_name, folder=folder)
-    f.file.save(final_name, uploaded_file, save=True)
+    # Save file: blob first (compressed if its type is worth it), then one short
+    # write transaction for the row, the quota charge and the folder touch from signals
+    f = File(user=request.user, original_name=final_name, folder=folder, size=uploaded_file.size)
+    with compression.encoded(uploaded_file, final_name) as (stored, encoding):
+        f.sha256 = integrity.content_sha256(stored)
+        f.content_encoding = encoding
+        f.stored_size = stored.size if encoding else None
+        f.file.save(final_name, stored, save=False)
+    try:
+        with transaction.atomic():
+            f.save()
+            quota.charge(request.user, f.size)
+    except quota.QuotaExceeded:
+        f.file.storage.delete(f.file.name)
+        messages.error(request, "⚠️ Not enough storage for this file.")
+        return redirect('sharing:upload_file')
 
     messages.success(request, f"✅ File '{final_name}' uploaded successfully!")
     return redirect('sharing:folder_view', folder_id=folder.id) if folder else redirect('sharing:dashboard_root')
@@ -404,12 +616,21 @@ def create_text_file(request):
         if not filename.endswith('.txt'):
             filename += '.txt'
 
-        new_file = File.objects.create(
-            user=request.user,
-            original_name=filename,
-            folder=parent_folder
-        )
-        new_file.file.save(filename, ContentFile(content), save=True)
+        data = content.encode()
+        new_file = File(user=request.user, original_name=filename, folder=parent_folder, size=len(data))
+        with compression.encoded(ContentFile(data), filename) as (stored, encoding):
+            new_file.sha256 = integrity.content_sha256(stored)
+            new_file.content_encoding = encoding
+            new_file.stored_size = stored.size if encoding else None
+            new_file.file.save(filename, stored, save=False)
+        try:
+            with transaction.atomic():
+                new_file.save()
+                quota.charge(request.user, new_file.size)
+        except quota.QuotaExceeded:
+            new_file.file.storage.delete(new_file.file.name)
+            messages.error(request, "⚠️ Not enough storage for this file.")
+            return redirect('sharing:dashboard')
 
         messages.success(request, f"📝 Text file '{filename}' created.")
         return redirect('sharing:folder_view', parent_folder.id) if parent_folder else redirect('sharing:dashboard')
@@ -439,8 +660,13 @@ def move_to_trash(request, file_id):
 # 🗑 Show Trash Page
 # ================================
 @login_required
+@use_replica
 def trash_view(request):
-    trashed_files = File.objects.filter(user=request.user, is_deleted=True).order_by('-deleted_at')
+    trashed_files = (
+        File.objects.filter(user=request.user, is_deleted=True)
+        .select_related('folder')
+        .order_by('-deleted_at')
+    )
     return render(request, "sharing_app/trash.html", {"trashed_files": trashed_files})
 
 
@@ -466,12 +692,14 @@ def restore_file(request, file_id):
 def permanent_delete(request, file_id):
     file_obj = get_object_or_404(File, id=file_id, user=request.user)
 
-    # Delete physical file
+    # Delete physical file (a failed unlink is retried as a job, not left behind)
+    name = file_obj.file.name
     try:
-        if file_obj.file and os.path.exists(file_obj.file.path):
-            os.remove(file_obj.file.path)
-    except:
-        pass
+        if name:
+            file_obj.file.storage.delete(name)
+    except OSError as e:
+        logger.warning("Could not delete blob %s (%s); queued for retry", name, e)
+        enqueue('delete_blob', {'name': name})
 
     file_obj.delete()
     messages.success(request, "🗑 File deleted permanently!")
@@ -483,22 +711,127 @@ def permanent_delete(request, file_id):
 @login_required
 def download_private(request, pk):
     file_obj = get_object_or_404(File, pk=pk, user=request.user, is_deleted=False)
-    path = file_obj.file.path
+    if file_obj.is_corrupt:
+        return corrupt_blob_response()
+    record_access(file_obj)
+    audit.record(AuditEvent.DOWNLOAD, request, owner_id=file_obj.user_id, file=file_obj)
+    return file_response(file_obj, request=request)
+
 
-    if not os.path.exists(path):
+@login_required
+def file_view(request, file_id):
+    f = get_object_or_404(File, id=file_id, user=request.user)
+    if f.is_corrupt:
+        return corrupt_blob_response()
+    record_access(f)
+    audit.record(AuditEvent.VIEW, request, owner_id=f.user_id, file=f)
+    return file_response(f, disposition='inline', request=request)
+
+
+# ==========================================================
+# 🔏 Signed blob URLs (LocalObjectStorage, the offline S3 stand-in)
+# ==========================================================
+def blob_download(request, token):
+    """Serve a blob for a signed, unexpired token; like an S3 presigned GET."""
+    data = LocalObjectStorage.verify_token(token)
+    if data is None:
+        return HttpResponseForbidden("⚠️ This download link is invalid or has expired.")
+
+    storage = default_storage
+    try:
+        handle = storage.open(data['n'], 'rb')
+    except (FileNotFoundError, NotImplementedError):
         raise Http404("File not found")
+    return FileResponse(
+        handle,
+        as_attachment=data.get('d', 'attachment') == 'attachment',
+        filename=data.get('f') or os.path.basename(data['n']),
+    )
 
-    mime, _ = mimetypes.guess_type(path)
-    with open(path, 'rb') as f:
-        response = HttpResponse(f.read(), content_type=mime or 'application/octet-stream')
-        response['Content-Disposition'] = f'attachment; filename="%s"' % file_obj.original_name
-        return response
+
+# ==========================================================
+# 🕘 File versions (sharing_app/versions.py)
+# ==========================================================
+TEXT_EDIT_MAX = 1024 * 1024     # .txt files up to this size are editable in the page
 
 
 @login_required
-def file_view(request, file_id):
-    f = get_object_or_404(File, id=file_id, user=request.user)
-    return FileResponse(f.file.open('rb'), as_attachment=False, filename=f.original_name)
+def file_versions(request, pk):
+    file_obj = get_object_or_404(File, pk=pk, user=request.user, is_deleted=False)
+    editable = (file_obj.original_name or '').lower().endswith('.txt') and file_obj.size <= TEXT_EDIT_MAX
+
+    if request.method == 'POST':
+        # Turned away by UploadLimitsHandler while parsing: nothing was stored
+        if getattr(request, 'upload_rejection', None):
+            messages.error(request, request.upload_rejection)
+            return redirect('sharing:file_versions', pk=pk)
+
+        uploaded_file = request.FILES.get('file')
+        if uploaded_file:
+            if not scan_upload(request, uploaded_file):
+                return redirect('sharing:file_versions', pk=pk)
+            content = uploaded_file
+        elif editable and 'content' in request.POST:
+            content = ContentFile(request.POST['content'].encode())
+        else:
+            messages.error(request, "⚠️ Please select a file.")
+            return redirect('sharing:file_versions', pk=pk)
+
+        try:
+            version = versions.add_version(file_obj, content, request.user)
+        except quota.QuotaExceeded:
+            messages.error(request, "⚠️ Not enough storage for this file.")
+        except versions.VersionError as e:
+            messages.error(request, f"⚠️ {e}")
+        else:
+            messages.success(request, f"✅ Saved as version {version.number}.")
+        return redirect('sharing:file_versions', pk=pk)
+
+    # Manifests can be large: only whether one exists is shown
+    history = (file_obj.versions.select_related('created_by').defer('chunks')
+               .annotate(chunked=ExpressionWrapper(Q(chunks__isnull=False), output_field=BooleanField())))
+    text = None
+    if editable:
+        head = versions.current(file_obj)
+        try:
+            if head is not None and not head.blob:
+                data = b''.join(versions.iter_version(head, file_obj.user_id))
+            else:
+                with compression.open_decoded(file_obj.file.name, file_obj.content_encoding) as f:
+                    data = f.read()
+            text = data.decode('utf-8', errors='replace')
+        except (OSError, versions.VersionError):
+            text = None
+    return render(request, 'sharing_app/file_versions.html', {
+        'file': file_obj, 'versions': history, 'text': text,
+    })
+
+
+@login_required
+def restore_version(request, pk, number):
+    file_obj = get_object_or_404(File, pk=pk, user=request.user, is_deleted=False)
+    if request.method != 'POST':
+        return redirect('sharing:file_versions', pk=pk)
+    get_object_or_404(FileVersion, file=file_obj, number=number)
+    try:
+        version = versions.restore(file_obj, number, request.user)
+    except quota.QuotaExceeded:
+        messages.error(request, "⚠️ Not enough storage to restore this version.")
+    except versions.VersionError as e:
+        messages.error(request, f"⚠️ {e}")
+    else:
+        messages.success(request, f"↩️ Version {number} restored as version {version.number}.")
+    return redirect('sharing:file_versions', pk=pk)
+
+
+@login_required
+def download_version(request, pk, number):
+    file_obj = get_object_or_404(File, pk=pk, user=request.user)
+    version = get_object_or_404(FileVersion, file=file_obj, number=number)
+    if version.number == file_obj.version and file_obj.is_corrupt:
+        return corrupt_blob_response()
+    stem, ext = os.path.splitext(file_obj.original_name or '')
+    return version_response(version, f"{stem} (v{number}){ext}", request=request)
 
 
 # ==========================================================
@@ -509,15 +842,30 @@ def share_file(request, pk):
     file_obj = get_object_or_404(File, pk=pk, user=request.user, is_deleted=False)
     share_key = uuid.uuid4()
 
+    # Shares point at a blob: write a just-restored version back first
+    head = versions.current(file_obj)
+    if head is not None and not head.blob:
+        try:
+            versions.materialize(head)
+        except versions.VersionError as e:
+            messages.error(request, f"⚠️ {e}")
+            return redirect('sharing:file_versions', pk=pk)
+        file_obj.refresh_from_db()
+
     shared = SharedFile.objects.create(
         owner=request.user,
         file=file_obj.file,
         name=file_obj.original_name,
+        sha256=file_obj.sha256,
+        last_verified_at=file_obj.last_verified_at,
+        is_corrupt=file_obj.is_corrupt,
+        content_encoding=file_obj.content_encoding,
         share_key=share_key,
         shared_expiry=timezone.now() + timedelta(minutes=10),
         share_count=0,
         max_share_limit=5,
     )
+    audit.record(AuditEvent.SHARE_CREATED, request, owner_id=request.user.pk, file=file_obj, share=shared)
 
     share_url = request.build_absolute_uri(reverse('sharing:download_public', args=[share_key]))
     whatsapp_url = f"https://api.whatsapp.com/send?text=📁 Download this file ({file_obj.original_name}): {share_url}"
@@ -538,23 +886,55 @@ def download_public(request, share_key):
     shared = get_object_or_404(SharedFile, share_key=share_key)
 
     if shared.shared_expiry and timezone.now() > shared.shared_expiry:
+        metrics.inc('share_downloads_total', result='expired')
         return HttpResponseForbidden("⚠️ This link has expired.")
 
     if shared.share_count >= shared.max_share_limit:
+        metrics.inc('share_downloads_total', result='limit_exceeded')
         return HttpResponseForbidden("⚠️ Share limit exceeded.")
 
-    shared.share_count += 1
-    shared.save(update_fields=['share_count'])
+    # Checked before admission: a damaged blob doesn't use up the link
+    if shared.is_corrupt:
+        return corrupt_blob_response()
 
-    path = shared.file.path
-    if not os.path.exists(path):
-        raise Http404("File not found")
+    # Re-checked atomically: concurrent hits can't exceed the limit
+    if not shared.register_download():
+        metrics.inc('share_downloads_total', result='limit_exceeded')
+        return HttpResponseForbidden("⚠️ Share limit exceeded.")
 
-    mime, _ = mimetypes.guess_type(path)
-    with open(path, 'rb') as f:
-        response = HttpResponse(f.read(), content_type=mime or 'application/octet-stream')
-        response['Content-Disposition'] = f'attachment; filename="%s"' % shared.name
-        return response
+    metrics.inc('share_downloads_total', result='admitted')
+    record_access(blob_name=shared.file.name)
+    audit.record(AuditEvent.DOWNLOAD, request, owner_id=shared.owner_id, share=shared)
+
+    return blob_response(shared.file, shared.name, encrypted=shared.is_encrypted,
+                         content_encoding=shared.content_encoding, request=request)
+
+
+# ==========================================================
+# 📊 Share analytics (hourly rollups, see audit.py)
+# ==========================================================
+@login_required
+@use_replica
+def share_analytics(request):
+    days = getattr(settings, 'SHARE_ANALYTICS_DAYS', 30)
+    since = timezone.now() - timedelta(days=days)
+    shares = list(SharedFile.objects.filter(owner=request.user).only(
+        'id', 'name', 'created_at', 'shared_expiry', 'share_count', 'max_share_limit')[:200])
+    totals = audit.share_totals(request.user.pk, since)
+    for shared in shares:
+        shared.recent_downloads = totals.get(shared.pk, 0)
+
+    selected = None
+    share_id = request.GET.get('share')
+    if share_id and share_id.isdigit():
+        selected = next((s for s in shares if s.pk == int(share_id)), None)
+    context = {'shares': shares, 'days': days, 'selected': selected}
+    if selected:
+        context['daily'] = audit.share_daily(selected.pk, since)
+        # Raw events: kept for AUDIT_RAW_RETENTION_DAYS
+        context['events'] = (AuditEvent.objects.filter(share=selected)
+                             .select_related('actor').order_by('-at')[:50])
+    return render(request, 'sharing_app/share_analytics.html', context)
 
 
 # ==========================================================
@@ -574,12 +954,148 @@ def access_shared_file(request, shared_token):
 # 🕒 Recent & Trash
 # ==========================================================
 @login_required
+@use_replica
 def recent_files(request):
     recent = File.objects.filter(user=request.user, is_deleted=False).order_by('-uploaded_at')[:20]
     return render(request, 'sharing_app/recent.html', {'files': recent})
 
 
+@login_required
+@use_replica
+def recently_opened(request):
+    # Served by file_recent_opened_idx; times lag by up to WRITE_BEHIND_FLUSH_INTERVAL
+    opened = File.objects.filter(
+        user=request.user, is_deleted=False, last_accessed_at__isnull=False
+    ).order_by('-last_accessed_at')[:20]
+    return render(request, 'sharing_app/recent.html', {'files': opened, 'opened': True})
+
+
 @login_required
 def trash(request):
     trash_files = File.objects.filter(user=request.user, is_deleted=True).order_by('-deleted_at')
     return render(request, 'sharing_app/trash.html', {'trash_files': trash_files})
+
+
+# ==========================================================
+# 📈 Metrics (Prometheus text format, staff only)
+# ==========================================================
+def metrics_view(request):
+    """
+    Staff users, or scrapers sending `Authorization: Bearer <METRICS_TOKEN>`.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    bearer = request.headers.get('Authorization', '')
+    is_staff = request.user.is_authenticated and request.user.is_staff
+    if not is_staff and not (token and hmac.compare_digest(bearer.encode(), f"Bearer {token}".encode())):
+        return HttpResponseForbidden("Staff only.")
+
+    from .jobs import queue_stats
+    stats = queue_stats()
+    gauges = {
+        'job_queue_depth': ("Jobs ready to run.", [({'queue': q}, v['depth']) for q, v in stats.items()]),
+        'job_queue_running': ("Jobs currently leased.", [({'queue': q}, v['running']) for q, v in stats.items()]),
+        'job_queue_failed': ("Jobs that exhausted retries.", [({'queue': q}, v['failed']) for q, v in stats.items()]),
+        'job_queue_oldest_wait_seconds': ("Age of the oldest ready job.",
+                                          [({'queue': q}, v['oldest_wait_s']) for q, v in stats.items()]),
+        'job_queue_avg_wait_seconds': ("Mean queue wait of recent jobs.",
+                                       [({'queue': q}, v['avg_wait_s']) for q, v in stats.items()]),
+    }
+    counters, _ = metrics.collect()
+    lookups = {dict(labels).get('result'): value for (name, labels), value in counters.items()
+               if name == 'listing_cache_requests_total'}
+    total = sum(lookups.values())
+    if total:
+        gauges['listing_cache_hit_ratio'] = ("Share of listing cache lookups that hit.",
+                                             [({}, round(lookups.get('hit', 0) / total, 4))])
+    return HttpResponse(metrics.render_prometheus(gauges),
+                        content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# ==========================================================
+# 🔬 Request Profiles (admin, staff only)
+# ==========================================================
+@staff_member_required
+def profile_list(request):
+    from . import profiling
+    records = [r for r in (profiling.load(i) for i in profiling.list_ids()) if r]
+    return render(request, 'admin/profiles/list.html', {
+        'title': 'Request profiles',
+        'profiles': records,
+        'enabled': getattr(settings, 'PROFILER_ENABLED', False),
+    })
+
+
+@staff_member_required
+def profile_detail(request, profile_id):
+    from . import profiling
+    record = profiling.load(profile_id)
+    if record is None:
+        raise Http404("Profile not found")
+    return render(request, 'admin/profiles/detail.html', {
+        'title': f"Profile {profile_id}",
+        'profile': record,
+    })
+
+
+@staff_member_required
+def profile_download(request, profile_id):
+    from . import profiling
+    path = profiling.artifact_path(profile_id)
+    if path is None:
+        raise Http404("Profile not found")
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=os.path.basename(path))
+
+
+# ==========================================================
+# 💾 Storage report (admin, staff only)
+# ==========================================================
+@staff_member_required
+def storage_report(request):
+    """Top consumers straight from the usage counters (no disk walk)."""
+    from django.contrib.auth import get_user_model
+    from django.db.models import Count, Sum
+
+    users = list(get_user_model().objects.filter(storage_used__gt=0).order_by('-storage_used')
+                 .only('username', 'email', 'storage_quota', 'storage_used')[:50])
+    for u in users:
+        u.quota = quota.quota_for(u)
+        u.percent = round(100 * u.storage_used / u.quota, 1) if u.quota else None
+    totals = get_user_model().objects.aggregate(used=Sum('storage_used'), users=Count('id'))
+    return render(request, 'admin/storage/report.html', {
+        'title': "Storage by user",
+        'users': users,
+        'total_used': totals['used'] or 0,
+        'total_users': totals['users'],
+        'default_quota': getattr(settings, 'STORAGE_QUOTA_DEFAULT', None),
+    })
+
+
+# ==========================================================
+# 🖼️ Static assets (collectstatic output, DEBUG off)
+# ==========================================================
+def static_asset(request, path):
+    """
+    Serve STATIC_ROOT with the precompressed variant the client accepts.
+    Hashed names are immutable: browsers keep them for STATIC_MAX_AGE.
+    """
+    from django.contrib.staticfiles.storage import staticfiles_storage
+    from django.core.exceptions import SuspiciousFileOperation
+
+    try:
+        full_path, encoding = staticfiles_storage.precompressed(
+            path, request.headers.get('Accept-Encoding', ''))
+    except SuspiciousFileOperation:
+        raise Http404("Not found")
+    if not os.path.isfile(full_path):
+        raise Http404("Not found")
+
+    mime, _ = mimetypes.guess_type(path)
+    response = FileResponse(open(full_path, 'rb'), content_type=mime or 'application/octet-stream')
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Vary'] = 'Accept-Encoding'
+    if path in staticfiles_storage.immutable_names:
+        response['Cache-Control'] = f"public, max-age={settings.STATIC_MAX_AGE}, immutable"
+    else:
+        response['Cache-Control'] = 'public, max-age=60'
+    return response
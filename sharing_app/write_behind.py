@@ -0,0 +1,113 @@
+# ==========================================================
+# ✍️ write_behind.py — Buffered, batched writes off the request path
+# ==========================================================
+"""
+Requests record cheap facts ("file 42 was opened") into an in-process
+buffer; a daemon thread hands the whole batch to a flush function every
+WRITE_BEHIND_FLUSH_INTERVAL seconds (sooner once WRITE_BEHIND_MAX_PENDING
+items are waiting), so the request itself never writes to the database.
+Anything still buffered is flushed at interpreter exit.
+
+With `coalesce`, items are keyed and merged (only the newest access time
+per file matters); without it they are appended in order.
+
+    accesses = WriteBehindBuffer('file_access', _flush_accesses, coalesce=max)
+    accesses.add(timezone.now(), key=('pk', file.pk))
+"""
+import atexit
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Serialises per-process start-up of every buffer (see WriteBehindBuffer._reset)
+_init_lock = threading.Lock()
+
+
+def _after_fork():
+    global _init_lock
+    _init_lock = threading.Lock()   # may have been held by another thread at fork
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+class WriteBehindBuffer:
+    def __init__(self, name, flush_batch, coalesce=None):
+        self.name = name
+        self.flush_batch = flush_batch
+        self.coalesce = coalesce
+        self._pid = None
+        atexit.register(self.flush)
+
+    def _reset(self):
+        """(Re)initialise per process: a forked child starts empty with its own thread."""
+        with _init_lock:
+            if self._pid == os.getpid():
+                return      # Another thread's first add() got here first
+            self._lock = threading.Lock()
+            self._wake = threading.Event()
+            self._pending = {} if self.coalesce else []
+            threading.Thread(target=self._run, name=f"write-behind-{self.name}", daemon=True).start()
+            # Last: add() skips _reset() once it matches, so everything above must exist
+            self._pid = os.getpid()
+
+    def add(self, item, key=None):
+        if self._pid != os.getpid():
+            self._reset()
+        with self._lock:
+            if self.coalesce:
+                old = self._pending.get(key)
+                self._pending[key] = item if old is None else self.coalesce(old, item)
+            else:
+                self._pending.append(item)
+            size = len(self._pending)
+        if size >= getattr(settings, 'WRITE_BEHIND_MAX_PENDING', 10000):
+            self._wake.set()
+
+    def _take(self):
+        with self._lock:
+            batch, self._pending = self._pending, {} if self.coalesce else []
+        return batch
+
+    def _requeue(self, batch):
+        """Put a failed batch back, unless the buffer is already full (then drop it)."""
+        with self._lock:
+            if len(self._pending) >= getattr(settings, 'WRITE_BEHIND_MAX_PENDING', 10000):
+                metrics.inc('write_behind_dropped_total', len(batch), buffer=self.name)
+                return
+            if self.coalesce:
+                for key, item in batch.items():
+                    old = self._pending.get(key)
+                    self._pending[key] = item if old is None else self.coalesce(old, item)
+            else:
+                self._pending[:0] = batch
+
+    def flush(self):
+        """Write everything buffered so far; safe to call from any thread."""
+        if self._pid != os.getpid():
+            return
+        batch = self._take()
+        if not batch:
+            return
+        try:
+            self.flush_batch(batch)
+        except Exception:
+            logger.exception("Write-behind flush of %s failed (%d items)", self.name, len(batch))
+            self._requeue(batch)
+            return
+        metrics.inc('write_behind_flushed_total', len(batch), buffer=self.name)
+
+    def _run(self):
+        while True:
+            self._wake.wait(getattr(settings, 'WRITE_BEHIND_FLUSH_INTERVAL', 5))
+            self._wake.clear()
+            self.flush()
+            close_old_connections()
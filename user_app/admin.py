@@ -6,12 +6,13 @@ from .models import CustomUser, EmailOTP
 @admin.register(CustomUser)
 class CustomUserAdmin(UserAdmin):
     model = CustomUser
-    list_display = ('username', 'email', 'phone', 'is_staff', 'is_active')
+    list_display = ('username', 'email', 'phone', 'is_staff', 'is_active', 'storage_used')
     list_filter = ('is_staff', 'is_active')
     fieldsets = (
         (None, {'fields': ('username', 'email', 'password')}),
         ('Personal info', {'fields': ('first_name', 'last_name', 'phone')}),
         ('OTP info', {'fields': ('otp_code', 'otp_expiry')}),
+        ('Storage', {'fields': ('storage_quota', 'storage_used')}),
         ('Permissions', {'fields': ('is_staff', 'is_active', 'is_superuser', 'groups', 'user_permissions')}),
     )
     add_fieldsets = (
@@ -20,6 +21,7 @@ class CustomUserAdmin(UserAdmin):
             'fields': ('username', 'email', 'phone', 'password1', 'password2', 'is_staff', 'is_active')}
         ),
     )
+    readonly_fields = ('storage_used',)
     search_fields = ('username', 'email', 'phone')
     ordering = ('username',)
 
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-19 06:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='data_key',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='data_key_wrapped_by',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-19 07:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_app', '0002_customuser_data_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='storage_quota',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='storage_used',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -14,6 +14,15 @@ class CustomUser(AbstractUser):
     otp_code = models.CharField(max_length=6, blank=True, null=True)
     otp_expiry = models.DateTimeField(blank=True, null=True)
 
+    # 🔐 Envelope encryption: per-user data key, wrapped by a master key
+    data_key = models.TextField(blank=True, default='')
+    data_key_wrapped_by = models.CharField(max_length=64, blank=True, default='')
+
+    # 💾 Storage quota in bytes (empty → STORAGE_QUOTA_DEFAULT); `storage_used`
+    # is a running counter kept by sharing_app.quota, never a disk scan
+    storage_quota = models.BigIntegerField(blank=True, null=True)
+    storage_used = models.BigIntegerField(default=0)
+
     def set_otp(self, otp):
         # ✅ timezone.now() use kiya hai datetime.now() ke jagah
         self.otp_code = otp